@@ -1,32 +1,81 @@
 from datetime import timedelta
-from fastapi import APIRouter, Depends, HTTPException, status
+from typing import Optional
+from fastapi import APIRouter, Depends, HTTPException, Request, status
+from fastapi.concurrency import run_in_threadpool
 from fastapi.security import OAuth2PasswordRequestForm # Formulario estándar de Swagger
-from sqlalchemy.orm import Session
+from sqlalchemy.orm import Session, joinedload
 
 from app.db.database import get_db
 from app.db import models
 from app.core import security
+from app.core.login_throttle import fallos_por_email, fallos_por_ip
 
 router = APIRouter()
 
+def _rechazo_por_exceso(segundos: int) -> HTTPException:
+    return HTTPException(
+        status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+        detail="Demasiados intentos de inicio de sesión. Intente más tarde.",
+        headers={"Retry-After": str(segundos)},
+    )
+
+def _buscar_usuario(db: Session, email: str) -> Optional[models.Usuario]:
+    return db.query(models.Usuario)\
+        .options(joinedload(models.Usuario.rol))\
+        .filter(models.Usuario.email == email)\
+        .first()
+
+def _guardar_nuevo_hash(db: Session, user: models.Usuario, nuevo_hash: str):
+    user.password_hash = nuevo_hash
+    db.commit()
+
 @router.post("/login", response_model=None) # Retorna un JSON custom
-def login_access_token(
+async def login_access_token(
+    request: Request,
     db: Session = Depends(get_db), 
     form_data: OAuth2PasswordRequestForm = Depends()
 ):
     """
     OAuth2 compatible token login, get an access token for future requests.
+    Es async: la BD va al threadpool y el hash al ejecutor dedicado de security.
     """
+    email = form_data.username.strip().lower()
+    # IP del cliente real solo si uvicorn confía en el proxy (--forwarded-allow-ips, ver config)
+    ip = request.client.host if request.client else "desconocida"
+
+    # 0. Throttle (antes de cualquier consulta o hash)
+    for limitador, clave in ((fallos_por_ip, ip), (fallos_por_email, email)):
+        espera = limitador.reintentar_en(clave)
+        if espera is not None:
+            raise _rechazo_por_exceso(espera)
+
     # 1. Buscar usuario por email (username en el form)
-    user = db.query(models.Usuario).filter(models.Usuario.email == form_data.username).first()
+    user = await run_in_threadpool(_buscar_usuario, db, form_data.username)
     
-    # 2. Validar usuario y contraseña
-    if not user or not security.verify_password(form_data.password, user.password_hash):
+    # 2. Validar usuario y contraseña (con re-hash transparente si cambiaron las rondas)
+    valido, nuevo_hash = False, None
+    if user:
+        try:
+            valido, nuevo_hash = await security.verify_and_update_password_async(
+                form_data.password, user.password_hash
+            )
+        except security.VerificadorSaturado:
+            raise HTTPException(
+                status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                detail="Servicio de autenticación saturado. Reintente en unos segundos.",
+                headers={"Retry-After": "1"},
+            )
+
+    if not valido:
+        fallos_por_email.registrar(email)
+        fallos_por_ip.registrar(ip)
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Email o contraseña incorrectos",
             headers={"WWW-Authenticate": "Bearer"},
         )
+
+    fallos_por_email.limpiar(email)
     
     if not user.activo:
         raise HTTPException(status_code=400, detail="Usuario inactivo")
@@ -40,10 +89,16 @@ def login_access_token(
 
     # 4. Devolver respuesta estándar OAuth2
     # Además devolvemos datos del usuario para que React sepa quién es
-    return {
+    respuesta = {
         "access_token": access_token,
         "token_type": "bearer",
         "user_id": user.id_usuario,
         "email": user.email,
         "rol": user.rol.nombre
-    }
\ No newline at end of file
+    }
+
+    # 5. Re-hash al final: el commit expira el objeto y no queremos recargarlo en el event loop
+    if nuevo_hash:
+        await run_in_threadpool(_guardar_nuevo_hash, db, user, nuevo_hash)
+
+    return respuesta
@@ -0,0 +1,33 @@
+# Archivo: app/api/v1/endpoints/busqueda.py
+from fastapi import APIRouter, Depends, Query
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.schemas import busqueda_schema
+from app.services.busqueda_service import BusquedaService
+
+# SEGURIDAD
+from app.core.responses import responder_objeto
+from app.core.deps import get_async_read_db, require_roles
+from app.core.config import ROLES_LECTURA
+
+router = APIRouter(
+    prefix="/buscar",
+    tags=["Búsqueda"],
+    dependencies=[Depends(require_roles(ROLES_LECTURA))]
+)
+
+# 1. BUSCADOR UNIFICADO (CAJA)
+@router.get("", response_model=busqueda_schema.BusquedaResponse)
+async def buscar_endpoint(
+    q: str = Query(..., min_length=2, max_length=100, description="Nombre, teléfono o identificador de unidad."),
+    limite: int = Query(20, ge=1, le=50),
+    solo_activos: bool = Query(True),
+    db: AsyncSession = Depends(get_async_read_db)
+):
+    """
+    Personas, unidades y contratos que coinciden con `q` (sin distinguir tildes ni
+    mayúsculas), ordenados por relevancia. Pensado para buscar mientras se escribe.
+    """
+
+    resultado = await db.run_sync(lambda s: BusquedaService(s).buscar(q, limite=limite, solo_activos=solo_activos))
+    return responder_objeto(busqueda_schema.BusquedaResponse, resultado, validado=True)
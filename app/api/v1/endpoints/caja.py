@@ -1,43 +1,107 @@
-from fastapi import APIRouter, Depends, HTTPException, status
+import csv
+import io
+import json
+from datetime import date
+from typing import Optional, Literal
+
+from fastapi import APIRouter, Depends, status, Query
+from fastapi.responses import StreamingResponse
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
 from app.db.database import get_db
-from app.db import models # Necesario para el usuario
 from app.services.caja_service import CajaService
 from app.schemas import caja_schema
 
 # SEGURIDAD
-from app.core.deps import get_current_user
-from app.core.config import ROLES_LECTURA
+from app.core.deps import get_async_read_db, require_roles
+from app.core.principal_cache import Principal
+from app.core.config import ROLES_LECTURA, ROLES_ADMIN
 
 router = APIRouter(
     prefix="/caja",
-    tags=["Reportes y Control de Caja"]
+    tags=["Reportes y Control de Caja"],
+    dependencies=[Depends(require_roles(ROLES_LECTURA))]
 )
 
+COLUMNAS_EXPORT = [
+    "fecha", "tipo", "referencia_id", "descripcion",
+    "monto_entrada", "monto_salida", "usuario_responsable"
+]
+
 @router.get("/balance", response_model=caja_schema.BalanceCaja)
-def ver_balance_actual(
-    db: Session = Depends(get_db),
-    current_user: models.Usuario = Depends(get_current_user)
+async def ver_balance_actual(
+    db: AsyncSession = Depends(get_async_read_db)
 ):
     """
     Arqueo rápido: ¿Cuánto dinero físico debe haber en el cajón?
     """
-    if current_user.rol.nombre not in ROLES_LECTURA:
-         raise HTTPException(status_code=403, detail="Acceso denegado.")
 
-    servicio = CajaService(db)
-    return servicio.calcular_balance()
+    return await db.run_sync(lambda s: CajaService(s).calcular_balance())
 
 @router.get("/libro-diario", response_model=caja_schema.ReporteLibroCaja)
-def ver_libro_diario(
+async def ver_libro_diario(
+    fecha_desde: Optional[date] = Query(None, description="Inicio del rango (inclusive)."),
+    fecha_hasta: Optional[date] = Query(None, description="Fin del rango (inclusive)."),
+    cursor: Optional[str] = Query(None, description="Valor 'next_cursor' de la página anterior."),
+    limit: int = Query(500, ge=1, le=5000),
+    db: AsyncSession = Depends(get_async_read_db)
+):
+    """
+    Reporte detallado cronológico de los movimientos de efectivo (paginado por cursor).
+    """
+
+    return await db.run_sync(
+        lambda s: CajaService(s).generar_libro_caja(fecha_desde, fecha_hasta, cursor=cursor, limit=limit)
+    )
+
+@router.get("/libro-diario/export")
+def exportar_libro_diario(
+    formato: Literal["ndjson", "csv"] = Query("ndjson"),
+    fecha_desde: Optional[date] = Query(None),
+    fecha_hasta: Optional[date] = Query(None),
+    db: Session = Depends(get_db)
+):
+    """
+    Exportación completa del libro diario en streaming (memoria constante).
+    Ideal para cierres anuales: NDJSON (una línea JSON por movimiento) o CSV.
+    """
+
+    filas = CajaService(db).iterar_libro_caja(fecha_desde, fecha_hasta)
+
+    if formato == "csv":
+        def generar_csv():
+            buffer = io.StringIO()
+            writer = csv.DictWriter(buffer, fieldnames=COLUMNAS_EXPORT)
+            writer.writeheader()
+            for fila in filas:
+                writer.writerow(fila)
+                yield buffer.getvalue()
+                buffer.seek(0)
+                buffer.truncate(0)
+            yield buffer.getvalue()
+
+        return StreamingResponse(
+            generar_csv(),
+            media_type="text/csv",
+            headers={"Content-Disposition": "attachment; filename=libro_diario.csv"}
+        )
+
+    def generar_ndjson():
+        for fila in filas:
+            yield json.dumps(fila, ensure_ascii=False) + "\n"
+
+    return StreamingResponse(generar_ndjson(), media_type="application/x-ndjson")
+
+@router.post("/reconciliar", response_model=caja_schema.ReconciliacionCaja)
+def reconciliar_ledger_caja(
+    corregir: bool = True,
     db: Session = Depends(get_db),
-    current_user: models.Usuario = Depends(get_current_user)
+    current_user: Principal = Depends(require_roles(ROLES_ADMIN, "Proceso reservado para administradores."))
 ):
     """
-    Reporte detallado cronológico de todos los movimientos de efectivo.
+    Recalcula la caja desde cero (sumando ingresos, gastos y depósitos) y
+    reporta el desfase contra el ledger incremental. Solo Admin.
     """
-    if current_user.rol.nombre not in ROLES_LECTURA:
-         raise HTTPException(status_code=403, detail="Acceso denegado.")
 
     servicio = CajaService(db)
-    return servicio.generar_libro_caja()
\ No newline at end of file
+    return servicio.reconciliar_ledger(corregir=corregir)
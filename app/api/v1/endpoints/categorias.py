@@ -1,4 +1,4 @@
-from fastapi import APIRouter, Depends, status, HTTPException
+from fastapi import APIRouter, Depends, status, HTTPException, Request
 from sqlalchemy.orm import Session
 from typing import List
 
@@ -8,7 +8,9 @@ from app.schemas import categoria_schema as schemas
 from app.services.categoria_service import CategoriaService 
 from app.db import models
 # SEGURIDAD
-from app.core.deps import get_current_user
+from app.core.catalog_cache import responder_catalogo
+from app.core.deps import require_roles
+from app.core.principal_cache import Principal
 from app.core.config import ROLES_LECTURA, ROLES_ADMIN
 
 # ----------------------------------------------------
@@ -20,7 +22,8 @@ def get_categoria_service(db: Session = Depends(get_db)) -> CategoriaService:
 
 router = APIRouter(
     prefix="/categorias",
-    tags=["Catálogo - Cuentas Contables"]
+    tags=["Catálogo - Cuentas Contables"],
+    dependencies=[Depends(require_roles(ROLES_LECTURA))]
 )
 
 # ----------------------------------------------------
@@ -30,14 +33,12 @@ router = APIRouter(
 def create_categoria_endpoint(
     categoria: schemas.CategoriaCreate,
     servicio: CategoriaService = Depends(get_categoria_service),
-    current_user: models.Usuario = Depends(get_current_user)
+    current_user: Principal = Depends(require_roles(ROLES_ADMIN, "Solo administradores pueden crear cuentas contables."))
 ):
     """
     Crea una nueva Categoría Contable.
     Seguridad: Solo Administradores (SuperAdmin, AdminEdif).
     """
-    if current_user.rol.nombre not in ROLES_ADMIN:
-         raise HTTPException(status_code=403, detail="Solo administradores pueden crear cuentas contables.")
 
     try:
         return servicio.create_categoria(categoria)
@@ -52,17 +53,17 @@ def create_categoria_endpoint(
 # ----------------------------------------------------
 @router.get("/", response_model=List[schemas.Categoria])
 def read_categorias_endpoint(
+    request: Request,
     filters: schemas.CategoriaFilter = Depends(),
     skip: int = 0,
     limit: int = 100,
-    servicio: CategoriaService = Depends(get_categoria_service),
-    current_user: models.Usuario = Depends(get_current_user)
+    servicio: CategoriaService = Depends(get_categoria_service)
 ):
-    """Obtiene la lista de categorías. Acceso: Todos los roles."""
-    if current_user.rol.nombre not in ROLES_LECTURA:
-         raise HTTPException(status_code=403, detail="Acceso denegado.")
-
-    return servicio.get_all_categorias(filters=filters, skip=skip, limit=limit)
+    """Obtiene la lista de categorías (desde caché, con ETag). Acceso: Todos los roles."""
+    return responder_catalogo(
+        request, servicio.db, "categorias", schemas.Categoria,
+        lambda: servicio.get_all_categorias(filters=filters, skip=skip, limit=limit)
+    )
 
 def get_categoria_or_404(
     categoria_id: int,
@@ -80,12 +81,9 @@ def get_categoria_or_404(
 
 @router.get("/{categoria_id}", response_model=schemas.Categoria)
 def read_categoria_by_id_endpoint(
-    db_categoria: models.Categoria = Depends(get_categoria_or_404),
-    current_user: models.Usuario = Depends(get_current_user)
+    db_categoria: models.Categoria = Depends(get_categoria_or_404)
 ):
     """Obtiene una Categoría por ID."""
-    if current_user.rol.nombre not in ROLES_LECTURA:
-         raise HTTPException(status_code=403, detail="Acceso denegado.")
          
     return db_categoria
 
@@ -97,11 +95,9 @@ def update_categoria_endpoint(
     categoria_in: schemas.CategoriaUpdate,
     db_categoria: models.Categoria = Depends(get_categoria_or_404),
     servicio: CategoriaService = Depends(get_categoria_service),
-    current_user: models.Usuario = Depends(get_current_user)
+    current_user: Principal = Depends(require_roles(ROLES_ADMIN, "No tiene permisos para modificar el plan de cuentas."))
 ):
     """Actualiza una Categoría. Solo Admin."""
-    if current_user.rol.nombre not in ROLES_ADMIN:
-         raise HTTPException(status_code=403, detail="No tiene permisos para modificar el plan de cuentas.")
 
     try:
         updated_categoria = servicio.update_categoria(db_categoria, categoria_in)
@@ -119,10 +115,8 @@ def update_categoria_endpoint(
 def delete_categoria_endpoint(
     db_categoria: models.Categoria = Depends(get_categoria_or_404),
     servicio: CategoriaService = Depends(get_categoria_service),
-    current_user: models.Usuario = Depends(get_current_user)
+    current_user: Principal = Depends(require_roles(ROLES_ADMIN, "No tiene permisos para eliminar cuentas."))
 ):
     """Desactiva una Categoría. Solo Admin."""
-    if current_user.rol.nombre not in ROLES_ADMIN:
-         raise HTTPException(status_code=403, detail="No tiene permisos para eliminar cuentas.")
 
     return servicio.deactivate_categoria(db_categoria)
\ No newline at end of file
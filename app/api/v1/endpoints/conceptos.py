@@ -1,14 +1,15 @@
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, status, Request
 from sqlalchemy.orm import Session
 from typing import List
 
 from app.db.database import get_db
-from app.db import models
 from app.schemas import concepto_deuda_schema as schemas
 from app.services.concepto_deuda_service import ConceptoDeudaService
 
 # SEGURIDAD
-from app.core.deps import get_current_user
+from app.core.catalog_cache import responder_catalogo
+from app.core.deps import require_roles
+from app.core.principal_cache import Principal
 from app.core.config import ROLES_LECTURA, ROLES_ADMIN
 
 def get_concepto_deuda_service(db: Session = Depends(get_db)) -> ConceptoDeudaService:
@@ -16,7 +17,8 @@ def get_concepto_deuda_service(db: Session = Depends(get_db)) -> ConceptoDeudaSe
     
 router = APIRouter(
     prefix="/conceptos",
-    tags=["Conceptos de Deuda (Catálogo)"]
+    tags=["Conceptos de Deuda (Catálogo)"],
+    dependencies=[Depends(require_roles(ROLES_LECTURA))]
 )
 
 # 1. CREAR (Solo Admin)
@@ -24,35 +26,28 @@ router = APIRouter(
 def create_concepto_endpoint(
     concepto: schemas.ConceptoDeudaCreate, 
     servicio: ConceptoDeudaService = Depends(get_concepto_deuda_service),
-    current_user: models.Usuario = Depends(get_current_user)
+    current_user: Principal = Depends(require_roles(ROLES_ADMIN, "Solo administradores pueden crear conceptos de deuda."))
 ):
-    if current_user.rol.nombre not in ROLES_ADMIN:
-         raise HTTPException(status_code=403, detail="Solo administradores pueden crear conceptos de deuda.")
-         
     return servicio.create_concepto(concepto)
 
 # 2. LISTAR (Todos)
 @router.get("/", response_model=List[schemas.ConceptoDeuda])
 def read_all_conceptos_endpoint(
+    request: Request,
     skip: int = 0, limit: int = 100, 
-    servicio: ConceptoDeudaService = Depends(get_concepto_deuda_service),
-    current_user: models.Usuario = Depends(get_current_user)
+    servicio: ConceptoDeudaService = Depends(get_concepto_deuda_service)
 ):
-    if current_user.rol.nombre not in ROLES_LECTURA:
-         raise HTTPException(status_code=403, detail="Acceso denegado.")
-         
-    return servicio.get_all_conceptos(skip=skip, limit=limit)
+    return responder_catalogo(
+        request, servicio.db, "conceptos", schemas.ConceptoDeuda,
+        lambda: servicio.get_all_conceptos(skip=skip, limit=limit)
+    )
 
 # 3. LEER UNO (Todos)
 @router.get("/{concepto_id}", response_model=schemas.ConceptoDeuda)
 def read_concepto_by_id_endpoint(
     concepto_id: int, 
-    servicio: ConceptoDeudaService = Depends(get_concepto_deuda_service),
-    current_user: models.Usuario = Depends(get_current_user)
+    servicio: ConceptoDeudaService = Depends(get_concepto_deuda_service)
 ):
-    if current_user.rol.nombre not in ROLES_LECTURA:
-         raise HTTPException(status_code=403, detail="Acceso denegado.")
-
     db_concepto = servicio.get_concepto_by_id(concepto_id=concepto_id)
     if db_concepto is None:
         raise HTTPException(status_code=404, detail="Concepto de Deuda no encontrado")
@@ -64,13 +59,11 @@ def update_concepto_endpoint(
     concepto_id: int,
     concepto_in: schemas.ConceptoDeudaUpdate,
     servicio: ConceptoDeudaService = Depends(get_concepto_deuda_service),
-    current_user: models.Usuario = Depends(get_current_user)
+    current_user: Principal = Depends(require_roles(ROLES_ADMIN, "No tiene permisos para modificar conceptos."))
 ):
     """
     Actualiza un concepto (Nombre, Descripción, Monto Sugerido).
     """
-    if current_user.rol.nombre not in ROLES_ADMIN:
-         raise HTTPException(status_code=403, detail="No tiene permisos para modificar conceptos.")
          
     return servicio.update_concepto(concepto_id, concepto_in)
 
@@ -79,12 +72,10 @@ def update_concepto_endpoint(
 def delete_concepto_endpoint(
     concepto_id: int,
     servicio: ConceptoDeudaService = Depends(get_concepto_deuda_service),
-    current_user: models.Usuario = Depends(get_current_user)
+    current_user: Principal = Depends(require_roles(ROLES_ADMIN, "No tiene permisos para eliminar conceptos."))
 ):
     """
     Elimina un concepto SI Y SOLO SI no tiene historial de deudas.
     """
-    if current_user.rol.nombre not in ROLES_ADMIN:
-         raise HTTPException(status_code=403, detail="No tiene permisos para eliminar conceptos.")
          
     servicio.delete_concepto(concepto_id)
\ No newline at end of file
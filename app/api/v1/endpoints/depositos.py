@@ -1,18 +1,21 @@
-from fastapi import APIRouter, Depends, HTTPException, status, Query
+from fastapi import APIRouter, Depends, status, Query, Response
 from sqlalchemy.orm import Session
-from typing import List
+from typing import List, Optional
 
 from app.db.database import get_db
-from app.db import models
 from app.services.deposito_service import DepositoService
 from app.schemas import deposito_schema
 # SEGURIDAD
-from app.core.deps import get_current_user
+from app.core.pagination import exponer_cursor
+from app.core.deps import require_roles
+from app.core.idempotency import Idempotencia, idempotencia
+from app.core.principal_cache import Principal
 from app.core.config import ROLES_LECTURA, ROLES_ESCRITURA
 
 router = APIRouter(
     prefix="/depositos",
-    tags=["Gestión de Efectivo y Depósitos (Blindaje)"]
+    tags=["Gestión de Efectivo y Depósitos (Blindaje)"],
+    dependencies=[Depends(require_roles(ROLES_LECTURA))]
 )
 
 def get_deposito_service(db: Session = Depends(get_db)) -> DepositoService:
@@ -23,15 +26,12 @@ def get_deposito_service(db: Session = Depends(get_db)) -> DepositoService:
 # --------------------------------------------------------------------
 @router.get("/pendientes", response_model=List[deposito_schema.TransaccionPendiente])
 def ver_efectivo_pendiente(
-    servicio: DepositoService = Depends(get_deposito_service),
-    current_user: models.Usuario = Depends(get_current_user)
+    servicio: DepositoService = Depends(get_deposito_service)
 ):
     """
     Ver recibos en efectivo pendientes.
     Requiere: Estar logueado (Cualquier rol autorizado).
     """
-    if current_user.rol.nombre not in ROLES_LECTURA:
-         raise HTTPException(status_code=403, detail="Acceso denegado.")
          
     return servicio.obtener_efectivo_pendiente()
 
@@ -42,31 +42,29 @@ def ver_efectivo_pendiente(
 def crear_deposito(
     deposito: deposito_schema.DepositoCreate,
     servicio: DepositoService = Depends(get_deposito_service),
-    current_user: models.Usuario = Depends(get_current_user)
+    current_user: Principal = Depends(require_roles(ROLES_ESCRITURA, "No tiene permisos para cerrar caja.")),
+    idem: Idempotencia = Depends(idempotencia)
 ):
     """
     Registra el depósito bancario.
     Requiere: Rol Operativo (Cajero, Admin).
+    Con cabecera Idempotency-Key, un reintento devuelve el depósito ya registrado.
     """
-    if current_user.rol.nombre not in ROLES_ESCRITURA:
-         raise HTTPException(status_code=403, detail="No tiene permisos para cerrar caja.")
 
     # Extraemos el ID del usuario del token
     user_id = current_user.id_usuario
-    return servicio.crear_deposito_cierre(deposito, user_id)
+    return idem.ejecutar(lambda: servicio.crear_deposito_cierre(deposito, user_id), deposito_schema.DepositoResponse)
 
 # --------------------------------------------------------------------
 # 3. GET: HISTORIAL
 # --------------------------------------------------------------------
 @router.get("/", response_model=List[deposito_schema.DepositoResponse])
 def listar_historial_depositos(
+    response: Response,
     skip: int = 0, 
     limit: int = 100,
-    servicio: DepositoService = Depends(get_deposito_service),
-    current_user: models.Usuario = Depends(get_current_user)
+    cursor: Optional[str] = Query(None, description="X-Next-Cursor de la página anterior (tiene prioridad sobre skip)."),
+    servicio: DepositoService = Depends(get_deposito_service)
 ):
     """Historial de cierres."""
-    if current_user.rol.nombre not in ROLES_LECTURA:
-         raise HTTPException(status_code=403, detail="Acceso denegado.")
-         
-    return servicio.get_depositos(skip=skip, limit=limit)
\ No newline at end of file
+    return exponer_cursor(response, servicio.get_depositos(skip=skip, limit=limit, cursor=cursor))
\ No newline at end of file
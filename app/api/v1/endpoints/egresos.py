@@ -1,18 +1,21 @@
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, status, Query
 from sqlalchemy.orm import Session
-from typing import List
+from typing import List, Optional
 
 from app.db.database import get_db
-from app.db import models
 from app.services.egreso_service import EgresoService
 from app.schemas import egreso_schema
-from app.core.deps import get_current_user
+from app.core.responses import responder_lista
+from app.core.deps import require_roles
+from app.core.idempotency import Idempotencia, idempotencia
+from app.core.principal_cache import Principal
 # IMPORTAMOS LAS LISTAS DE PODER
-from app.core.config import ROLES_ADMIN, ROLES_ESCRITURA, ROLES_LECTURA
+from app.core.config import ROLES_LECTURA, ROLES_ESCRITURA, ROLES_ADMIN
 
 router = APIRouter(
     prefix="/egresos",
-    tags=["Gestión de Gastos y Salidas"]
+    tags=["Gestión de Gastos y Salidas"],
+    dependencies=[Depends(require_roles(ROLES_LECTURA))]
 )
 
 def get_egreso_service(db: Session = Depends(get_db)) -> EgresoService:
@@ -23,45 +26,32 @@ def get_egreso_service(db: Session = Depends(get_db)) -> EgresoService:
 def registrar_gasto(
     egreso: egreso_schema.EgresoCreate,
     servicio: EgresoService = Depends(get_egreso_service),
-    current_user: models.Usuario = Depends(get_current_user)
+    current_user: Principal = Depends(require_roles(ROLES_ESCRITURA, "No tiene permisos para registrar gastos.")),
+    idem: Idempotencia = Depends(idempotencia)
 ):
-    # Validación de Escritura (Opcional, pero recomendada para consistencia)
-    if current_user.rol.nombre not in ROLES_ESCRITURA:
-         raise HTTPException(status_code=403, detail="No tiene permisos para registrar gastos.")
-
     user_id = current_user.id_usuario
-    return servicio.create_egreso(egreso, user_id)
+    return idem.ejecutar(lambda: servicio.create_egreso(egreso, user_id), egreso_schema.EgresoResponse)
 
 # 2. Listar Gastos
 @router.get("/", response_model=List[egreso_schema.EgresoResponse])
 def listar_gastos(
     skip: int = 0, 
     limit: int = 100,
-    servicio: EgresoService = Depends(get_egreso_service),
-    current_user: models.Usuario = Depends(get_current_user)
+    cursor: Optional[str] = Query(None, description="X-Next-Cursor de la página anterior (tiene prioridad sobre skip)."),
+    servicio: EgresoService = Depends(get_egreso_service)
 ):
-    # Validación de Lectura
-    if current_user.rol.nombre not in ROLES_LECTURA:
-         raise HTTPException(status_code=403, detail="No tiene acceso a este módulo.")
-
-    return servicio.get_egresos(skip=skip, limit=limit)
+    # El servicio ya arma EgresoResponse: solo serializar, sin re-validar
+    return responder_lista(egreso_schema.EgresoResponse, servicio.get_egresos(skip=skip, limit=limit, cursor=cursor), validado=True)
 
 # 3. Anular Gasto (DINÁMICO)
 @router.delete("/{id_egreso}", response_model=egreso_schema.EgresoResponse)
 def anular_gasto(
     id_egreso: int,
     servicio: EgresoService = Depends(get_egreso_service),
-    current_user: models.Usuario = Depends(get_current_user)
+    current_user: Principal = Depends(require_roles(ROLES_ADMIN, "Permisos insuficientes. Se requiere nivel Administrativo."))
 ):
     """
     Anula un gasto.
-    Seguridad: Validación contra la lista ROLES_ADMIN (SuperAdmin, AdminEdif).
+    Seguridad: require_roles(ROLES_ADMIN) (SuperAdmin, AdminEdif).
     """
-    # AQUI ESTA EL CAMBIO CLAVE
-    if current_user.rol.nombre not in ROLES_ADMIN:
-        raise HTTPException(
-            status_code=403, 
-            detail="Permisos insuficientes. Se requiere nivel Administrativo."
-        )
-
     return servicio.anular_egreso(id_egreso)
\ No newline at end of file
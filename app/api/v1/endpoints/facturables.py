@@ -1,14 +1,16 @@
-from fastapi import APIRouter, Depends, HTTPException, status, Body
+from fastapi import APIRouter, Depends, status, Body, Query
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
-from typing import List, Union
+from typing import List, Union, Optional
 
-from app.db.database import get_db
-from app.db import models
+from app.db.database import get_db, get_async_db
 from app.schemas import item_facturable_schema as schemas
 from app.services.item_facturable_service import ItemFacturableService
 
 # SEGURIDAD Y AUDITORÍA
-from app.core.deps import get_current_user
+from app.core.responses import responder_lista
+from app.core.deps import require_roles
+from app.core.principal_cache import Principal
 from app.core.config import ROLES_LECTURA, ROLES_ESCRITURA, ROLES_ADMIN
 
 # ----------------------------------------------------
@@ -17,10 +19,11 @@ from app.core.config import ROLES_LECTURA, ROLES_ESCRITURA, ROLES_ADMIN
 def get_item_facturable_service(db: Session = Depends(get_db)) -> ItemFacturableService:
     """Dependencia que inicializa y provee la instancia de ItemFacturableService."""
     return ItemFacturableService(db)
-    
+
 router = APIRouter(
     prefix="/facturables",
-    tags=["Items Facturables (Deuda Generada)"]
+    tags=["Items Facturables (Deuda Generada)"],
+    dependencies=[Depends(require_roles(ROLES_LECTURA))]
 )
 
 # ----------------------------------------------------
@@ -37,16 +40,14 @@ router = APIRouter(
 def create_item_facturable_endpoint(
     item: schemas.ItemFacturableCreate, 
     servicio: ItemFacturableService = Depends(get_item_facturable_service),
-    current_user: models.Usuario = Depends(get_current_user)
+    current_user: Principal = Depends(require_roles(ROLES_ESCRITURA, "No tiene permisos para generar deudas."))
 ):
     """
     Genera un nuevo Item Facturable (Deuda).
     Seguridad: Requiere rol de Escritura (Cajero, Admin).
     Auditoría: Registra al usuario creador.
     """
-    if current_user.rol.nombre not in ROLES_ESCRITURA:
-         raise HTTPException(status_code=403, detail="No tiene permisos para generar deudas.")
-         
+
     # Pasamos el ID del usuario al servicio para guardarlo en la BD
     return servicio.create_item(item, current_user.id_usuario)
 
@@ -56,42 +57,50 @@ def create_item_facturable_endpoint(
 def read_all_items_facturables_endpoint(
     skip: int = 0,
     limit: int = 100,
-    servicio: ItemFacturableService = Depends(get_item_facturable_service),
-    current_user: models.Usuario = Depends(get_current_user)
+    cursor: Optional[str] = Query(None, description="X-Next-Cursor de la página anterior (tiene prioridad sobre skip)."),
+    servicio: ItemFacturableService = Depends(get_item_facturable_service)
 ):
-    """Obtiene una lista paginada de todos los Items Facturables."""
-    if current_user.rol.nombre not in ROLES_LECTURA:
-         raise HTTPException(status_code=403, detail="Acceso denegado.")
-         
-    items = servicio.get_all_items(skip=skip, limit=limit)
-    return items
+    """Obtiene una lista paginada (cursor en X-Next-Cursor) de todos los Items Facturables."""
+    return responder_lista(schemas.ItemFacturable, servicio.get_all_items(skip=skip, limit=limit, cursor=cursor))
 
 @router.post("/search", response_model=List[schemas.ItemFacturable])
-def search_items_facturables_endpoint(
+async def search_items_facturables_endpoint(
     filters: schemas.ItemFacturableFilter,
     skip: int = 0,
     limit: int = 100,
-    servicio: ItemFacturableService = Depends(get_item_facturable_service),
-    current_user: models.Usuario = Depends(get_current_user)
+    cursor: Optional[str] = Query(None, description="X-Next-Cursor de la página anterior (tiene prioridad sobre skip)."),
+    db: AsyncSession = Depends(get_async_db)
 ):
     """Busqueda avanzada y filtrada."""
-    if current_user.rol.nombre not in ROLES_LECTURA:
-         raise HTTPException(status_code=403, detail="Acceso denegado.")
-         
-    return servicio.get_filtered_items(filters, skip=skip, limit=limit)
+    return await db.run_sync(lambda s: responder_lista(
+        schemas.ItemFacturable,
+        ItemFacturableService(s).get_filtered_items(filters, skip=skip, limit=limit, cursor=cursor)
+    ))
 
 
 @router.get("/unidad/{id_unidad}", response_model=List[schemas.ItemFacturable]) 
 def read_items_by_unidad_endpoint(
     id_unidad: int, 
-    servicio: ItemFacturableService = Depends(get_item_facturable_service),
-    current_user: models.Usuario = Depends(get_current_user)
+    servicio: ItemFacturableService = Depends(get_item_facturable_service)
 ):
     """Obtiene TODAS las deudas de una Unidad específica."""
-    if current_user.rol.nombre not in ROLES_LECTURA:
-         raise HTTPException(status_code=403, detail="Acceso denegado.")
-         
-    return servicio.get_items_by_unidad(id_unidad)
+    return responder_lista(schemas.ItemFacturable, servicio.get_items_by_unidad(id_unidad))
+
+# --- 5. TAREA PROGRAMADA / MANTENIMIENTO ---
+# Nota: Se declara ANTES de "/{item_id}" para que la ruta fija no sea capturada por el parámetro.
+
+@router.patch("/overdue-check", response_model=schemas.OverdueCheckResult)
+def run_overdue_check_endpoint(
+    limite_ids: int = Query(100, ge=0, le=1000, description="Máximo de IDs a devolver en la muestra."),
+    servicio: ItemFacturableService = Depends(get_item_facturable_service),
+    current_user: Principal = Depends(require_roles(ROLES_ADMIN, "Proceso reservado para administradores."))
+):
+    """
+    Ejecuta manualmente el barrido de vencimientos (el mismo que corre el programador nocturno).
+    Devuelve conteos, no la lista completa de objetos.
+    """
+
+    return servicio.check_for_overdue(limite_ids=limite_ids)
 
 # --- 3. ACTUALIZACIÓN (SOLO ADMIN) ---
 
@@ -100,16 +109,14 @@ def update_item_facturable_endpoint(
     item_id: int, 
     item_in: schemas.ItemFacturableUpdate,
     servicio: ItemFacturableService = Depends(get_item_facturable_service),
-    current_user: models.Usuario = Depends(get_current_user)
+    current_user: Principal = Depends(require_roles(ROLES_ADMIN, "Solo administradores pueden modificar deudas."))
 ):
     """
     Actualiza un Item Facturable.
     Seguridad: Solo Administradores.
     Auditoría: Registra quién modificó.
     """
-    if current_user.rol.nombre not in ROLES_ADMIN:
-         raise HTTPException(status_code=403, detail="Solo administradores pueden modificar deudas.")
-         
+
     return servicio.update_item(item_id, item_in, current_user.id_usuario)
 
 
@@ -120,44 +127,27 @@ def apply_payment_to_item_endpoint(
     item_id: int,
     monto_pago: float = Body(..., ge=0.01, description="Monto del pago a aplicar."), 
     servicio: ItemFacturableService = Depends(get_item_facturable_service),
-    current_user: models.Usuario = Depends(get_current_user)
+    current_user: Principal = Depends(require_roles(ROLES_ADMIN, "Acceso restringido. Use el módulo de Cobranza."))
 ):
     """
     Aplica un pago manual directo.
     Seguridad: Solo Admin (Cajeros deben usar el módulo de Ingresos).
     """
-    if current_user.rol.nombre not in ROLES_ADMIN:
-         raise HTTPException(status_code=403, detail="Acceso restringido. Use el módulo de Cobranza.")
-         
+
     return servicio.apply_payment(item_id, monto_pago, current_user.id_usuario)
 
 @router.patch("/{item_id}/cancel", response_model=schemas.ItemFacturable)
 def cancel_item_facturable_endpoint(
     item_id: int,
     servicio: ItemFacturableService = Depends(get_item_facturable_service),
-    current_user: models.Usuario = Depends(get_current_user)
+    current_user: Principal = Depends(require_roles(ROLES_ADMIN, "Solo administradores pueden anular deudas."))
 ):
     """
     Cancela (anula) un Item Facturable.
     Seguridad: Solo Admin.
     """
-    if current_user.rol.nombre not in ROLES_ADMIN:
-         raise HTTPException(status_code=403, detail="Solo administradores pueden anular deudas.")
-         
-    return servicio.cancel_item(item_id, current_user.id_usuario)
 
-# --- 5. TAREA PROGRAMADA / MANTENIMIENTO ---
-
-@router.patch("/overdue-check", response_model=List[schemas.ItemFacturable])
-def run_overdue_check_endpoint(
-    servicio: ItemFacturableService = Depends(get_item_facturable_service),
-    current_user: models.Usuario = Depends(get_current_user)
-):
-    """Simula la ejecución del trabajo CRON."""
-    if current_user.rol.nombre not in ROLES_ADMIN:
-         raise HTTPException(status_code=403, detail="Proceso reservado para administradores.")
-         
-    return servicio.check_for_overdue()
+    return servicio.cancel_item(item_id, current_user.id_usuario)
 
 # --- 6. GENERACIÓN MASIVA / INTELIGENTE (SOLO ADMIN) ---
 
@@ -165,36 +155,30 @@ def run_overdue_check_endpoint(
 def generar_cuota_automatica_endpoint(
     datos: schemas.GenerarCuotaRequest, 
     servicio: ItemFacturableService = Depends(get_item_facturable_service),
-    current_user: models.Usuario = Depends(get_current_user)
+    current_user: Principal = Depends(require_roles(ROLES_ADMIN, "Permiso denegado."))
 ):
     """Genera una nueva cuota para una unidad."""
-    if current_user.rol.nombre not in ROLES_ADMIN:
-         raise HTTPException(status_code=403, detail="Permiso denegado.")
-         
+
     return servicio.generar_cuota_con_cruce(datos, current_user.id_usuario)
 
 @router.post("/generar-masivo", status_code=201)
 def generar_cuotas_masivas_endpoint(
     datos: schemas.GenerarMasivoRequest, 
     servicio: ItemFacturableService = Depends(get_item_facturable_service),
-    current_user: models.Usuario = Depends(get_current_user)
+    current_user: Principal = Depends(require_roles(ROLES_ADMIN, "Permiso denegado."))
 ):
     """Genera un bloque de cuotas."""
-    if current_user.rol.nombre not in ROLES_ADMIN:
-         raise HTTPException(status_code=403, detail="Permiso denegado.")
-         
+
     return servicio.generar_cuotas_masivas(datos, current_user.id_usuario)
 
 @router.post("/generar-global", status_code=200)
 def generar_cuotas_globales_endpoint(
     datos: schemas.GenerarGlobalRequest, 
     servicio: ItemFacturableService = Depends(get_item_facturable_service),
-    current_user: models.Usuario = Depends(get_current_user)
+    current_user: Principal = Depends(require_roles(ROLES_ADMIN, "Solo SuperAdmin puede ejecutar la generación global."))
 ):
     """El Botón Maestro."""
-    if current_user.rol.nombre not in ROLES_ADMIN:
-         raise HTTPException(status_code=403, detail="Solo SuperAdmin puede ejecutar la generación global.")
-         
+
     return servicio.generar_cuotas_globales(datos, current_user.id_usuario)
 
 # Agrega este endpoint al final de facturables.py
@@ -203,13 +187,11 @@ def generar_cuotas_globales_endpoint(
 def generar_deuda_por_contrato_endpoint(
     datos: schemas.GenerarPorContratoRequest,
     servicio: ItemFacturableService = Depends(get_item_facturable_service),
-    current_user: models.Usuario = Depends(get_current_user)
+    current_user: Principal = Depends(require_roles(ROLES_ESCRITURA, "Permiso denegado."))
 ):
     """
     Genera un bloque de deudas para UN contrato específico a partir de una fecha.
     Útil para cargar historial (Ej: Generar Ene, Feb, Mar para el Depto 3J).
     """
-    if current_user.rol.nombre not in ROLES_ESCRITURA:
-         raise HTTPException(status_code=403, detail="Permiso denegado.")
-         
+
     return servicio.generar_retroactivo_contrato(datos, current_user.id_usuario)
\ No newline at end of file
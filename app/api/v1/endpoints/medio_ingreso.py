@@ -1,18 +1,20 @@
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, status, Request
 from sqlalchemy.orm import Session
 from typing import List
 
 from app.db.database import get_db
 from app.schemas import medio_ingreso_schema as schemas
 from app.services.medio_ingreso_service import MedioIngresoService
-from app.db import models
 # SEGURIDAD
-from app.core.deps import get_current_user
+from app.core.catalog_cache import responder_catalogo
+from app.core.deps import require_roles
+from app.core.principal_cache import Principal
 from app.core.config import ROLES_LECTURA, ROLES_ADMIN
 
 router = APIRouter(
     prefix="/medios-ingreso",
-    tags=["Medios de Ingreso"]
+    tags=["Medios de Ingreso"],
+    dependencies=[Depends(require_roles(ROLES_LECTURA))]
 )
 
 # Dependencia para inyectar el servicio
@@ -24,33 +26,29 @@ def get_service(db: Session = Depends(get_db)) -> MedioIngresoService:
 def create_medio_ingreso(
     medio_ingreso_in: schemas.MedioIngresoCreate,
     service: MedioIngresoService = Depends(get_service),
-    current_user: models.Usuario = Depends(get_current_user)
+    current_user: Principal = Depends(require_roles(ROLES_ADMIN, "Solo administradores pueden configurar medios de pago."))
 ):
-    if current_user.rol.nombre not in ROLES_ADMIN:
-         raise HTTPException(status_code=403, detail="Solo administradores pueden configurar medios de pago.")
     return service.create(medio_ingreso_in)
 
 # 2. LISTAR (Todos)
 @router.get("/", response_model=List[schemas.MedioIngreso])
 def read_medios_ingreso(
+    request: Request,
     skip: int = 0, 
     limit: int = 100, 
-    service: MedioIngresoService = Depends(get_service),
-    current_user: models.Usuario = Depends(get_current_user)
+    service: MedioIngresoService = Depends(get_service)
 ):
-    if current_user.rol.nombre not in ROLES_LECTURA:
-         raise HTTPException(status_code=403, detail="Acceso denegado.")
-    return service.get_all(skip=skip, limit=limit)
+    return responder_catalogo(
+        request, service.db, "medios_ingreso", schemas.MedioIngreso,
+        lambda: service.get_all(skip=skip, limit=limit)
+    )
 
 # 3. LEER UNO (Todos)
 @router.get("/{medio_ingreso_id}", response_model=schemas.MedioIngreso)
 def read_medio_ingreso(
     medio_ingreso_id: int, 
-    service: MedioIngresoService = Depends(get_service),
-    current_user: models.Usuario = Depends(get_current_user)
+    service: MedioIngresoService = Depends(get_service)
 ):
-    if current_user.rol.nombre not in ROLES_LECTURA:
-         raise HTTPException(status_code=403, detail="Acceso denegado.")
     return service.get_by_id(medio_ingreso_id)
 
 # 4. ACTUALIZAR (Solo Admin)
@@ -59,10 +57,8 @@ def update_medio_ingreso_endpoint(
     medio_ingreso_id: int, 
     medio_ingreso_in: schemas.MedioIngresoUpdate, 
     service: MedioIngresoService = Depends(get_service),
-    current_user: models.Usuario = Depends(get_current_user)
+    current_user: Principal = Depends(require_roles(ROLES_ADMIN, "No tiene permisos para modificar medios de pago."))
 ):
-    if current_user.rol.nombre not in ROLES_ADMIN:
-         raise HTTPException(status_code=403, detail="No tiene permisos para modificar medios de pago.")
     return service.update(medio_ingreso_id, medio_ingreso_in)
 
 # 5. ELIMINAR (Solo Admin)
@@ -70,8 +66,6 @@ def update_medio_ingreso_endpoint(
 def delete_medio_ingreso_endpoint(
     medio_ingreso_id: int, 
     service: MedioIngresoService = Depends(get_service),
-    current_user: models.Usuario = Depends(get_current_user)
+    current_user: Principal = Depends(require_roles(ROLES_ADMIN, "No tiene permisos para eliminar medios de pago."))
 ):
-    if current_user.rol.nombre not in ROLES_ADMIN:
-         raise HTTPException(status_code=403, detail="No tiene permisos para eliminar medios de pago.")
     service.delete(medio_ingreso_id)
\ No newline at end of file
@@ -1,14 +1,15 @@
 # Archivo: app/api/v1/endpoints/personas.py
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, status, Query, Response
 from sqlalchemy.orm import Session
-from typing import List
+from typing import List, Optional
 
 from app.db.database import get_db
-from app.db import models
 from app.schemas import persona_schema as schemas
 from app.services.persona_service import PersonaService, PersonaNotFoundError
 # SEGURIDAD
-from app.core.deps import get_current_user
+from app.core.pagination import exponer_cursor
+from app.core.deps import require_roles
+from app.core.principal_cache import Principal
 from app.core.config import ROLES_LECTURA, ROLES_ESCRITURA, ROLES_ADMIN
 
 def get_persona_service(db: Session = Depends(get_db)) -> PersonaService:
@@ -16,7 +17,8 @@ def get_persona_service(db: Session = Depends(get_db)) -> PersonaService:
 
 router = APIRouter(
     prefix="/personas",
-    tags=["Personas (Clientes, Administradores)"]
+    tags=["Personas (Clientes, Administradores)"],
+    dependencies=[Depends(require_roles(ROLES_LECTURA))]
 )
 
 # 1. CREAR Persona (Escritura)
@@ -24,11 +26,9 @@ router = APIRouter(
 def create_persona_endpoint(
     persona: schemas.PersonaCreate, 
     servicio: PersonaService = Depends(get_persona_service),
-    current_user: models.Usuario = Depends(get_current_user)
+    current_user: Principal = Depends(require_roles(ROLES_ESCRITURA, "No tiene permisos para crear personas."))
 ):
     """Crea un nuevo registro de Persona."""
-    if current_user.rol.nombre not in ROLES_ESCRITURA:
-         raise HTTPException(status_code=403, detail="No tiene permisos para crear personas.")
          
     return servicio.create_persona(persona)
 
@@ -36,12 +36,8 @@ def create_persona_endpoint(
 @router.get("/{persona_id}", response_model=schemas.Persona)
 def read_persona_endpoint(
     persona_id: int, 
-    servicio: PersonaService = Depends(get_persona_service),
-    current_user: models.Usuario = Depends(get_current_user)
+    servicio: PersonaService = Depends(get_persona_service)
 ):
-    if current_user.rol.nombre not in ROLES_LECTURA:
-         raise HTTPException(status_code=403, detail="Acceso denegado.")
-         
     db_persona = servicio.get_persona_by_id(persona_id=persona_id)
     if db_persona is None:
         raise HTTPException(status_code=404, detail=f"Persona con ID {persona_id} no encontrada")
@@ -50,27 +46,22 @@ def read_persona_endpoint(
 # 3. LISTAR Personas (Lectura)
 @router.get("/", response_model=List[schemas.Persona])
 def read_personas_endpoint(
+    response: Response,
     skip: int = 0,
     limit: int = 100,
-    servicio: PersonaService = Depends(get_persona_service),
-    current_user: models.Usuario = Depends(get_current_user)
+    cursor: Optional[str] = Query(None, description="X-Next-Cursor de la página anterior (tiene prioridad sobre skip)."),
+    servicio: PersonaService = Depends(get_persona_service)
 ):
-    if current_user.rol.nombre not in ROLES_LECTURA:
-         raise HTTPException(status_code=403, detail="Acceso denegado.")
-         
-    return servicio.get_all_personas(skip=skip, limit=limit)
+    return exponer_cursor(response, servicio.get_all_personas(skip=skip, limit=limit, cursor=cursor))
 
 # 4. BÚSQUEDA AVANZADA (Lectura)
 @router.get("/filter/", response_model=List[schemas.Persona])
 def filter_personas_endpoint(
     filters: schemas.PersonaFilter = Depends(), 
-    servicio: PersonaService = Depends(get_persona_service),
-    current_user: models.Usuario = Depends(get_current_user)
+    limit: int = Query(100, ge=1, le=500),
+    servicio: PersonaService = Depends(get_persona_service)
 ):
-    if current_user.rol.nombre not in ROLES_LECTURA:
-         raise HTTPException(status_code=403, detail="Acceso denegado.")
-         
-    return servicio.get_filtered_personas(filters)
+    return servicio.get_filtered_personas(filters, limit=limit)
 
 # 5. ACTUALIZAR Persona (Escritura)
 @router.patch("/{persona_id}", response_model=schemas.Persona)
@@ -78,11 +69,9 @@ def update_persona_endpoint(
     persona_id: int,
     persona_in: schemas.PersonaUpdate,
     servicio: PersonaService = Depends(get_persona_service),
-    current_user: models.Usuario = Depends(get_current_user)
+    current_user: Principal = Depends(require_roles(ROLES_ESCRITURA, "No tiene permisos para editar personas."))
 ):
     """Actualiza los datos de una Persona."""
-    if current_user.rol.nombre not in ROLES_ESCRITURA:
-         raise HTTPException(status_code=403, detail="No tiene permisos para editar personas.")
          
     try:
         return servicio.update_persona(persona_id, persona_in)
@@ -94,11 +83,9 @@ def update_persona_endpoint(
 def soft_delete_persona_endpoint(
     persona_id: int,
     servicio: PersonaService = Depends(get_persona_service),
-    current_user: models.Usuario = Depends(get_current_user)
+    current_user: Principal = Depends(require_roles(ROLES_ADMIN, "Solo Administradores pueden dar de baja personas."))
 ):
     """Baja lógica de Persona. Solo Admins."""
-    if current_user.rol.nombre not in ROLES_ADMIN:
-         raise HTTPException(status_code=403, detail="Solo Administradores pueden dar de baja personas.")
          
     try:
         return servicio.soft_delete_persona(persona_id)
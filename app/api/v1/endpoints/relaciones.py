@@ -1,15 +1,16 @@
 # Archivo: app/api/v1/endpoints/relaciones.py
-from fastapi import APIRouter, Depends, HTTPException, status, Query
+from fastapi import APIRouter, Depends, HTTPException, status, Query, Response
 from sqlalchemy.orm import Session
 from typing import List, Optional
 
 from app.db.database import get_db
-from app.db import models
 from app.schemas import relacion_cliente_schema as schemas
 from app.services.relacion_cliente_service import RelacionClienteService, NotFoundError # Importamos la excepción
 
 # SEGURIDAD
-from app.core.deps import get_current_user
+from app.core.pagination import exponer_cursor
+from app.core.deps import require_roles
+from app.core.principal_cache import Principal
 from app.core.config import ROLES_LECTURA, ROLES_ESCRITURA, ROLES_ADMIN
 
 # ----------------------------------------------------
@@ -21,7 +22,8 @@ def get_relacion_cliente_service(db: Session = Depends(get_db)) -> RelacionClien
     
 router = APIRouter(
     prefix="/relaciones",
-    tags=["Relaciones Cliente-Servicio"]
+    tags=["Relaciones Cliente-Servicio"],
+    dependencies=[Depends(require_roles(ROLES_LECTURA))]
 )
 
 # ----------------------------------------------------
@@ -36,14 +38,12 @@ router = APIRouter(
 def create_relacion_endpoint(
     relacion: schemas.RelacionClienteCreate, 
     servicio: RelacionClienteService = Depends(get_relacion_cliente_service),
-    current_user: models.Usuario = Depends(get_current_user)
+    current_user: Principal = Depends(require_roles(ROLES_ESCRITURA, "No tiene permisos para crear relación"))
 ):
     """
     Crea una nueva Relación Cliente-Unidad de Servicio.
     Verifica que el ID de Persona y el ID de Unidad de Servicio existan.    
     """
-    if current_user.rol.nombre not in ROLES_ESCRITURA:
-        raise HTTPException(status_code=403, detail="No tiene permisos para crear relación")   
 
     try:
         return servicio.create_relacion(relacion)
@@ -63,11 +63,8 @@ def create_relacion_endpoint(
 )
 def read_relacion_endpoint(
     relacion_id: int, 
-    servicio: RelacionClienteService = Depends(get_relacion_cliente_service),
-    current_user: models.Usuario = Depends(get_current_user)
+    servicio: RelacionClienteService = Depends(get_relacion_cliente_service)
 ):
-    if current_user.rol.nombre not in ROLES_LECTURA:
-         raise HTTPException(status_code=403, detail="Acceso denegado.")
     """Obtiene una Relación Cliente-Servicio específica por su ID único."""
     try:
         db_relacion = servicio.get_relacion_by_id(relacion_id=relacion_id)
@@ -85,24 +82,23 @@ def read_relacion_endpoint(
     summary="Lista todas las Relaciones, con filtros dinámicos"
 )
 def read_relaciones_endpoint(
+    response: Response,
     # Filtros dinámicos inyectados como query parameters (FastAPI lo hace automáticamente)
     filtros: schemas.RelacionClienteFilter = Depends(), 
     # Paginación (opcional)
     skip: int = Query(0, description="Número de registros a omitir (offset)."),  
     limit: int = Query(100, description="Límite de registros a devolver."),  
-    servicio: RelacionClienteService = Depends(get_relacion_cliente_service),
-    current_user: models.Usuario = Depends(get_current_user)
+    cursor: Optional[str] = Query(None, description="X-Next-Cursor de la página anterior (tiene prioridad sobre skip)."),
+    servicio: RelacionClienteService = Depends(get_relacion_cliente_service)
 ):
-    if current_user.rol.nombre not in ROLES_LECTURA:
-         raise HTTPException(status_code=403, detail="Acceso denegado.")
     """
     Obtiene una lista paginada de todas las Relaciones. 
     Permite filtrar por id_persona, id_unidad, estado, tipo_relacion y rango de fechas.
     """
     # La funcionalidad del endpoint /persona/{persona_id} ahora está cubierta aquí:
     # Ejemplo: GET /relaciones?id_persona=123
-    relaciones = servicio.get_all_relaciones(filtros=filtros, skip=skip, limit=limit)
-    return relaciones
+    relaciones = servicio.get_all_relaciones(filtros=filtros, skip=skip, limit=limit, cursor=cursor)
+    return exponer_cursor(response, relaciones)
 
 # ----------------------------------------------------
 # 4. PATCH (ACTUALIZAR PARCIALMENTE)
@@ -116,13 +112,11 @@ def update_relacion_endpoint(
     relacion_id: int,
     relacion_update: schemas.RelacionClienteUpdate, 
     servicio: RelacionClienteService = Depends(get_relacion_cliente_service),
-    current_user: models.Usuario = Depends(get_current_user)
+    current_user: Principal = Depends(require_roles(ROLES_ESCRITURA, "No tiene permisos para editar relación."))
 ):
     """
     Actualiza uno o varios campos de una Relación Cliente-Servicio existente.
     """
-    if current_user.rol.nombre not in ROLES_ESCRITURA:
-         raise HTTPException(status_code=403, detail="No tiene permisos para editar relación.")
     try:
         return servicio.update_relacion(relacion_id=relacion_id, relacion_update=relacion_update)
     except NotFoundError as e:
@@ -142,14 +136,12 @@ def update_relacion_endpoint(
 def delete_relacion_endpoint(
     relacion_id: int, 
     servicio: RelacionClienteService = Depends(get_relacion_cliente_service),
-    current_user: models.Usuario = Depends(get_current_user)
+    current_user: Principal = Depends(require_roles(ROLES_ADMIN, "Solo Administradores pueden dar de baja relaciones."))
 ):
     """
     Desactiva (Borrado Lógico) una Relación Cliente-Servicio, 
     estableciendo su estado a "Inactivo" y una fecha de fin (si aplica).
     """
-    if current_user.rol.nombre not in ROLES_ADMIN:
-         raise HTTPException(status_code=403, detail="Solo Administradores pueden dar de baja relaciones.")
     try:
         return servicio.delete_relacion(relacion_id=relacion_id)
     except NotFoundError as e:
@@ -1,49 +1,113 @@
-from fastapi import APIRouter, Depends, HTTPException, status
-from sqlalchemy.orm import Session
-from typing import List 
+from fastapi import APIRouter, Depends, status, Query
+from sqlalchemy.ext.asyncio import AsyncSession
+from typing import List, Literal
 
-from app.db.database import get_db
-from app.db import models  # Necesario para el usuario
 from app.schemas import reporte_schema
 from app.services.reporte_service import ReporteService
+from app.services.resumen_relacion_service import ResumenRelacionService
 
 # SEGURIDAD
-from app.core.deps import get_current_user
+from app.core.responses import responder_lista, responder_objeto
+from app.core.deps import get_async_read_db, require_roles
 from app.core.config import ROLES_LECTURA
 
 router = APIRouter(
     prefix="/reportes",
-    tags=["Reportes y Estados de Cuenta"]
+    tags=["Reportes y Estados de Cuenta"],
+    dependencies=[Depends(require_roles(ROLES_LECTURA))]
 )
 
 # 1. ESTADO DE CUENTA INDIVIDUAL (CLIENTE)
 @router.get("/estado-cuenta/{id_persona}", response_model=reporte_schema.EstadoCuentaResponse)
-def obtener_estado_cuenta_endpoint(
+async def obtener_estado_cuenta_endpoint(
     id_persona: int,
-    db: Session = Depends(get_db),
-    current_user: models.Usuario = Depends(get_current_user)
+    db: AsyncSession = Depends(get_async_read_db)
 ):
     """
     Obtiene la fotografía financiera completa de una persona.
     Requiere: Rol de Lectura (Cajero, Admin).
     """
-    if current_user.rol.nombre not in ROLES_LECTURA:
-         raise HTTPException(status_code=403, detail="Acceso denegado.")
 
-    service = ReporteService(db)
-    return service.obtener_estado_cuenta(id_persona)
+    return await db.run_sync(lambda s: responder_objeto(
+        reporte_schema.EstadoCuentaResponse, ReporteService(s).obtener_estado_cuenta(id_persona)
+    ))
+
+# 1.1 ESTADOS DE CUENTA POR LOTE (ENVÍOS MENSUALES)
+@router.post("/estado-cuenta/lote", response_model=List[reporte_schema.EstadoCuentaResponse])
+async def obtener_estados_cuenta_lote_endpoint(
+    datos: reporte_schema.EstadoCuentaLoteRequest,
+    db: AsyncSession = Depends(get_async_read_db)
+):
+    """
+    Genera los estados de cuenta de varias personas en una sola llamada
+    (número fijo de consultas). Las personas inexistentes se omiten.
+    """
+
+    return await db.run_sync(lambda s: responder_lista(
+        reporte_schema.EstadoCuentaResponse,
+        list(ReporteService(s).obtener_estados_cuenta(datos.ids_persona).values())
+    ))
 
 # 2. DASHBOARD DE MOROSIDAD (ADMINISTRADOR)
 @router.get("/morosidad", response_model=List[reporte_schema.MorosoResponse])
-def obtener_dashboard_morosos_endpoint(
-    db: Session = Depends(get_db),
-    current_user: models.Usuario = Depends(get_current_user)
+async def obtener_dashboard_morosos_endpoint(
+    skip: int = Query(0, ge=0),
+    limit: int = Query(100, ge=1, le=1000),
+    ordenar_por: Literal["total_deuda", "cantidad_meses", "dias_atraso", "identificador"] = Query("total_deuda"),
+    descendente: bool = Query(True),
+    dias_minimos: int = Query(1, ge=1, description="Solo deudas con al menos N días de atraso."),
+    incluir_detalles: bool = Query(True),
+    db: AsyncSession = Depends(get_async_read_db)
+):
+    """
+    Devuelve la 'Lista Negra': Inquilinos con deudas VENCIDAS, agrupados por unidad.
+    Paginado y ordenable (por defecto: mayor deuda primero).
+    """
+
+    morosos = await db.run_sync(lambda s: ReporteService(s).obtener_lista_morosos(
+        skip=skip,
+        limit=limit,
+        ordenar_por=ordenar_por,
+        descendente=descendente,
+        dias_minimos=dias_minimos,
+        incluir_detalles=incluir_detalles
+    ))
+    # El servicio ya arma MorosoResponse: solo serializar, sin re-validar
+    return responder_lista(reporte_schema.MorosoResponse, morosos, validado=True)
+
+# 3. RESUMEN POR CONTRATO (TABLA MATERIALIZADA resumen_relacion)
+@router.get("/resumen-contratos", response_model=List[reporte_schema.ResumenContratoResponse])
+async def obtener_resumen_contratos_endpoint(
+    skip: int = Query(0, ge=0),
+    limit: int = Query(100, ge=1, le=1000),
+    solo_morosos: bool = Query(False, description="Solo contratos con deuda vencida."),
+    solo_activos: bool = Query(True),
+    ordenar_por: Literal["total_vencido", "total_pendiente", "vencimiento_mas_antiguo", "identificador"] = Query("total_vencido"),
+    db: AsyncSession = Depends(get_async_read_db)
+):
+    """
+    Dashboard liviano: una fila precalculada por contrato (no agrega item_facturable).
+    """
+
+    filas = await db.run_sync(lambda s: ResumenRelacionService(s).listar(
+        skip=skip,
+        limit=limit,
+        solo_morosos=solo_morosos,
+        solo_activos=solo_activos,
+        ordenar_por=ordenar_por
+    ))
+    return responder_lista(reporte_schema.ResumenContratoResponse, filas, validado=True)
+
+# 4. ANTIGÜEDAD DE SALDOS (CUENTAS POR COBRAR)
+@router.get("/antiguedad", response_model=reporte_schema.ReporteAntiguedadResponse)
+async def obtener_antiguedad_endpoint(
+    agrupar_por: Literal["unidad", "concepto", "periodo"] = Query("unidad"),
+    db: AsyncSession = Depends(get_async_read_db)
 ):
     """
-    Devuelve la 'Lista Negra': Todos los inquilinos con deudas VENCIDAS.
+    Deuda vencida por tramos de atraso (0-30, 31-60, 61-90, +90 días), con totales
+    generales y por unidad, concepto o periodo. Cacheado por día; se recalcula tras cada pago.
     """
-    if current_user.rol.nombre not in ROLES_LECTURA:
-         raise HTTPException(status_code=403, detail="Acceso denegado.")
 
-    service = ReporteService(db)
-    return service.obtener_lista_morosos()
\ No newline at end of file
+    reporte = await db.run_sync(lambda s: ReporteService(s).obtener_antiguedad(agrupar_por))
+    return responder_objeto(reporte_schema.ReporteAntiguedadResponse, reporte, validado=True)
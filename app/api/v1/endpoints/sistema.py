@@ -0,0 +1,23 @@
+# Archivo: app/api/v1/endpoints/sistema.py
+from fastapi import APIRouter, Depends
+
+from app.db.database import engine
+from app.core.deps import require_roles
+from app.core.config import ROLES_ADMIN
+
+router = APIRouter(
+    prefix="/sistema",
+    tags=["Sistema y Diagnóstico"],
+    dependencies=[Depends(require_roles(ROLES_ADMIN))]
+)
+
+@router.get("/pool")
+def ver_estadisticas_pool():
+    """
+    Estado del pool de conexiones de ESTE worker (checked-out, overflow,
+    esperas y tiempos). Sirve para dimensionar DB_POOL_SIZE / DB_MAX_OVERFLOW.
+    """
+    pool = engine.pool
+    if hasattr(pool, "estadisticas"):
+        return pool.estadisticas()
+    return {"status": pool.status()}
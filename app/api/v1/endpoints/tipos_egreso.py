@@ -1,4 +1,4 @@
-from fastapi import APIRouter, Depends, status, HTTPException, Query
+from fastapi import APIRouter, Depends, status, Query, Request
 from sqlalchemy.orm import Session
 from typing import List
 
@@ -6,9 +6,10 @@ from typing import List
 from app.db.database import get_db
 from app.schemas import tipo_egreso_schema as schemas
 from app.services.tipo_egreso_service import TipoEgresoService
-from app.db import models
 # SEGURIDAD
-from app.core.deps import get_current_user
+from app.core.catalog_cache import responder_catalogo
+from app.core.deps import require_roles
+from app.core.principal_cache import Principal
 from app.core.config import ROLES_LECTURA, ROLES_ADMIN
 
 # ----------------------------------------------------
@@ -19,7 +20,8 @@ def get_tipo_egreso_service(db: Session = Depends(get_db)) -> TipoEgresoService:
 
 router = APIRouter(
     prefix="/tipos-egreso",
-    tags=["Catálogo - Tipos de Egreso"]
+    tags=["Catálogo - Tipos de Egreso"],
+    dependencies=[Depends(require_roles(ROLES_LECTURA))]
 )
 
 # ----------------------------------------------------
@@ -29,11 +31,9 @@ router = APIRouter(
 def create_tipo_egreso_endpoint(
     tipo: schemas.TipoEgresoCreate,
     servicio: TipoEgresoService = Depends(get_tipo_egreso_service),
-    current_user: models.Usuario = Depends(get_current_user)
+    current_user: Principal = Depends(require_roles(ROLES_ADMIN, "Solo administradores pueden crear tipos de egreso."))
 ):
     """Crea un nuevo Tipo de Egreso (Ej: Luz, Agua, Mantenimiento)."""
-    if current_user.rol.nombre not in ROLES_ADMIN:
-         raise HTTPException(status_code=403, detail="Solo administradores pueden crear tipos de egreso.")
 
     return servicio.create(tipo_in=tipo)
 
@@ -42,17 +42,17 @@ def create_tipo_egreso_endpoint(
 # ----------------------------------------------------
 @router.get("/", response_model=List[schemas.TipoEgreso])
 def read_tipos_egreso_endpoint(
+    request: Request,
     skip: int = 0,
     limit: int = 100,
     include_inactive: bool = Query(False, description="Incluir Tipos de Egreso inactivos."),
-    servicio: TipoEgresoService = Depends(get_tipo_egreso_service),
-    current_user: models.Usuario = Depends(get_current_user)
+    servicio: TipoEgresoService = Depends(get_tipo_egreso_service)
 ):
-    """Obtiene la lista de todos los Tipos de Egreso."""
-    if current_user.rol.nombre not in ROLES_LECTURA:
-         raise HTTPException(status_code=403, detail="Acceso denegado.")
-         
-    return servicio.get_all(skip=skip, limit=limit, include_inactive=include_inactive)
+    """Obtiene la lista de todos los Tipos de Egreso (desde caché, con ETag)."""
+    return responder_catalogo(
+        request, servicio.db, "tipos_egreso", schemas.TipoEgreso,
+        lambda: servicio.get_all(skip=skip, limit=limit, include_inactive=include_inactive)
+    )
 
 # ----------------------------------------------------
 # 3. LEER POR ID (GET /{id}) - Todos
@@ -60,12 +60,8 @@ def read_tipos_egreso_endpoint(
 @router.get("/{tipo_egreso_id}", response_model=schemas.TipoEgreso)
 def read_tipo_egreso_by_id_endpoint(
     tipo_egreso_id: int, 
-    servicio: TipoEgresoService = Depends(get_tipo_egreso_service),
-    current_user: models.Usuario = Depends(get_current_user)
+    servicio: TipoEgresoService = Depends(get_tipo_egreso_service)
 ):
-    if current_user.rol.nombre not in ROLES_LECTURA:
-         raise HTTPException(status_code=403, detail="Acceso denegado.")
-
     return servicio.get_by_id(tipo_egreso_id=tipo_egreso_id)
 
 # ----------------------------------------------------
@@ -76,11 +72,9 @@ def update_tipo_egreso_endpoint(
     tipo_egreso_id: int,
     tipo: schemas.TipoEgresoUpdate,
     servicio: TipoEgresoService = Depends(get_tipo_egreso_service),
-    current_user: models.Usuario = Depends(get_current_user)
+    current_user: Principal = Depends(require_roles(ROLES_ADMIN, "No tiene permisos para modificar tipos de egreso."))
 ):
     """Actualiza completamente un Tipo de Egreso existente."""
-    if current_user.rol.nombre not in ROLES_ADMIN:
-         raise HTTPException(status_code=403, detail="No tiene permisos para modificar tipos de egreso.")
 
     return servicio.update(tipo_egreso_id=tipo_egreso_id, tipo_in=tipo)
 
@@ -91,11 +85,9 @@ def update_tipo_egreso_endpoint(
 def soft_delete_tipo_egreso_endpoint(
     tipo_egreso_id: int,
     servicio: TipoEgresoService = Depends(get_tipo_egreso_service),
-    current_user: models.Usuario = Depends(get_current_user)
+    current_user: Principal = Depends(require_roles(ROLES_ADMIN, "No tiene permisos para eliminar tipos de egreso."))
 ):
     """Desactiva lógicamente un Tipo de Egreso."""
-    if current_user.rol.nombre not in ROLES_ADMIN:
-         raise HTTPException(status_code=403, detail="No tiene permisos para eliminar tipos de egreso.")
 
     return servicio.soft_delete(tipo_egreso_id=tipo_egreso_id)
 
@@ -106,10 +98,8 @@ def soft_delete_tipo_egreso_endpoint(
 def activate_tipo_egreso_endpoint(
     tipo_egreso_id: int,
     servicio: TipoEgresoService = Depends(get_tipo_egreso_service),
-    current_user: models.Usuario = Depends(get_current_user)
+    current_user: Principal = Depends(require_roles(ROLES_ADMIN, "No tiene permisos para reactivar tipos de egreso."))
 ):
     """Activa lógicamente un Tipo de Egreso que fue desactivado."""
-    if current_user.rol.nombre not in ROLES_ADMIN:
-         raise HTTPException(status_code=403, detail="No tiene permisos para reactivar tipos de egreso.")
 
     return servicio.activate(tipo_egreso_id=tipo_egreso_id)
\ No newline at end of file
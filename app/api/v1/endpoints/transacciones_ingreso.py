@@ -1,13 +1,24 @@
 # Archivo: app/api/v1/endpoints/transacciones_ingreso.py
-from fastapi import APIRouter, Depends, HTTPException, status, Query
+import io
+import json
+import shutil
+import tempfile
+
+from fastapi import APIRouter, Depends, HTTPException, status, Query, File, Form, UploadFile
+from fastapi.responses import StreamingResponse
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
-from typing import List
+from typing import List, Optional
 
-from app.db.database import get_db
-from app.db import models
+from app.db.database import get_db, get_async_db
 from app.schemas import transaccion_ingreso_schema as schemas
 from app.services.transaccion_ingreso_service import TransaccionIngresoService
-from app.core.deps import get_current_user
+from app.services.importacion_pagos_service import ImportacionPagosService
+from app.schemas.importacion_pagos_schema import ResumenImportacion
+from app.core.responses import responder_lista, responder_objeto
+from app.core.deps import require_roles
+from app.core.idempotency import Idempotencia, idempotencia
+from app.core.principal_cache import Principal
 # IMPORTAR LISTAS DE ROLES
 from app.core.config import ROLES_LECTURA, ROLES_ESCRITURA, ROLES_ADMIN
 
@@ -16,7 +27,8 @@ def get_transaccion_ingreso_service(db: Session = Depends(get_db)) -> Transaccio
     
 router = APIRouter(
     prefix="/transacciones-ingreso",
-    tags=["Transacciones de Ingreso (Pagos Recibidos)"]
+    tags=["Transacciones de Ingreso (Pagos Recibidos)"],
+    dependencies=[Depends(require_roles(ROLES_LECTURA))]
 )
 
 # ----------------------------------------------------
@@ -26,68 +38,124 @@ router = APIRouter(
 def create_transaccion_endpoint(
     transaccion: schemas.TransaccionIngresoCreate, 
     servicio: TransaccionIngresoService = Depends(get_transaccion_ingreso_service),
-    current_user: models.Usuario = Depends(get_current_user)
+    current_user: Principal = Depends(require_roles(ROLES_ESCRITURA, "No tiene permisos para registrar cobros.")),
+    idem: Idempotencia = Depends(idempotencia)
 ):
     """
     Registrar un nuevo cobro.
     Seguridad: Requiere ROLES_ESCRITURA.
+    Con cabecera Idempotency-Key, un reintento devuelve el cobro ya registrado.
     """
-    if current_user.rol.nombre not in ROLES_ESCRITURA:
-         raise HTTPException(status_code=403, detail="No tiene permisos para registrar cobros.")
 
     # Extraemos el ID real del token y lo pasamos al servicio
     user_id = current_user.id_usuario
-    return servicio.create_transaccion(transaccion, user_id)
+    return idem.ejecutar(lambda: servicio.create_transaccion(transaccion, user_id), schemas.TransaccionIngreso)
+
+# ----------------------------------------------------
+# 1.1 IMPORTACIÓN MASIVA (POST) - Solo Escritura
+# ----------------------------------------------------
+@router.post("/importar")
+def importar_extracto_endpoint(
+    archivo: UploadFile = File(..., description="Extracto bancario en CSV o JSON (arreglo o JSON Lines)."),
+    id_medio_ingreso: int = Form(..., description="Medio con el que se registran todos los pagos (Transferencia, QR...)."),
+    formato: Optional[str] = Form(None, description="'csv' o 'json'. Si se omite, se deduce de la extensión."),
+    db: Session = Depends(get_db),
+    current_user: Principal = Depends(require_roles(ROLES_ESCRITURA, "No tiene permisos para registrar cobros."))
+):
+    """
+    Concilia y aplica un extracto bancario completo.
+    Columnas: fecha, monto, referencia, unidad, id_relacion (opcional), descripcion (opcional).
+    Responde en streaming (NDJSON): una línea por fila del archivo con su estado
+    (aplicado / sin_coincidencia / duplicado / invalido / error) y al final {"resumen": {...}}.
+    Se confirma por lotes: si la conexión se corta, lo ya reportado como 'aplicado' quedó guardado.
+    """
+    formato = (formato or (archivo.filename or "").rsplit(".", 1)[-1]).lower()
+    if formato in ("ndjson", "jsonl"):
+        formato = "json"
+
+    # Copia propia del upload: FastAPI puede cerrar el UploadFile antes de que termine el streaming
+    copia = tempfile.SpooledTemporaryFile(max_size=1 << 20)
+    shutil.copyfileobj(archivo.file, copia)
+    copia.seek(0)
+    texto = io.TextIOWrapper(copia, encoding="utf-8-sig", newline="")
+
+    try:
+        resultados = ImportacionPagosService(db).importar(texto, formato, id_medio_ingreso, current_user.id_usuario)
+    except Exception:
+        texto.close()
+        raise
+
+    def generar_ndjson():
+        resumen = ResumenImportacion()
+        try:
+            for resultado in ImportacionPagosService.resumir(resultados, resumen):
+                yield resultado.model_dump_json(exclude_none=True) + "\n"
+            yield json.dumps({"resumen": resumen.model_dump()}) + "\n"
+        finally:
+            texto.close()
+
+    return StreamingResponse(generar_ndjson(), media_type="application/x-ndjson")
 
 # ----------------------------------------------------
 # 2. LISTAR (GET) - Solo Lectura
 # ----------------------------------------------------
 @router.get("/", response_model=List[schemas.TransaccionIngreso])
-def read_transacciones_endpoint(
+async def read_transacciones_endpoint(
     skip: int = Query(0, ge=0),
     limit: int = Query(100, le=100),
-    servicio: TransaccionIngresoService = Depends(get_transaccion_ingreso_service),
-    current_user: models.Usuario = Depends(get_current_user)
+    cursor: Optional[str] = Query(None, description="X-Next-Cursor de la página anterior (tiene prioridad sobre skip)."),
+    db: AsyncSession = Depends(get_async_db)
 ):
-    if current_user.rol.nombre not in ROLES_LECTURA:
-         raise HTTPException(status_code=403, detail="No tiene acceso a este módulo.")
+    return await db.run_sync(lambda s: responder_lista(
+        schemas.TransaccionIngreso,
+        TransaccionIngresoService(s).get_transacciones(skip=skip, limit=limit, cursor=cursor)
+    ))
 
-    return servicio.get_transacciones(skip=skip, limit=limit)
+@router.get("/resumen", response_model=List[schemas.TransaccionIngresoResumen])
+async def read_transacciones_resumen_endpoint(
+    skip: int = Query(0, ge=0),
+    limit: int = Query(100, le=500),
+    cursor: Optional[str] = Query(None, description="X-Next-Cursor de la página anterior (tiene prioridad sobre skip)."),
+    db: AsyncSession = Depends(get_async_db)
+):
+    """Listado liviano para tablas: sin detalles (no consulta detalle ni items)."""
+    return await db.run_sync(lambda s: responder_lista(
+        schemas.TransaccionIngresoResumen,
+        TransaccionIngresoService(s).get_transacciones(skip=skip, limit=limit, cursor=cursor, incluir_detalles=False)
+    ))
 
 # ----------------------------------------------------
 # 3. SIMULAR (GET) - Lectura
 # ----------------------------------------------------
 @router.get("/simular", response_model=schemas.ResultadoSimulacionIngreso)
-def simular_distribucion_endpoint(
+async def simular_distribucion_endpoint(
     id_persona: int = Query(...),
     id_unidad: int = Query(...),
     monto: float = Query(...),
     monto_cuota_mensual: float = Query(0.0),
-    servicio: TransaccionIngresoService = Depends(get_transaccion_ingreso_service),
-    current_user: models.Usuario = Depends(get_current_user)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """Calculadora de deuda. Solo lectura."""
-    if current_user.rol.nombre not in ROLES_LECTURA:
-         raise HTTPException(status_code=403, detail="No tiene acceso a simulaciones.")
 
-    return servicio.simular_ingreso(id_persona, id_unidad, monto, monto_cuota_mensual)
+    return await db.run_sync(
+        lambda s: TransaccionIngresoService(s).simular_ingreso(id_persona, id_unidad, monto, monto_cuota_mensual)
+    )
 
 # ----------------------------------------------------
 # 4. LEER POR ID (GET) - Lectura
 # ----------------------------------------------------
 @router.get("/{transaccion_id}", response_model=schemas.TransaccionIngreso)
-def read_transaccion_by_id_endpoint(
+async def read_transaccion_by_id_endpoint(
     transaccion_id: int, 
-    servicio: TransaccionIngresoService = Depends(get_transaccion_ingreso_service),
-    current_user: models.Usuario = Depends(get_current_user)
+    db: AsyncSession = Depends(get_async_db)
 ):
-    if current_user.rol.nombre not in ROLES_LECTURA:
-         raise HTTPException(status_code=403, detail="No tiene acceso.")
+    def leer(s: Session):
+        db_transaccion = TransaccionIngresoService(s).get_transaccion_by_id(transaccion_id=transaccion_id)
+        if db_transaccion is None:
+            raise HTTPException(status_code=404, detail="Transacción no encontrada")
+        return responder_objeto(schemas.TransaccionIngreso, db_transaccion)
 
-    db_transaccion = servicio.get_transaccion_by_id(transaccion_id=transaccion_id)
-    if db_transaccion is None:
-        raise HTTPException(status_code=404, detail="Transacción no encontrada")
-    return db_transaccion
+    return await db.run_sync(leer)
 
 # ----------------------------------------------------
 # 5. ANULAR (PATCH) - Solo Admins
@@ -96,14 +164,12 @@ def read_transaccion_by_id_endpoint(
 def anular_transaccion_ingreso_endpoint(
     transaccion_id: int,
     servicio: TransaccionIngresoService = Depends(get_transaccion_ingreso_service),
-    current_user: models.Usuario = Depends(get_current_user) 
+    current_user: Principal = Depends(require_roles(ROLES_ADMIN, "Se requiere nivel administrativo para anular.")) 
 ):
     """
     Anulación de cobro.
     Seguridad: Requiere ROLES_ADMIN.
     """
-    if current_user.rol.nombre not in ROLES_ADMIN:
-         raise HTTPException(status_code=403, detail="Se requiere nivel administrativo para anular.")
 
     return servicio.anular_transaccion(transaccion_id, current_user.id_usuario) 
 
@@ -114,9 +180,6 @@ def anular_transaccion_ingreso_endpoint(
 def delete_transaccion_ingreso_endpoint(
     transaccion_id: int,
     servicio: TransaccionIngresoService = Depends(get_transaccion_ingreso_service),
-    current_user: models.Usuario = Depends(get_current_user)
+    current_user: Principal = Depends(require_roles(ROLES_ADMIN, "Se requiere nivel administrativo para borrar."))
 ):
-    if current_user.rol.nombre not in ROLES_ADMIN:
-         raise HTTPException(status_code=403, detail="Se requiere nivel administrativo para borrar.")
-
     servicio.delete_transaccion(transaccion_id)
\ No newline at end of file
@@ -1,14 +1,15 @@
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, status, Query, Response
 from sqlalchemy.orm import Session
-from typing import List
+from typing import List, Optional
 
 from app.db.database import get_db
-from app.db import models
 from app.schemas import unidad_servicio_schema as schemas
 from app.services.unidad_servicio_service import UnidadServicioService
 
 # SEGURIDAD
-from app.core.deps import get_current_user
+from app.core.pagination import exponer_cursor
+from app.core.deps import require_roles
+from app.core.principal_cache import Principal
 from app.core.config import ROLES_LECTURA, ROLES_ESCRITURA, ROLES_ADMIN
 
 def get_unidad_servicio_service(db: Session = Depends(get_db)) -> UnidadServicioService:
@@ -16,7 +17,8 @@ def get_unidad_servicio_service(db: Session = Depends(get_db)) -> UnidadServicio
 
 router = APIRouter(
     prefix="/unidades",
-    tags=["Unidades de Servicio (Universal)"]
+    tags=["Unidades de Servicio (Universal)"],
+    dependencies=[Depends(require_roles(ROLES_LECTURA))]
 )
 
 # ----------------------------------------------------
@@ -26,21 +28,17 @@ router = APIRouter(
 def create_unidad_endpoint(
     unidad: schemas.UnidadServicioCreate, 
     servicio: UnidadServicioService = Depends(get_unidad_servicio_service),
-    current_user: models.Usuario = Depends(get_current_user)
+    current_user: Principal = Depends(require_roles(ROLES_ESCRITURA, "No tiene permisos para crear unidades de servicio."))
 ):
-    # 1. PRIMERO: SEGURIDAD
-    if current_user.rol.nombre not in ROLES_ESCRITURA:
-        raise HTTPException(status_code=403, detail="No tiene permisos para crear unidades de servicio.")       
-
-    # 2. LUEGO: LÓGICA
+    # Seguridad: resuelta por require_roles en la firma
     db_unidad = servicio.create_unidad(unidad)
-    
+
     if db_unidad is None:
         raise HTTPException(
             status_code=status.HTTP_409_CONFLICT, 
             detail="El identificador único de la Unidad de Servicio ya existe."
         )
-    
+
     return db_unidad
 
 # ----------------------------------------------------
@@ -49,12 +47,8 @@ def create_unidad_endpoint(
 @router.get("/{unidad_id}", response_model=schemas.UnidadServicio)
 def read_unidad_endpoint(
     unidad_id: int, 
-    servicio: UnidadServicioService = Depends(get_unidad_servicio_service),
-    current_user: models.Usuario = Depends(get_current_user)
+    servicio: UnidadServicioService = Depends(get_unidad_servicio_service)
 ):
-    if current_user.rol.nombre not in ROLES_LECTURA:
-         raise HTTPException(status_code=403, detail="Acceso denegado.")
-    
     db_unidad = servicio.get_unidad_by_id(unidad_id=unidad_id)
     if db_unidad is None:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Unidad de Servicio no encontrada")
@@ -66,21 +60,19 @@ def read_unidad_endpoint(
 # ----------------------------------------------------
 @router.get("/", response_model=List[schemas.UnidadServicio])
 def read_unidades_with_filters(
+    response: Response,
     skip: int = 0, 
     limit: int = 500, 
+    cursor: Optional[str] = Query(None, description="X-Next-Cursor de la página anterior (tiene prioridad sobre skip)."),
     filters: schemas.UnidadServicioFilter = Depends(), 
-    servicio: UnidadServicioService = Depends(get_unidad_servicio_service),
-    current_user: models.Usuario = Depends(get_current_user)
+    servicio: UnidadServicioService = Depends(get_unidad_servicio_service)
 ):
-    if current_user.rol.nombre not in ROLES_LECTURA:
-         raise HTTPException(status_code=403, detail="Acceso denegado.")
-    
     if filters.is_empty(): 
-        unidades = servicio.get_all_unidades(skip=skip, limit=limit)
+        unidades = servicio.get_all_unidades(skip=skip, limit=limit, cursor=cursor)
     else:
-        unidades = servicio.search_unidades(filters=filters, skip=skip, limit=limit)
-        
-    return unidades
+        unidades = servicio.search_unidades(filters=filters, skip=skip, limit=limit, cursor=cursor)
+
+    return exponer_cursor(response, unidades)
 
 # ----------------------------------------------------
 # 4. ACTUALIZACIÓN (PUT /unidades/{unidad_id})
@@ -90,16 +82,13 @@ def update_unidad_endpoint(
     unidad_id: int, 
     unidad: schemas.UnidadServicioUpdate,
     servicio: UnidadServicioService = Depends(get_unidad_servicio_service),
-    current_user: models.Usuario = Depends(get_current_user)
+    current_user: Principal = Depends(require_roles(ROLES_ESCRITURA, "No tiene permisos para editar unidades de servicio."))
 ):
-    if current_user.rol.nombre not in ROLES_ESCRITURA:
-         raise HTTPException(status_code=403, detail="No tiene permisos para editar unidades de servicio.")
-    
     db_unidad = servicio.update_unidad(unidad_id=unidad_id, unidad_in=unidad)
-    
+
     if db_unidad is None:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Unidad de Servicio no encontrada")
-        
+
     return db_unidad
 
 # ----------------------------------------------------
@@ -109,15 +98,11 @@ def update_unidad_endpoint(
 def delete_unidad_endpoint(
     unidad_id: int, 
     servicio: UnidadServicioService = Depends(get_unidad_servicio_service),
-    current_user: models.Usuario = Depends(get_current_user)
+    current_user: Principal = Depends(require_roles(ROLES_ADMIN, "Solo Administradores pueden dar de baja unidades de servicio."))
 ):
-    # Aquí usamos ROLES_ADMIN, es correcto que sea más estricto
-    if current_user.rol.nombre not in ROLES_ADMIN:
-         raise HTTPException(status_code=403, detail="Solo Administradores pueden dar de baja unidades de servicio.")
-    
     db_unidad = servicio.soft_delete_unidad(unidad_id=unidad_id)
-    
+
     if db_unidad is None:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Unidad de Servicio no encontrada")
-        
+
     return db_unidad
\ No newline at end of file
@@ -0,0 +1,87 @@
+# Archivo: app/cli.py
+# Comandos de mantenimiento por consola.
+# Uso: python -m app.cli <comando> [opciones]
+import argparse
+import json
+import sys
+
+from app.db.database import SessionLocal
+
+
+def cmd_reconciliar_caja(args):
+    from app.services.caja_service import CajaService
+    db = SessionLocal()
+    try:
+        resultado = CajaService(db).reconciliar_ledger(corregir=not args.solo_reporte)
+        print(json.dumps(resultado.model_dump(), default=str, indent=2, ensure_ascii=False))
+    finally:
+        db.close()
+
+
+def cmd_importar_pagos(args):
+    from app.services.importacion_pagos_service import ImportacionPagosService
+    from app.schemas.importacion_pagos_schema import ResumenImportacion
+    formato = args.formato or ("csv" if args.archivo.lower().endswith(".csv") else "json")
+    db = SessionLocal()
+    try:
+        with open(args.archivo, encoding="utf-8-sig", newline="") as texto:
+            resumen = ResumenImportacion()
+            resultados = ImportacionPagosService(db).importar(
+                texto, formato, args.medio, args.usuario, tamano_lote=args.lote
+            )
+            # Reporte NDJSON por stdout (una línea por fila), resumen por stderr
+            for resultado in ImportacionPagosService.resumir(resultados, resumen):
+                print(resultado.model_dump_json(exclude_none=True), flush=True)
+            print(json.dumps(resumen.model_dump(), indent=2, ensure_ascii=False), file=sys.stderr)
+    finally:
+        db.close()
+
+
+def cmd_reconstruir_resumen(args):
+    from app.services.resumen_relacion_service import ResumenRelacionService
+    db = SessionLocal()
+    try:
+        resultado = ResumenRelacionService(db).reconstruir()
+        print(json.dumps(resultado.model_dump(), default=str, indent=2, ensure_ascii=False))
+    finally:
+        db.close()
+
+
+def cmd_reindexar_busqueda(args):
+    from app.services.busqueda_service import BusquedaService
+    db = SessionLocal()
+    try:
+        resultado = BusquedaService(db).reindexar()
+        print(json.dumps(resultado.model_dump(), default=str, indent=2, ensure_ascii=False))
+    finally:
+        db.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(prog="python -m app.cli", description="Comandos de mantenimiento.")
+    sub = parser.add_subparsers(dest="comando", required=True)
+
+    p_caja = sub.add_parser("reconciliar-caja", help="Recalcula el ledger de caja y reporta desfases.")
+    p_caja.add_argument("--solo-reporte", action="store_true", help="No corrige, solo informa la diferencia.")
+    p_caja.set_defaults(func=cmd_reconciliar_caja)
+
+    p_pagos = sub.add_parser("importar-pagos", help="Aplica un extracto bancario (CSV/JSON) por lotes.")
+    p_pagos.add_argument("archivo", help="Ruta del extracto (.csv, .json o .ndjson).")
+    p_pagos.add_argument("--medio", type=int, required=True, help="id_medio_ingreso de los pagos.")
+    p_pagos.add_argument("--usuario", type=int, required=True, help="id_usuario que figura como creador.")
+    p_pagos.add_argument("--formato", choices=["csv", "json"], help="Por defecto se deduce de la extensión.")
+    p_pagos.add_argument("--lote", type=int, default=None, help="Filas por commit (default IMPORTACION_PAGOS_LOTE).")
+    p_pagos.set_defaults(func=cmd_importar_pagos)
+
+    p_resumen = sub.add_parser("reconstruir-resumen", help="Recalcula resumen_relacion desde item_facturable.")
+    p_resumen.set_defaults(func=cmd_reconstruir_resumen)
+
+    p_busqueda = sub.add_parser("reindexar-busqueda", help="Completa texto_busqueda de personas y unidades.")
+    p_busqueda.set_defaults(func=cmd_reindexar_busqueda)
+
+    args = parser.parse_args()
+    args.func(args)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,50 @@
+# Archivo: app/core/busqueda.py
+# Texto de búsqueda normalizado (minúsculas, sin tildes, espacios colapsados).
+# Persona y UnidadServicio guardan una columna texto_busqueda mantenida por el ORM
+# (ver listeners en models.py) con índice GIN pg_trgm: así '%texto%' usa el índice
+# en lugar de recorrer la tabla con ILIKE en cada tecla del buscador de caja.
+import re
+import unicodedata
+from typing import List, Optional
+
+from sqlalchemy import func
+
+_ESPACIOS = re.compile(r"\s+")
+# Letras con tilde del castellano -> sin tilde (mayúsculas incluidas: lower() de SQLite es solo ASCII)
+_SIN_TILDE = {
+    "á": "a", "é": "e", "í": "i", "ó": "o", "ú": "u", "ü": "u", "ñ": "n",
+    "Á": "a", "É": "e", "Í": "i", "Ó": "o", "Ú": "u", "Ü": "u", "Ñ": "n",
+}
+
+
+def normalizar_busqueda(*partes: Optional[str]) -> str:
+    """'José  PÉREZ' -> 'jose perez'. Las partes vacías se omiten."""
+    texto = " ".join(p for p in partes if p)
+    texto = unicodedata.normalize("NFKD", texto)
+    texto = "".join(c for c in texto if not unicodedata.combining(c))
+    return _ESPACIOS.sub(" ", texto.lower()).strip()
+
+
+def terminos_busqueda(consulta: Optional[str]) -> List[str]:
+    """Palabras normalizadas de la consulta; todas deben aparecer (AND)."""
+    return normalizar_busqueda(consulta).split()
+
+
+def escapar_like(texto: str) -> str:
+    """Escapa los comodines de LIKE (usar con escape='\\\\')."""
+    return texto.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+
+
+def normalizada(columna):
+    """
+    normalizar_busqueda en SQL para UNA columna (replace + lower, portable a SQLite).
+    Sin índice: sirve para acotar por columna filas que ya filtró texto_busqueda.
+    """
+    expresion = columna
+    for con_tilde, sin_tilde in _SIN_TILDE.items():
+        expresion = func.replace(expresion, con_tilde, sin_tilde)
+    return func.lower(expresion)
+
+
+def contiene(columna, termino: str):
+    return columna.like(f"%{escapar_like(termino)}%", escape="\\")
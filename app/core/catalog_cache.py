@@ -0,0 +1,144 @@
+# Archivo: app/core/catalog_cache.py
+# Caché en proceso de los catálogos chicos y casi estáticos:
+# Categoria (plan de cuentas), MedioIngreso, TipoEgreso y ConceptoDeuda.
+# - Se carga al arrancar (lifespan) y se recarga completo al vencer el TTL o tras una invalidación.
+# - Los servicios de catálogo llaman a invalidar() después de cada commit (create/update/delete).
+# - Cada worker tiene su copia: el TTL acota cuánto puede tardar en verse un cambio hecho en otro worker.
+# - Las filas son copias planas (SimpleNamespace), no objetos ORM: no quedan atadas a una sesión
+#   y son de SOLO LECTURA por convención. Para editar, los servicios siguen leyendo de la BD.
+import hashlib
+import logging
+import threading
+import time
+from types import SimpleNamespace
+from typing import Callable, Dict, List, Optional, Type
+
+from fastapi import Request, Response
+from pydantic import BaseModel
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.db import models
+from app.db.database import SessionLocal
+from app.core.responses import responder_lista
+
+logger = logging.getLogger(__name__)
+
+# nombre -> (modelo, columna PK)
+CATALOGOS = {
+    "categorias": (models.Categoria, "id_catalogo"),
+    "medios_ingreso": (models.MedioIngreso, "id_medio_ingreso"),
+    "tipos_egreso": (models.TipoEgreso, "id_tipo_egreso"),
+    "conceptos": (models.ConceptoDeuda, "id_concepto"),
+}
+
+
+class CatalogCache:
+
+    def __init__(self, ttl_segundos: int):
+        self.ttl = ttl_segundos
+        self.version = 0                      # Sube en cada invalidación/recarga
+        self._datos: Dict[str, Dict[int, SimpleNamespace]] = {}
+        self._etags: Dict[str, str] = {}
+        self._vence = 0.0
+        self._lock = threading.Lock()
+
+    # --- CARGA ---
+
+    @staticmethod
+    def _copiar(fila, columnas) -> SimpleNamespace:
+        return SimpleNamespace(**{c: getattr(fila, c) for c in columnas})
+
+    def cargar(self, db: Session):
+        """Lee los 4 catálogos (4 SELECT) y reemplaza la foto completa de una vez."""
+        version_inicio = self.version
+        datos, etags = {}, {}
+        for nombre, (modelo, pk) in CATALOGOS.items():
+            columnas = [c.key for c in modelo.__mapper__.column_attrs]
+            filas = db.query(modelo).order_by(getattr(modelo, pk)).all()
+            datos[nombre] = {getattr(f, pk): self._copiar(f, columnas) for f in filas}
+            # ETag por contenido: igual en todos los workers mientras los datos no cambien
+            huella = repr([sorted(vars(f).items()) for f in datos[nombre].values()])
+            etags[nombre] = '"%s"' % hashlib.sha1(huella.encode()).hexdigest()[:20]
+
+        with self._lock:
+            self._datos, self._etags = datos, etags
+            # Si hubo una invalidación mientras leíamos, la foto puede ser vieja: se sirve
+            # pero queda vencida para que la próxima lectura recargue.
+            if self.version == version_inicio:
+                self._vence = time.monotonic() + self.ttl
+            self.version += 1
+
+    def _asegurar(self, db: Session):
+        if time.monotonic() >= self._vence:
+            self.cargar(db)
+
+    def invalidar(self):
+        """Llamar después del commit de cualquier alta/baja/modificación de un catálogo."""
+        with self._lock:
+            self._vence = 0.0
+            self.version += 1
+
+    # --- LECTURA ---
+
+    def listar(self, db: Session, nombre: str) -> List[SimpleNamespace]:
+        self._asegurar(db)
+        return list(self._datos[nombre].values())
+
+    def obtener(self, db: Session, nombre: str, id_: int) -> Optional[SimpleNamespace]:
+        self._asegurar(db)
+        return self._datos[nombre].get(id_)
+
+    def etag(self, db: Session, nombre: str) -> str:
+        self._asegurar(db)
+        return self._etags[nombre]
+
+    def id_medio_efectivo(self, db: Session) -> int:
+        """ID del medio 'Efectivo' (coincidencia exacta primero, luego parcial). 0 si no existe."""
+        medios = self.listar(db, "medios_ingreso")
+        for medio in medios:
+            if medio.nombre.strip().lower() == "efectivo":
+                return medio.id_medio_ingreso
+        for medio in medios:
+            if "efectivo" in medio.nombre.lower():
+                return medio.id_medio_ingreso
+        return 0
+
+
+catalog_cache = CatalogCache(settings.CATALOG_CACHE_TTL_SECONDS)
+
+
+def precargar_catalogos():
+    """Carga inicial (lifespan). Si la BD no responde, se cargará en la primera lectura."""
+    db = SessionLocal()
+    try:
+        catalog_cache.cargar(db)
+    except Exception:
+        logger.exception("No se pudo precargar el caché de catálogos")
+    finally:
+        db.close()
+
+
+# --- ETAG / RESPUESTAS CONDICIONALES ---
+
+def cabeceras_cache(etag: str) -> dict:
+    # no-cache = el navegador guarda la respuesta pero revalida siempre (barato gracias al 304)
+    return {"ETag": etag, "Cache-Control": "private, no-cache"}
+
+def no_modificado(request: Request, etag: str) -> Optional[Response]:
+    """304 si el cliente ya tiene esta versión (If-None-Match), si no None."""
+    if_none_match = request.headers.get("if-none-match", "")
+    if etag in [e.strip().removeprefix("W/") for e in if_none_match.split(",")]:
+        return Response(status_code=304, headers=cabeceras_cache(etag))
+    return None
+
+def responder_catalogo(
+    request: Request,
+    db: Session,
+    nombre: str,
+    schema: Type[BaseModel],
+    obtener_items: Callable[[], list]
+) -> Response:
+    """Listado de catálogo con ETag: 304 sin cuerpo si no cambió, si no la lista serializada."""
+    etag = catalog_cache.etag(db, nombre)
+    return no_modificado(request, etag) or responder_lista(schema, obtener_items(), headers=cabeceras_cache(etag))
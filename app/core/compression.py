@@ -0,0 +1,133 @@
+# Archivo: app/core/compression.py
+# Compresión de respuestas (Brotli si está instalado y el cliente lo acepta, si no GZip).
+# Solo comprime respuestas COMPLETAS (un único mensaje de body): los exports en streaming
+# (StreamingResponse, more_body=True) pasan tal cual para no romper el envío por chunks.
+import gzip
+from typing import Iterable, Optional
+
+from app.core.config import settings
+
+try:  # Dependencia opcional: pip install brotli
+    import brotli
+except ImportError:
+    brotli = None
+
+
+def _codificacion_aceptada(accept_encoding: str) -> Optional[str]:
+    """Elige 'br' o 'gzip' según Accept-Encoding (respeta q=0)."""
+    aceptadas = set()
+    for parte in accept_encoding.lower().split(","):
+        nombre, _, params = parte.strip().partition(";")
+        if params.strip().replace(" ", "") in ("q=0", "q=0.0", "q=0.00", "q=0.000"):
+            continue
+        aceptadas.add(nombre.strip())
+    if brotli is not None and "br" in aceptadas:
+        return "br"
+    if "gzip" in aceptadas:
+        return "gzip"
+    return None
+
+
+class CompressionMiddleware:
+    """
+    Middleware ASGI de compresión con umbral de tamaño y lista blanca de content-types.
+    Se desactiva con COMPRESSION_ENABLED=false.
+    """
+
+    def __init__(
+        self,
+        app,
+        minimum_size: int = 1024,
+        content_types: Iterable[str] = ("application/json",),
+        gzip_level: int = 6,
+        brotli_quality: int = 5
+    ):
+        self.app = app
+        self.minimum_size = minimum_size
+        self.content_types = tuple(ct.lower() for ct in content_types)
+        self.gzip_level = gzip_level
+        self.brotli_quality = brotli_quality
+
+    def _comprimir(self, cuerpo: bytes, codificacion: str) -> bytes:
+        if codificacion == "br":
+            return brotli.compress(cuerpo, quality=self.brotli_quality)
+        return gzip.compress(cuerpo, compresslevel=self.gzip_level)
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        accept = ""
+        for clave, valor in scope.get("headers", []):
+            if clave == b"accept-encoding":
+                accept = valor.decode("latin-1")
+                break
+        codificacion = _codificacion_aceptada(accept)
+        if codificacion is None:
+            await self.app(scope, receive, send)
+            return
+
+        inicio = None        # http.response.start retenido hasta ver el primer body
+        passthrough = False  # True: ya se decidió no comprimir
+
+        async def send_comprimido(message):
+            nonlocal inicio, passthrough
+
+            if passthrough:
+                await send(message)
+                return
+
+            if message["type"] == "http.response.start":
+                inicio = message
+                return
+
+            if message["type"] != "http.response.body" or inicio is None:
+                await send(message)
+                return
+
+            cuerpo = message.get("body", b"")
+            headers = list(inicio.get("headers", []))
+            content_type = ""
+            ya_codificado = False
+            for clave, valor in headers:
+                if clave == b"content-type":
+                    content_type = valor.decode("latin-1").lower()
+                elif clave == b"content-encoding":
+                    ya_codificado = True
+
+            comprimible = (
+                not message.get("more_body", False)      # streaming -> no se toca
+                and not ya_codificado
+                and len(cuerpo) >= self.minimum_size
+                and content_type.startswith(self.content_types)
+            )
+
+            if not comprimible:
+                passthrough = True
+                await send(inicio)
+                await send(message)
+                return
+
+            comprimido = self._comprimir(cuerpo, codificacion)
+            headers = [(k, v) for k, v in headers if k != b"content-length"]
+            headers += [
+                (b"content-encoding", codificacion.encode()),
+                (b"content-length", str(len(comprimido)).encode()),
+                (b"vary", b"Accept-Encoding"),
+            ]
+            inicio["headers"] = headers
+            await send(inicio)
+            await send({"type": "http.response.body", "body": comprimido, "more_body": False})
+
+        await self.app(scope, receive, send_comprimido)
+
+
+def compression_kwargs() -> dict:
+    """Parámetros del middleware tomados de Settings (ver main.py)."""
+    return {
+        "minimum_size": settings.COMPRESSION_MIN_SIZE,
+        "content_types": settings.COMPRESSION_CONTENT_TYPES,
+        "gzip_level": settings.COMPRESSION_GZIP_LEVEL,
+        "brotli_quality": settings.COMPRESSION_BROTLI_QUALITY,
+    }
@@ -0,0 +1,130 @@
+# Archivo: app/core/db_metrics.py
+# Instrumentación de SQL por request: cuenta sentencias, mide tiempo de BD
+# y detecta patrones N+1 (la misma sentencia repetida muchas veces en un request).
+import logging
+import time
+from collections import Counter
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Iterator, Optional
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+from app.core.config import settings
+from app.core.exceptions import DBServiceException
+
+logger = logging.getLogger(__name__)
+
+
+class NPlusOneDetected(DBServiceException):
+    """Se lanza en modo estricto cuando una sentencia se repite más del umbral en un request."""
+    pass
+
+
+class QueryStats:
+    """Acumulador de métricas de BD de un request."""
+
+    def __init__(self):
+        self.total = 0
+        self.tiempo_ms = 0.0
+        self.por_sentencia = Counter()
+        self.reportadas = set()
+
+    def sospechosas(self, umbral: int):
+        return {sql: n for sql, n in self.por_sentencia.items() if n >= umbral}
+
+
+# El contexto se copia al threadpool donde corren los endpoints 'def',
+# por eso el mismo objeto QueryStats es visible desde los servicios.
+_stats_actual: ContextVar[Optional[QueryStats]] = ContextVar("db_query_stats", default=None)
+
+
+def get_current_stats() -> Optional[QueryStats]:
+    return _stats_actual.get()
+
+
+@contextmanager
+def medir_sentencias() -> Iterator[QueryStats]:
+    """Cuenta las sentencias ejecutadas dentro del bloque, fuera de un request (tests, scripts)."""
+    stats = QueryStats()
+    token = _stats_actual.set(stats)
+    try:
+        yield stats
+    finally:
+        _stats_actual.reset(token)
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    # En el contexto de ejecución (no en conn.info): si la sentencia falla no queda nada
+    # colgado en la conexión que vuelve al pool
+    if context is not None:
+        context._inicio_metricas = time.perf_counter()
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    stats = _stats_actual.get()
+    if stats is None:
+        return
+
+    inicio = getattr(context, "_inicio_metricas", None)
+    if inicio is not None:
+        stats.tiempo_ms += (time.perf_counter() - inicio) * 1000
+    # Un INSERT "insertmanyvalues" llega en varios lotes con el mismo contexto (SQLite con
+    # RETURNING: un lote por fila). Es UNA sentencia del código: se cuenta una sola vez.
+    if context is not None:
+        if getattr(context, "_contada_en_metricas", False):
+            return
+        context._contada_en_metricas = True
+
+    stats.total += 1
+    stats.por_sentencia[statement] += 1
+
+    # Las sentencias ya vienen parametrizadas: mismo texto = misma "forma"
+    repeticiones = stats.por_sentencia[statement]
+    if repeticiones >= settings.DB_N1_THRESHOLD and statement not in stats.reportadas:
+        stats.reportadas.add(statement)
+        logger.warning("Posible N+1 (%s repeticiones en el request): %s", repeticiones, statement)
+        if settings.DB_N1_STRICT:
+            raise NPlusOneDetected(f"Posible N+1 detectado ({repeticiones} repeticiones): {statement}")
+
+
+def instrumentar_engine(engine: Engine):
+    """Registra los listeners de conteo/tiempo en el engine (idempotente)."""
+    if not event.contains(engine, "before_cursor_execute", _before_cursor_execute):
+        event.listen(engine, "before_cursor_execute", _before_cursor_execute)
+        event.listen(engine, "after_cursor_execute", _after_cursor_execute)
+
+
+class DBMetricsMiddleware:
+    """
+    Middleware ASGI: abre un QueryStats por request y expone el resultado en
+    las cabeceras 'X-DB-Queries' y 'Server-Timing' (visibles en DevTools).
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        stats = QueryStats()
+        token = _stats_actual.set(stats)
+
+        async def send_con_metricas(message):
+            if message["type"] == "http.response.start":
+                headers = list(message.get("headers", []))
+                headers.append((b"x-db-queries", str(stats.total).encode()))
+                headers.append((
+                    b"server-timing",
+                    f'db;dur={stats.tiempo_ms:.1f};desc="{stats.total} queries"'.encode()
+                ))
+                message["headers"] = headers
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_con_metricas)
+        finally:
+            _stats_actual.reset(token)
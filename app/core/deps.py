@@ -1,18 +1,23 @@
+from functools import lru_cache
+from typing import FrozenSet
+
 from fastapi import Depends, HTTPException, status
 from fastapi.security import OAuth2PasswordBearer
 from jose import JWTError, jwt
-from sqlalchemy.orm import Session
-from app.db.database import get_db
+from sqlalchemy.orm import Session, joinedload
+from app.db.database import AsyncSessionLocal, escritura_reciente, get_db, usar_replica
 from app.db import models
 from app.core import security
+from app.core.principal_cache import Principal, principal_cache
 
 # Indica a FastAPI que el token viene del endpoint "/v1/login"
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="/v1/login")
 
-def get_current_user(token: str = Depends(oauth2_scheme), db: Session = Depends(get_db)) -> models.Usuario:
+def get_current_user(token: str = Depends(oauth2_scheme), db: Session = Depends(get_db)) -> Principal:
     """
     Dependencia que valida el token y devuelve el usuario actual.
     Si el token es falso o expiró, lanza error 401.
+    Con caché: (id_usuario, iat) -> Principal. En un acierto no se toca la BD.
     """
     credentials_exception = HTTPException(
         status_code=status.HTTP_401_UNAUTHORIZED,
@@ -28,16 +33,67 @@ def get_current_user(token: str = Depends(oauth2_scheme), db: Session = Depends(
         user_id: str = payload.get("sub")
         if user_id is None:
             raise credentials_exception
-    except JWTError:
+        user_id = int(user_id)
+    except (JWTError, ValueError):
         raise credentials_exception
 
-    # Buscamos al usuario en la BD
-    user = db.query(models.Usuario).filter(models.Usuario.id_usuario == user_id).first()
-    
-    if user is None:
-        raise credentials_exception
-        
-    if not user.activo:
-        raise HTTPException(status_code=400, detail="Usuario inactivo")
+    rol_token = payload.get("rol")
+    cache_key = (user_id, payload.get("iat"))
+
+    principal = principal_cache.get(cache_key)
+    if principal is None:
+        # Buscamos al usuario en la BD (con su Rol en la misma consulta)
+        user = db.query(models.Usuario)\
+            .options(joinedload(models.Usuario.rol))\
+            .filter(models.Usuario.id_usuario == user_id)\
+            .first()
         
-    return user
\ No newline at end of file
+        if user is None:
+            raise credentials_exception
+            
+        if not user.activo:
+            raise HTTPException(status_code=400, detail="Usuario inactivo")
+
+        principal = Principal.from_usuario(user)
+        principal_cache.put(cache_key, principal)
+
+    # El rol firmado en el token debe seguir siendo el vigente (si cambió, hay que reloguear)
+    if rol_token is not None and rol_token != principal.rol.nombre:
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Sus permisos cambiaron. Inicie sesión nuevamente.",
+            headers={"WWW-Authenticate": "Bearer"},
+        )
+
+    # Es la misma sesión que usa el endpoint: sus commits con escrituras abren la
+    # ventana read-your-writes de este usuario (ver database.RoutingSession)
+    db.info["id_usuario"] = principal.id_usuario
+    return principal
+
+
+async def get_async_read_db(current_user: Principal = Depends(get_current_user)):
+    """
+    Sesión async de SOLO LECTURA para reportes y dashboards: lee de la réplica
+    (DATABASE_REPLICA_URL), salvo que este usuario haya escrito hace menos de
+    REPLICA_STICKY_SECONDS, en cuyo caso lee del primario para ver su propio cambio.
+    """
+    async with AsyncSessionLocal() as db:
+        if not escritura_reciente(current_user.id_usuario):
+            usar_replica(db)
+        yield db
+
+
+@lru_cache(maxsize=None)
+def require_roles(roles: FrozenSet[str], detail: str = "Acceso denegado."):
+    """
+    Fábrica de dependencias de autorización. Único punto donde se verifica el rol.
+    Uso: APIRouter(dependencies=[Depends(require_roles(ROLES_LECTURA))]) o como
+    parámetro del endpoint cuando además se necesita el usuario.
+    Se memoiza: el mismo (roles, detail) devuelve la misma función, y FastAPI la resuelve una sola vez por request.
+    """
+    def verificar_rol(current_user: Principal = Depends(get_current_user)) -> Principal:
+        if current_user.rol.nombre not in roles:
+            raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail=detail)
+        return current_user
+
+    return verificar_rol
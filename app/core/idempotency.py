@@ -0,0 +1,197 @@
+# Archivo: app/core/idempotency.py
+# Cabecera Idempotency-Key para los POST que mueven dinero (cobros, gastos, depósitos).
+# El front genera un UUID por operación y lo reenvía en cada reintento:
+# - Primera vez: se reserva la clave (fila 'en_proceso', UNIQUE usuario+clave), se ejecuta
+#   el servicio y se guarda la respuesta.
+# - Reintento con el mismo body: se devuelve la respuesta guardada SIN volver a ejecutar nada.
+# - Reintento mientras la primera sigue en curso: 409 (reintentar en unos segundos).
+# - Misma clave con otro body: 422.
+# Sin cabecera, el endpoint funciona como siempre.
+# El servicio confirma su propia transacción: en ESE commit la clave pasa a 'ejecutado'
+# (listener before_commit). Así una clave nunca vuelve a ejecutar el servicio si el
+# cobro/gasto ya quedó grabado, aunque falle lo que sigue (guardar la respuesta) o el
+# proceso muera. Una clave 'ejecutado' sin respuesta, o 'en_proceso' abandonada, responde
+# 409 y queda para revisión manual (o para que venza); nunca se re-ejecuta sola.
+import hashlib
+from datetime import datetime, timedelta
+from functools import lru_cache
+from typing import Any, Callable, Optional, Type
+
+from fastapi import Depends, Header, HTTPException, Request, status
+from fastapi.responses import ORJSONResponse
+from pydantic import BaseModel, TypeAdapter
+from sqlalchemy import event
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.core.deps import get_current_user
+from app.core.principal_cache import Principal
+from app.db import models
+from app.db.database import get_db
+
+IDEMPOTENCY_HEADER = "Idempotency-Key"
+REPLAY_HEADER = "Idempotent-Replayed"
+# session.info: la Idempotencia cuya clave se marca 'ejecutado' en el próximo commit
+CLAVE_PENDIENTE = "idempotencia_pendiente"
+
+
+@lru_cache(maxsize=None)
+def _adaptador(schema: Type[BaseModel]) -> TypeAdapter:
+    return TypeAdapter(schema)
+
+
+class Idempotencia:
+
+    def __init__(self, db: Session, clave: Optional[str], id_usuario: int, endpoint: str, hash_solicitud: str):
+        self.db = db
+        self.clave = clave
+        self.id_usuario = id_usuario
+        self.endpoint = endpoint
+        self.hash_solicitud = hash_solicitud
+
+    def ejecutar(self, operacion: Callable[[], Any], schema: Type[BaseModel], status_code: int = status.HTTP_201_CREATED):
+        """
+        Corre `operacion` una sola vez por clave. El resultado se serializa con `schema`
+        (el mismo response_model del endpoint) para poder guardarlo y re-emitirlo idéntico.
+        """
+        if not self.clave:
+            return operacion()
+
+        guardado = self._reservar()
+        if guardado is not None:
+            return ORJSONResponse(guardado.respuesta, status_code=guardado.status_code, headers={REPLAY_HEADER: "true"})
+
+        self.db.info[CLAVE_PENDIENTE] = self
+        try:
+            adaptador = _adaptador(schema)
+            cuerpo = adaptador.dump_python(adaptador.validate_python(operacion(), from_attributes=True), mode="json")
+        except Exception:
+            self.db.rollback()
+            self.db.info.pop(CLAVE_PENDIENTE, None)
+            # Solo se libera si el servicio NO llegó a confirmar (sigue 'en_proceso').
+            # Si quedó 'ejecutado', el reintento recibe 409 en lugar de repetir la operación.
+            self._filtro().filter(models.IdempotencyKey.estado == 'en_proceso')\
+                .delete(synchronize_session=False)
+            self.db.commit()
+            raise
+        self.db.info.pop(CLAVE_PENDIENTE, None)
+
+        self._filtro().update({
+            models.IdempotencyKey.estado: 'completado',
+            models.IdempotencyKey.status_code: status_code,
+            models.IdempotencyKey.respuesta: cuerpo,
+        }, synchronize_session=False)
+        self.db.commit()
+        return ORJSONResponse(cuerpo, status_code=status_code)
+
+    # --- RESERVA ---
+
+    def _marcar_ejecutada(self):
+        self._filtro().filter(models.IdempotencyKey.estado == 'en_proceso')\
+            .update({models.IdempotencyKey.estado: 'ejecutado'}, synchronize_session=False)
+
+    def _filtro(self):
+        return self.db.query(models.IdempotencyKey).filter(
+            models.IdempotencyKey.id_usuario == self.id_usuario,
+            models.IdempotencyKey.clave == self.clave
+        )
+
+    def _reservar(self) -> Optional[models.IdempotencyKey]:
+        """None = clave reservada para esta solicitud. Si no, el registro completado a re-emitir."""
+        ahora = datetime.utcnow()
+        vence = ahora + timedelta(hours=settings.IDEMPOTENCY_TTL_HOURS)
+
+        self.db.add(models.IdempotencyKey(
+            id_usuario=self.id_usuario, clave=self.clave, endpoint=self.endpoint,
+            hash_solicitud=self.hash_solicitud, estado='en_proceso',
+            fecha_creacion=ahora, fecha_expiracion=vence
+        ))
+        try:
+            self.db.commit()
+            return None
+        except IntegrityError:
+            self.db.rollback()
+
+        # La clave ya existe: se bloquea la fila para decidir sin carreras
+        existente = self._filtro().with_for_update().first()
+        if existente is None:
+            # Se purgó entre el INSERT y el SELECT: el reintento del cliente la reservará
+            self.db.rollback()
+            raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail="Reintente la operación.")
+
+        if existente.fecha_expiracion > ahora:
+            if existente.hash_solicitud != self.hash_solicitud or existente.endpoint != self.endpoint:
+                self.db.rollback()
+                raise HTTPException(
+                    status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+                    detail=f"La {IDEMPOTENCY_HEADER} ya se usó con otra solicitud."
+                )
+            if existente.estado == 'completado':
+                self.db.commit()
+                return existente
+            self.db.rollback()
+            if existente.estado == 'ejecutado':
+                raise HTTPException(
+                    status_code=status.HTTP_409_CONFLICT,
+                    detail="La operación de esta Idempotency-Key ya se registró pero su respuesta no se guardó. "
+                           "Verifique el registro antes de repetirla con una clave nueva."
+                )
+            if existente.fecha_creacion < ahora - timedelta(seconds=settings.IDEMPOTENCY_LOCK_SECONDS):
+                # Abandonada (el proceso murió a mitad): no se re-ejecuta sola
+                raise HTTPException(
+                    status_code=status.HTTP_409_CONFLICT,
+                    detail="La solicitud con esta Idempotency-Key quedó interrumpida. "
+                           "Verifique si se registró antes de repetirla con una clave nueva."
+                )
+            raise HTTPException(
+                status_code=status.HTTP_409_CONFLICT,
+                detail="Una solicitud con esta Idempotency-Key todavía está en proceso.",
+                headers={"Retry-After": "2"}
+            )
+
+        # Vencida: la clave se reutiliza para esta solicitud
+        existente.endpoint = self.endpoint
+        existente.hash_solicitud = self.hash_solicitud
+        existente.estado = 'en_proceso'
+        existente.status_code = None
+        existente.respuesta = None
+        existente.fecha_creacion = ahora
+        existente.fecha_expiracion = vence
+        self.db.commit()
+        return None
+
+
+# --- MARCA 'ejecutado' DENTRO DE LA TRANSACCIÓN DEL SERVICIO ---
+
+@event.listens_for(Session, "before_commit")
+def _marcar_en_commit(session):
+    idem = session.info.get(CLAVE_PENDIENTE)
+    if idem is not None:
+        idem._marcar_ejecutada()
+
+@event.listens_for(Session, "after_commit")
+def _limpiar_tras_commit(session):
+    session.info.pop(CLAVE_PENDIENTE, None)
+
+
+async def idempotencia(
+    request: Request,
+    idempotency_key: Optional[str] = Header(None, alias=IDEMPOTENCY_HEADER, max_length=100),
+    db: Session = Depends(get_db),
+    current_user: Principal = Depends(get_current_user)
+) -> Idempotencia:
+    """Dependencia: la clave se aísla por usuario; el hash cubre método, ruta y body."""
+    endpoint = f"{request.method} {request.url.path}"
+    cuerpo = await request.body()  # Ya leído por FastAPI para el body: sale de la caché del Request
+    hash_solicitud = hashlib.sha256(endpoint.encode() + b"\n" + cuerpo).hexdigest()
+    return Idempotencia(db, idempotency_key, current_user.id_usuario, endpoint, hash_solicitud)
+
+
+def purgar_vencidas(db: Session) -> int:
+    """Borra las claves vencidas (tarea programada). Devuelve cuántas se borraron."""
+    borradas = db.query(models.IdempotencyKey)\
+        .filter(models.IdempotencyKey.fecha_expiracion <= datetime.utcnow())\
+        .delete(synchronize_session=False)
+    db.commit()
+    return borradas
@@ -0,0 +1,63 @@
+# Archivo: app/core/login_throttle.py
+# Límite de intentos de login con ventana deslizante, en memoria del proceso.
+# Se consulta ANTES de tocar la BD o hashear: rechazar un flood cuesta un lookup en un dict.
+import threading
+import time
+from collections import deque
+from typing import Deque, Dict, Optional
+
+from app.core.config import settings
+
+
+class SlidingWindowLimiter:
+    """
+    Cuenta eventos por clave dentro de los últimos `ventana` segundos.
+    Cada worker de uvicorn tiene su propio contador (límite efectivo = max * workers).
+    """
+
+    def __init__(self, max_eventos: int, ventana_segundos: int):
+        self.max_eventos = max_eventos
+        self.ventana = ventana_segundos
+        self._eventos: Dict[str, Deque[float]] = {}
+        self._lock = threading.Lock()
+
+    def _purgar(self, cola: Deque[float], ahora: float):
+        limite = ahora - self.ventana
+        while cola and cola[0] <= limite:
+            cola.popleft()
+
+    def reintentar_en(self, clave: str) -> Optional[int]:
+        """Segundos hasta que la clave vuelva a tener cupo, o None si no está bloqueada."""
+        ahora = time.monotonic()
+        with self._lock:
+            cola = self._eventos.get(clave)
+            if not cola:
+                return None
+            self._purgar(cola, ahora)
+            if len(cola) < self.max_eventos:
+                if not cola:
+                    del self._eventos[clave]
+                return None
+            return max(1, int(cola[0] + self.ventana - ahora) + 1)
+
+    def registrar(self, clave: str):
+        ahora = time.monotonic()
+        with self._lock:
+            cola = self._eventos.setdefault(clave, deque())
+            self._purgar(cola, ahora)
+            cola.append(ahora)
+
+    def limpiar(self, clave: str):
+        with self._lock:
+            self._eventos.pop(clave, None)
+
+
+# Intentos FALLIDOS por email (se limpia con un login exitoso)
+fallos_por_email = SlidingWindowLimiter(
+    settings.LOGIN_THROTTLE_MAX_POR_EMAIL, settings.LOGIN_THROTTLE_VENTANA_SEGUNDOS
+)
+# Intentos FALLIDOS por IP (frena el barrido de muchos emails desde un mismo origen).
+# Solo fallos: el personal detrás de un mismo NAT que entra bien no consume cupo.
+fallos_por_ip = SlidingWindowLimiter(
+    settings.LOGIN_THROTTLE_MAX_POR_IP, settings.LOGIN_THROTTLE_VENTANA_SEGUNDOS
+)
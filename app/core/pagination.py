@@ -0,0 +1,111 @@
+# Archivo: app/core/pagination.py
+# Paginación por cursor (keyset) compartida por los listados.
+# El cursor es opaco para el cliente: base64 de los valores de orden de la última fila.
+# Con cursor: WHERE (orden..., pk) < (valores...) -> costo constante en cualquier página
+# y sin saltos/duplicados aunque entren filas nuevas mientras se pagina.
+# Sin cursor: OFFSET/LIMIT clásico (compatibilidad con el front actual).
+import base64
+import json
+from datetime import date, datetime
+from decimal import Decimal
+from typing import Any, List, NamedTuple, Optional, Sequence
+
+from fastapi import HTTPException, Response
+from sqlalchemy import tuple_
+
+# Cabecera donde los endpoints de lista devuelven el cursor de la página siguiente
+NEXT_CURSOR_HEADER = "X-Next-Cursor"
+
+
+class Pagina(NamedTuple):
+    items: List[Any]
+    next_cursor: Optional[str]
+
+
+# ----------------------------------------------------
+# CODIFICACIÓN DEL CURSOR
+# ----------------------------------------------------
+
+def _serializar(valor):
+    # Etiquetamos los tipos que JSON no conserva para reconstruirlos al decodificar
+    if isinstance(valor, datetime):
+        return ["dt", valor.isoformat()]
+    if isinstance(valor, date):
+        return ["d", valor.isoformat()]
+    if isinstance(valor, Decimal):
+        return ["n", str(valor)]
+    return ["v", valor]
+
+def _deserializar(par):
+    tipo, valor = par
+    if tipo == "dt":
+        return datetime.fromisoformat(valor)
+    if tipo == "d":
+        return date.fromisoformat(valor)
+    if tipo == "n":
+        return Decimal(valor)
+    if tipo == "v":
+        return valor
+    raise ValueError(tipo)
+
+def encode_cursor(valores: Sequence) -> str:
+    crudo = json.dumps([_serializar(v) for v in valores], separators=(",", ":"))
+    return base64.urlsafe_b64encode(crudo.encode()).decode()
+
+def decode_cursor(cursor: str, columnas: int) -> tuple:
+    """Decodifica y valida la cantidad de valores. Cualquier error -> 400."""
+    try:
+        valores = tuple(_deserializar(p) for p in json.loads(base64.urlsafe_b64decode(cursor.encode()).decode()))
+    except (ValueError, TypeError, KeyError):
+        raise HTTPException(status_code=400, detail="Cursor inválido.")
+    if len(valores) != columnas:
+        raise HTTPException(status_code=400, detail="Cursor inválido.")
+    return valores
+
+
+# ----------------------------------------------------
+# APLICACIÓN SOBRE UNA QUERY
+# ----------------------------------------------------
+
+def filtro_cursor(orden: Sequence, cursor: str, descendente: bool = True):
+    """Condición keyset: (orden...) < (valores del cursor), o > si el orden es ascendente."""
+    valores = decode_cursor(cursor, len(orden))
+    return tuple_(*orden) < tuple_(*valores) if descendente else tuple_(*orden) > tuple_(*valores)
+
+def cortar_pagina(filas: List[Any], orden: Sequence, limit: int) -> Pagina:
+    """Recibe limit + 1 filas: si sobra una, hay página siguiente y su cursor sale de la última visible."""
+    hay_mas = len(filas) > limit
+    filas = filas[:limit]
+    next_cursor = encode_cursor([getattr(filas[-1], c.key) for c in orden]) if hay_mas and filas else None
+    return Pagina(items=filas, next_cursor=next_cursor)
+
+def paginar(
+    query,
+    orden: Sequence,
+    cursor: Optional[str] = None,
+    limit: int = 100,
+    skip: int = 0,
+    descendente: bool = True
+) -> Pagina:
+    """
+    Ordena una db.query(...) por las columnas de `orden` (la última debe ser la PK, para que el
+    orden sea total) y devuelve una página + el cursor de la siguiente.
+    Las columnas de orden deben ser NOT NULL (la comparación de tuplas descarta los NULL).
+    Para select() sobre subconsultas usar filtro_cursor + cortar_pagina directamente.
+    """
+    if cursor:
+        query = query.filter(filtro_cursor(orden, cursor, descendente))
+
+    query = query.order_by(*[c.desc() if descendente else c.asc() for c in orden])
+
+    if skip and not cursor:
+        # Fallback por offset (sólo si no vino cursor)
+        query = query.offset(skip)
+
+    return cortar_pagina(query.limit(limit + 1).all(), orden, limit)
+
+def exponer_cursor(response: Response, pagina: Pagina) -> List[Any]:
+    """Publica el cursor en la cabecera X-Next-Cursor y devuelve los items (el cuerpo no cambia)."""
+    if pagina.next_cursor:
+        response.headers[NEXT_CURSOR_HEADER] = pagina.next_cursor
+    return pagina.items
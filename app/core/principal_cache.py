@@ -0,0 +1,111 @@
+# Archivo: app/core/principal_cache.py
+# Caché en proceso del usuario autenticado ("principal").
+# Evita las 2 consultas por request (usuario + rol) cuando el token ya fue validado hace poco.
+import threading
+import time
+from dataclasses import dataclass
+from typing import Dict, Optional, Tuple
+
+from sqlalchemy import event, inspect
+
+from app.core.config import settings
+from app.db import models
+
+
+@dataclass(frozen=True)
+class RolPrincipal:
+    id_rol: int
+    nombre: str
+
+
+@dataclass(frozen=True)
+class Principal:
+    """
+    Foto inmutable del usuario autenticado. Expone lo mismo que usan los
+    endpoints del ORM (id_usuario, rol.nombre) sin depender de una sesión abierta.
+    """
+    id_usuario: int
+    id_persona: int
+    email: str
+    activo: bool
+    rol: RolPrincipal
+
+    @classmethod
+    def from_usuario(cls, usuario: models.Usuario) -> "Principal":
+        return cls(
+            id_usuario=usuario.id_usuario,
+            id_persona=usuario.id_persona,
+            email=usuario.email,
+            activo=bool(usuario.activo),
+            rol=RolPrincipal(id_rol=usuario.rol.id_rol, nombre=usuario.rol.nombre)
+        )
+
+
+CacheKey = Tuple[int, Optional[int]]  # (id_usuario, iat del token)
+
+
+class PrincipalCache:
+    """
+    Diccionario con TTL corto y tamaño máximo. Cada worker tiene el suyo:
+    la invalidación explícita es local y el TTL acota lo que pueda quedar viejo en otros procesos.
+    """
+
+    def __init__(self, ttl_segundos: int, max_entradas: int):
+        self.ttl = ttl_segundos
+        self.max_entradas = max_entradas
+        self._datos: Dict[CacheKey, Tuple[float, Principal]] = {}
+        self._lock = threading.Lock()
+
+    def get(self, key: CacheKey) -> Optional[Principal]:
+        with self._lock:
+            entrada = self._datos.get(key)
+            if entrada is None:
+                return None
+            expira, principal = entrada
+            if expira < time.monotonic():
+                del self._datos[key]
+                return None
+            return principal
+
+    def put(self, key: CacheKey, principal: Principal):
+        if self.ttl <= 0:
+            return
+        with self._lock:
+            if len(self._datos) >= self.max_entradas:
+                ahora = time.monotonic()
+                self._datos = {k: v for k, v in self._datos.items() if v[0] >= ahora}
+                if len(self._datos) >= self.max_entradas:
+                    self._datos.pop(next(iter(self._datos)))
+            self._datos[key] = (time.monotonic() + self.ttl, principal)
+
+    def invalidar_usuario(self, id_usuario: int):
+        with self._lock:
+            for key in [k for k in self._datos if k[0] == id_usuario]:
+                del self._datos[key]
+
+    def limpiar(self):
+        with self._lock:
+            self._datos.clear()
+
+
+principal_cache = PrincipalCache(settings.PRINCIPAL_CACHE_TTL_SECONDS, settings.PRINCIPAL_CACHE_MAX)
+
+
+# --- INVALIDACIÓN EXPLÍCITA (Eventos del ORM) ---
+# Cualquier cambio de estado o de rol de un usuario lo saca del caché de inmediato.
+
+@event.listens_for(models.Usuario, "after_update")
+def _usuario_actualizado(mapper, connection, target):
+    estado = inspect(target)
+    if estado.attrs.activo.history.has_changes() or estado.attrs.id_rol.history.has_changes():
+        principal_cache.invalidar_usuario(target.id_usuario)
+
+
+@event.listens_for(models.Usuario, "after_delete")
+def _usuario_eliminado(mapper, connection, target):
+    principal_cache.invalidar_usuario(target.id_usuario)
+
+
+@event.listens_for(models.Rol, "after_update")
+def _rol_actualizado(mapper, connection, target):
+    principal_cache.limpiar()
@@ -0,0 +1,70 @@
+# Archivo: app/core/report_cache.py
+# Caché en proceso para reportes caros que solo cambian con escrituras de pagos/deudas.
+# - Cada entrada vale para el DÍA en que se calculó (los buckets de atraso dependen de la fecha)
+#   y como máximo REPORT_CACHE_TTL_SECONDS (acota el desfase entre workers: cada uno tiene su copia).
+# - Los servicios que mueven saldos marcan la sesión con invalidar_al_confirmar(db, cache):
+#   la invalidación ocurre DESPUÉS del commit (si se hiciera antes, una lectura concurrente
+#   podría volver a cachear los datos viejos). Un rollback descarta la marca.
+import threading
+import time
+from datetime import date
+from typing import Any, Dict, Hashable, Optional, Tuple
+
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+
+
+class ReporteDiarioCache:
+
+    def __init__(self, ttl_segundos: int, max_entradas: int = 128):
+        self.ttl = ttl_segundos
+        self.max_entradas = max_entradas
+        self.version = 0                      # Sube en cada invalidación
+        self._datos: Dict[Hashable, Tuple[date, float, Any]] = {}
+        self._lock = threading.Lock()
+
+    def get(self, clave: Hashable) -> Optional[Any]:
+        entrada = self._datos.get(clave)
+        if entrada is None:
+            return None
+        dia, vence, valor = entrada
+        if dia != date.today() or time.monotonic() >= vence:
+            return None
+        return valor
+
+    def put(self, clave: Hashable, valor: Any, version: int):
+        """`version` = self.version leída ANTES de consultar la BD: si hubo una invalidación
+        mientras se calculaba, el resultado puede ser viejo y no se guarda."""
+        if self.ttl <= 0:
+            return
+        with self._lock:
+            if version != self.version:
+                return
+            if len(self._datos) >= self.max_entradas:
+                self._datos.clear()
+            self._datos[clave] = (date.today(), time.monotonic() + self.ttl, valor)
+
+    def invalidar(self):
+        with self._lock:
+            self._datos.clear()
+            self.version += 1
+
+
+antiguedad_cache = ReporteDiarioCache(settings.REPORT_CACHE_TTL_SECONDS)
+
+
+# --- INVALIDACIÓN TRAS EL COMMIT ---
+
+def invalidar_al_confirmar(db: Session, cache: ReporteDiarioCache):
+    db.info.setdefault("caches_a_invalidar", set()).add(cache)
+
+@event.listens_for(Session, "after_commit")
+def _invalidar_tras_commit(session):
+    for cache in session.info.pop("caches_a_invalidar", ()):
+        cache.invalidar()
+
+@event.listens_for(Session, "after_rollback")
+def _descartar_tras_rollback(session):
+    session.info.pop("caches_a_invalidar", None)
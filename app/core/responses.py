@@ -0,0 +1,61 @@
+# Archivo: app/core/responses.py
+# Camino rápido de serialización para listados grandes.
+# FastAPI por defecto: valida el retorno contra response_model -> dict -> jsonable_encoder -> json.dumps.
+# Aquí: un TypeAdapter precompilado por esquema valida (solo si hace falta) y serializa
+# directo a bytes en pydantic-core, devolviendo un Response que FastAPI ya no re-valida.
+# Se mantiene response_model en el decorador para que OpenAPI documente igual.
+from functools import lru_cache
+from typing import Any, Dict, List, Optional, Type, Union
+
+from fastapi import Response
+from pydantic import BaseModel, TypeAdapter
+
+from app.core.pagination import NEXT_CURSOR_HEADER, Pagina
+
+
+@lru_cache(maxsize=None)
+def adaptador_lista(schema: Type[BaseModel]) -> TypeAdapter:
+    """TypeAdapter de List[schema], construido una sola vez por esquema."""
+    return TypeAdapter(List[schema])
+
+@lru_cache(maxsize=None)
+def adaptador(schema: Type[BaseModel]) -> TypeAdapter:
+    """TypeAdapter de un solo objeto `schema`."""
+    return TypeAdapter(schema)
+
+def responder_lista(
+    schema: Type[BaseModel],
+    datos: Union[Pagina, List[Any]],
+    validado: bool = False,
+    headers: Optional[Dict[str, str]] = None
+) -> Response:
+    """
+    Serializa una lista (o una Pagina de app.core.pagination) como JSON.
+    - validado=False: `datos` son objetos ORM -> se validan una vez (from_attributes).
+    - validado=True: el servicio ya construyó instancias del esquema -> solo se serializa
+      (evita la doble validación de FastAPI).
+    Si es una Pagina, el cursor siguiente viaja en X-Next-Cursor.
+    """
+    if isinstance(datos, Pagina):
+        items, next_cursor = datos.items, datos.next_cursor
+    else:
+        items, next_cursor = datos, None
+
+    adaptador = adaptador_lista(schema)
+    if not validado:
+        items = adaptador.validate_python(items, from_attributes=True)
+
+    headers = dict(headers or {})
+    if next_cursor:
+        headers[NEXT_CURSOR_HEADER] = next_cursor
+    return Response(content=adaptador.dump_json(items), media_type="application/json", headers=headers)
+
+def responder_objeto(schema: Type[BaseModel], dato: Any, validado: bool = False) -> Response:
+    """
+    Igual que responder_lista para un único objeto. Útil en endpoints async con
+    db.run_sync: se serializa mientras la sesión sync todavía puede hacer lazy loads.
+    """
+    adaptador_objeto = adaptador(schema)
+    if not validado:
+        dato = adaptador_objeto.validate_python(dato, from_attributes=True)
+    return Response(content=adaptador_objeto.dump_json(dato), media_type="application/json")
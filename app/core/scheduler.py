@@ -0,0 +1,141 @@
+# Archivo: app/core/scheduler.py
+# Programador en proceso para tareas nocturnas (sin dependencias externas tipo cron/APScheduler).
+import logging
+import threading
+import zlib
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+from typing import Callable, Iterator, Optional
+
+from sqlalchemy import text
+
+from app.core.config import settings
+from app.db.database import SessionLocal, engine
+
+logger = logging.getLogger(__name__)
+
+
+class DailyJob:
+    """
+    Ejecuta una función una vez al día a la hora indicada, en un hilo daemon.
+    Cada corrida abre su propia sesión de BD y la cierra al terminar.
+    Nota: Con varios workers de uvicorn cada proceso corre su propio hilo, pero en Postgres
+    cada corrida toma un advisory lock con el nombre de la tarea: solo un worker la ejecuta
+    y los demás la saltan. Aun así las tareas deben ser idempotentes (un worker que despierta
+    cuando otro ya terminó la repite).
+    """
+
+    def __init__(self, nombre: str, tarea: Callable, hora: int, minuto: int):
+        self.nombre = nombre
+        self.tarea = tarea
+        self.hora = hora
+        self.minuto = minuto
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def _segundos_hasta_proxima_corrida(self) -> float:
+        ahora = datetime.now()
+        proxima = ahora.replace(hour=self.hora, minute=self.minuto, second=0, microsecond=0)
+        if proxima <= ahora:
+            proxima += timedelta(days=1)
+        return (proxima - ahora).total_seconds()
+
+    def ejecutar(self) -> bool:
+        """Una corrida. False si otro worker la tiene tomada (no se ejecuta)."""
+        with _candado_exclusivo(self.nombre) as obtenido:
+            if not obtenido:
+                logger.info("Tarea '%s' en curso en otro worker: se omite", self.nombre)
+                return False
+            db = SessionLocal()
+            try:
+                resultado = self.tarea(db)
+                logger.info("Tarea '%s' ejecutada: %s", self.nombre, resultado)
+            except Exception:
+                db.rollback()
+                logger.exception("Error ejecutando la tarea '%s'", self.nombre)
+            finally:
+                db.close()
+            return True
+
+    def _run(self):
+        while not self._stop.wait(self._segundos_hasta_proxima_corrida()):
+            try:
+                self.ejecutar()
+            except Exception:
+                logger.exception("No se pudo iniciar la tarea '%s'", self.nombre)
+
+    def start(self):
+        if self._thread and self._thread.is_alive():
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name=f"job-{self.nombre}", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+
+
+@contextmanager
+def _candado_exclusivo(nombre: str) -> Iterator[bool]:
+    """
+    pg_try_advisory_lock de sesión en una conexión propia (no en la de la tarea, que hace
+    commits a mitad de camino). Sin Postgres (SQLite de pruebas) no hay otros workers: True.
+    """
+    if engine.dialect.name != "postgresql":
+        yield True
+        return
+    clave = zlib.crc32(f"yume-job:{nombre}".encode())
+    with engine.connect() as conn:
+        obtenido = conn.execute(text("SELECT pg_try_advisory_lock(:clave)"), {"clave": clave}).scalar()
+        try:
+            yield bool(obtenido)
+        finally:
+            if obtenido:
+                conn.execute(text("SELECT pg_advisory_unlock(:clave)"), {"clave": clave})
+            conn.commit()
+
+
+def _barrido_vencimientos(db):
+    # Import local para evitar ciclos (servicios -> core)
+    from app.services.item_facturable_service import ItemFacturableService
+    resultado = ItemFacturableService(db).check_for_overdue(limite_ids=0)
+    return f"{resultado['total_actualizados']} items vencidos al {resultado['fecha_corte']}"
+
+
+def _refresco_resumen(db):
+    from app.services.resumen_relacion_service import ResumenRelacionService
+    contratos = ResumenRelacionService(db).refrescar_vencidos()
+    db.commit()
+    return f"{contratos} contratos con deuda recién vencida recalculados"
+
+
+def _purga_idempotencia(db):
+    from app.core.idempotency import purgar_vencidas
+    return f"{purgar_vencidas(db)} Idempotency-Key vencidas borradas"
+
+
+def build_jobs() -> list:
+    """Construye la lista de tareas habilitadas según Settings."""
+    jobs = []
+    if settings.OVERDUE_SWEEP_ENABLED:
+        jobs.append(DailyJob(
+            "overdue-sweep",
+            _barrido_vencimientos,
+            settings.OVERDUE_SWEEP_HOUR,
+            settings.OVERDUE_SWEEP_MINUTE
+        ))
+    if settings.RESUMEN_REFRESH_ENABLED:
+        jobs.append(DailyJob(
+            "resumen-refresh",
+            _refresco_resumen,
+            settings.RESUMEN_REFRESH_HOUR,
+            settings.RESUMEN_REFRESH_MINUTE
+        ))
+    if settings.IDEMPOTENCY_PURGE_ENABLED:
+        jobs.append(DailyJob(
+            "idempotency-purge",
+            _purga_idempotencia,
+            settings.IDEMPOTENCY_PURGE_HOUR,
+            settings.IDEMPOTENCY_PURGE_MINUTE
+        ))
+    return jobs
@@ -1,8 +1,13 @@
+import asyncio
+import threading
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timedelta
-from typing import Optional, Union
+from typing import Optional, Tuple, Union
 from jose import jwt # Librería python-jose
 from passlib.context import CryptContext
 
+from app.core.config import settings
+
 # --- CONFIGURACIÓN DE SEGURIDAD ---
 # En producción, esto debería venir de variables de entorno (.env)
 SECRET_KEY = "ESTA_ES_LA_CLAVE_SECRETA_DEL_ERP_INMOBILIARIO_CAMBIAME"
@@ -10,12 +15,52 @@ ALGORITHM = "HS256"
 ACCESS_TOKEN_EXPIRE_MINUTES = 480 # 8 horas de sesión
 
 # Configuración de Hashing (IGUAL QUE EN POPULATE_DB)
-pwd_context = CryptContext(schemes=["pbkdf2_sha256"], deprecated="auto")
+# Las rondas vienen del .env; passlib marca como "needs_update" los hashes con otras rondas.
+pwd_context = CryptContext(
+    schemes=["pbkdf2_sha256"],
+    deprecated="auto",
+    pbkdf2_sha256__default_rounds=settings.PASSWORD_HASH_ROUNDS
+)
+
+# Ejecutor acotado solo para hashing: un aluvión de logins no agota el threadpool de la API
+_verify_executor = ThreadPoolExecutor(
+    max_workers=settings.LOGIN_VERIFY_WORKERS,
+    thread_name_prefix="pwd-verify"
+)
+_verify_slots = threading.BoundedSemaphore(settings.LOGIN_VERIFY_MAX_PENDIENTES)
+
+
+class VerificadorSaturado(Exception):
+    """La cola de verificaciones de contraseña está llena."""
+    pass
+
 
 def verify_password(plain_password, hashed_password):
     """Verifica si la contraseña escrita coincide con el hash de la BD."""
     return pwd_context.verify(plain_password, hashed_password)
 
+def verify_and_update_password(plain_password, hashed_password) -> Tuple[bool, Optional[str]]:
+    """
+    Verifica y, si el hash quedó desactualizado (rondas/esquema), devuelve el nuevo hash.
+    Retorna (valido, nuevo_hash_o_None).
+    """
+    return pwd_context.verify_and_update(plain_password, hashed_password)
+
+async def verify_and_update_password_async(plain_password, hashed_password) -> Tuple[bool, Optional[str]]:
+    """
+    Igual que verify_and_update_password pero en el ejecutor dedicado.
+    Si hay demasiadas verificaciones pendientes lanza VerificadorSaturado (sin hashear).
+    """
+    if not _verify_slots.acquire(blocking=False):
+        raise VerificadorSaturado()
+    try:
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(
+            _verify_executor, pwd_context.verify_and_update, plain_password, hashed_password
+        )
+    finally:
+        _verify_slots.release()
+
 def get_password_hash(password):
     """Genera el hash para guardar en BD (usado al crear usuarios)."""
     return pwd_context.hash(password)
@@ -29,8 +74,8 @@ def create_access_token(data: dict, expires_delta: Optional[timedelta] = None):
     else:
         expire = datetime.utcnow() + timedelta(minutes=15)
     
-    # Agregamos la fecha de expiración al token
-    to_encode.update({"exp": expire})
+    # Agregamos la fecha de expiración y de emisión (iat: clave del caché de sesión)
+    to_encode.update({"exp": expire, "iat": datetime.utcnow()})
     
     # Firmamos digitalmente
     encoded_jwt = jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
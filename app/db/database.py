@@ -1,19 +1,155 @@
-from sqlalchemy import create_engine
-from sqlalchemy.orm import sessionmaker, declarative_base
+import threading
+import time
+from contextlib import contextmanager
+from typing import Dict, Iterator
+
+from sqlalchemy import create_engine, event
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
+from sqlalchemy.orm import Session, sessionmaker, declarative_base
 # IMPORTANTE: Aquí importamos la configuración que acabamos de crear
 from app.core.config import settings
+from app.db.pool import InstrumentedQueuePool
+
+def _engine_kwargs(url: str) -> dict:
+    """Opciones del motor tomadas de Settings (pool, timeouts, executemany)."""
+    kwargs = dict(
+        poolclass=InstrumentedQueuePool,
+        pool_size=settings.DB_POOL_SIZE,
+        max_overflow=settings.DB_MAX_OVERFLOW,
+        pool_timeout=settings.DB_POOL_TIMEOUT,
+        pool_recycle=settings.DB_POOL_RECYCLE,
+        # pool_pre_ping verifica que la conexión siga viva antes de usarla
+        # (evita errores si la BD se reinicia), a costa de un round trip por checkout.
+        pool_pre_ping=settings.DB_POOL_PRE_PING,
+    )
+
+    if url.startswith("postgresql"):
+        opciones = []
+        if settings.DB_STATEMENT_TIMEOUT_MS > 0:
+            opciones.append(f"-c statement_timeout={settings.DB_STATEMENT_TIMEOUT_MS}")
+        connect_args = {"application_name": settings.DB_APPLICATION_NAME}
+        if opciones:
+            connect_args["options"] = " ".join(opciones)
+        kwargs["connect_args"] = connect_args
+        kwargs["executemany_mode"] = settings.DB_EXECUTEMANY_MODE
+
+    return kwargs
 
 # 1. Crear el motor (Engine)
 # En lugar de escribir la URL aquí, la traemos de settings.DATABASE_URL
-engine = create_engine(
-    settings.DATABASE_URL,
-    # pool_pre_ping=True es muy útil: verifica que la conexión siga viva
-    # antes de intentar usarla (evita errores si la BD se reinicia).
-    pool_pre_ping=True
-)
+engine = create_engine(settings.DATABASE_URL, **_engine_kwargs(settings.DATABASE_URL))
+
+def _url_async(url: str) -> str:
+    """Driver async equivalente: asyncpg para Postgres, aiosqlite para pruebas locales con SQLite."""
+    return url.replace("postgresql://", "postgresql+asyncpg://", 1).replace("sqlite://", "sqlite+aiosqlite://", 1)
+
+def _async_engine_kwargs(url: str) -> dict:
+    """Mismas opciones para el motor async (pool asyncio propio; asyncpg usa server_settings)."""
+    kwargs = dict(
+        pool_size=settings.ASYNC_DB_POOL_SIZE,
+        max_overflow=settings.ASYNC_DB_MAX_OVERFLOW,
+        pool_timeout=settings.DB_POOL_TIMEOUT,
+        pool_recycle=settings.DB_POOL_RECYCLE,
+        pool_pre_ping=settings.DB_POOL_PRE_PING,
+    )
+    if url.startswith("postgresql"):
+        server_settings = {"application_name": settings.DB_APPLICATION_NAME}
+        if settings.DB_STATEMENT_TIMEOUT_MS > 0:
+            server_settings["statement_timeout"] = str(settings.DB_STATEMENT_TIMEOUT_MS)
+        kwargs["connect_args"] = {"server_settings": server_settings}
+    return kwargs
+
+# 1.1 Motor ASYNC para los endpoints de solo lectura (reportes, caja, listados).
+# Un request esperando a Postgres no ocupa un hilo del threadpool de anyio.
+async_engine = create_async_engine(_url_async(settings.DATABASE_URL), **_async_engine_kwargs(settings.DATABASE_URL))
+
+# 1.2 Réplica de lectura (opcional). Solo la usan las dependencias de lectura (deps.get_async_read_db).
+async_replica_engine = create_async_engine(
+    _url_async(settings.DATABASE_REPLICA_URL), **_async_engine_kwargs(settings.DATABASE_REPLICA_URL)
+) if settings.DATABASE_REPLICA_URL else None
+
+# 1.3 Instrumentación: conteo de sentencias y tiempo de BD por request
+if settings.DB_METRICS_ENABLED:
+    from app.core.db_metrics import instrumentar_engine
+    instrumentar_engine(engine)
+    instrumentar_engine(async_engine.sync_engine)
+    if async_replica_engine is not None:
+        instrumentar_engine(async_replica_engine.sync_engine)
+
+# 1.4 Enrutamiento primario / réplica
+class RoutingSession(Session):
+    """
+    Todo va al primario, salvo que la sesión se haya marcado de solo lectura con
+    usar_replica(). Aun así, un flush o un INSERT/UPDATE/DELETE nunca sale hacia la réplica.
+    """
+
+    def get_bind(self, mapper=None, clause=None, **kw):
+        replica = self.info.get("replica")
+        if replica is not None and not self._flushing and not getattr(clause, "is_dml", False):
+            return replica
+        return super().get_bind(mapper=mapper, clause=clause, **kw)
+
+def usar_replica(db: AsyncSession):
+    """Marca una sesión async para leer de la réplica (si hay una configurada)."""
+    if async_replica_engine is not None:
+        db.sync_session.info["replica"] = async_replica_engine.sync_engine
+
+@contextmanager
+def en_primario(db: Session) -> Iterator[Session]:
+    """
+    Dentro del bloque, las lecturas de una sesión marcada con usar_replica() van al primario.
+    Para resultados que se cachean: la invalidación ocurre al confirmar en el primario y
+    la réplica puede seguir atrasada, así que un valor leído de ella quedaría cacheado viejo.
+    """
+    replica = db.info.pop("replica", None)
+    try:
+        yield db
+    finally:
+        if replica is not None:
+            db.info["replica"] = replica
+
+# Read-your-writes: id_usuario -> instante (monotonic) de su último commit con escrituras.
+# Es por proceso: con varios workers, la ventana solo protege al worker que atendió la escritura.
+_ultima_escritura: Dict[int, float] = {}
+_escrituras_lock = threading.Lock()
+
+def escritura_reciente(id_usuario: int) -> bool:
+    """True si el usuario escribió hace menos de REPLICA_STICKY_SECONDS (debe leer del primario)."""
+    momento = _ultima_escritura.get(id_usuario)
+    return momento is not None and time.monotonic() - momento < settings.REPLICA_STICKY_SECONDS
+
+def _registrar_escritura(id_usuario: int):
+    ahora = time.monotonic()
+    with _escrituras_lock:
+        _ultima_escritura[id_usuario] = ahora
+        if len(_ultima_escritura) > 4096:
+            for clave, momento in list(_ultima_escritura.items()):
+                if ahora - momento >= settings.REPLICA_STICKY_SECONDS:
+                    del _ultima_escritura[clave]
+
+@event.listens_for(RoutingSession, "after_flush")
+def _marcar_flush(session, flush_context):
+    if session.new or session.dirty or session.deleted:
+        session.info["escribio"] = True
+
+@event.listens_for(RoutingSession, "do_orm_execute")
+def _marcar_dml(orm_execute_state):
+    # UPDATE/DELETE masivos (query.update(), db.execute(update(...))) no pasan por el flush
+    if orm_execute_state.is_update or orm_execute_state.is_delete or orm_execute_state.is_insert:
+        orm_execute_state.session.info["escribio"] = True
+
+@event.listens_for(RoutingSession, "after_commit")
+def _commit_con_escrituras(session):
+    # deps.get_current_user deja el id_usuario en session.info
+    if session.info.pop("escribio", False) and session.info.get("id_usuario"):
+        _registrar_escritura(session.info["id_usuario"])
+
+@event.listens_for(RoutingSession, "after_rollback")
+def _rollback(session):
+    session.info.pop("escribio", None)
 
 # 2. Configurar la Sesión (Igual que antes)
-SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine, class_=RoutingSession)
 
 # 3. Base Declarativa (Igual que antes)
 Base = declarative_base()
@@ -24,4 +160,16 @@ def get_db():
     try:
         yield db
     finally:
-        db.close()
\ No newline at end of file
+        db.close()
+
+# 5. Sesión y dependencia ASYNC (solo lectura)
+# Los servicios siguen siendo sync (db.query): el endpoint los corre con
+#   await db.run_sync(lambda s: Servicio(s).metodo(...))
+# y serializa DENTRO de run_sync (fuera de él, un lazy load lanza MissingGreenlet).
+AsyncSessionLocal = async_sessionmaker(
+    async_engine, class_=AsyncSession, sync_session_class=RoutingSession, autoflush=False, expire_on_commit=False
+)
+
+async def get_async_db():
+    async with AsyncSessionLocal() as db:
+        yield db
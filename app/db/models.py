@@ -1,10 +1,21 @@
-from sqlalchemy import Column, Integer, String, Float, Numeric, Date, DateTime, Boolean, ForeignKey, UniqueConstraint, Index, JSON
+from sqlalchemy import Column, Integer, String, Float, Numeric, Date, DateTime, Boolean, ForeignKey, UniqueConstraint, Index, JSON, DDL, event
 from sqlalchemy.orm import relationship
 from datetime import datetime
 
+from app.core.busqueda import normalizar_busqueda
+
 # Importamos la Base del archivo de conexión
 from .database import Base
 
+# Los índices *_trgm (GIN gin_trgm_ops) necesitan la extensión pg_trgm
+event.listen(
+    Base.metadata, "before_create",
+    DDL("CREATE EXTENSION IF NOT EXISTS pg_trgm").execute_if(dialect="postgresql")
+)
+
+def _indice_trgm(nombre: str, columna: str) -> Index:
+    return Index(nombre, columna, postgresql_using='gin', postgresql_ops={columna: 'gin_trgm_ops'})
+
 # ==============================================================================
 # 🛡️ MÓDULO DE SEGURIDAD Y AUDITORÍA (FASE 2)
 # ==============================================================================
@@ -119,6 +130,9 @@ class MedioIngreso(Base):
 
 class Persona(Base):
     __tablename__ = 'persona'
+    __table_args__ = (
+        _indice_trgm('ix_persona_busqueda_trgm', 'texto_busqueda'),
+    )
     id_persona = Column(Integer, primary_key=True, index=True)
     nombres = Column(String(50), nullable=False)
     apellidos = Column(String(50), nullable=False)
@@ -127,6 +141,8 @@ class Persona(Base):
     email = Column(String(100))
     activo = Column(Boolean, default=True)
     fecha_creacion = Column(DateTime, default=datetime.utcnow)
+    # Nombres, apellidos, teléfonos y email normalizados (sin tildes). Lo mantiene el ORM.
+    texto_busqueda = Column(String(300), nullable=True)
 
     # ### MODIFICADO ###
     # Agregamos la relación inversa hacia Usuario
@@ -140,12 +156,17 @@ class Persona(Base):
 
 class UnidadServicio(Base):
     __tablename__ = 'unidad_servicio'
+    __table_args__ = (
+        _indice_trgm('ix_unidad_busqueda_trgm', 'texto_busqueda'),
+    )
     id_unidad = Column(Integer, primary_key=True, index=True)
     identificador_unico = Column(String(50), nullable=False, unique=True)
     tipo_unidad = Column(String(50))
     estado = Column(String(20))
     activo = Column(Boolean, default=True)
     fecha_creacion = Column(DateTime, default=datetime.utcnow)
+    # identificador_unico + tipo_unidad normalizados. Lo mantiene el ORM.
+    texto_busqueda = Column(String(120), nullable=True)
 
     relaciones = relationship("RelacionCliente", back_populates="unidad")
     items_facturables = relationship("ItemFacturable", back_populates="unidad")
@@ -321,4 +342,91 @@ class TransaccionIngresoDetalle(Base):
     fecha_creacion = Column(DateTime, default=datetime.utcnow)
 
     transaccion = relationship("TransaccionIngreso", back_populates="detalles")
-    item_facturable = relationship("ItemFacturable", back_populates="detalles_pago")
\ No newline at end of file
+    item_facturable = relationship("ItemFacturable", back_populates="detalles_pago")
+
+# --- CONTROL DE CAJA (LEDGER INCREMENTAL) ---
+
+class CajaSaldo(Base):
+    """
+    Foto acumulada de la caja física (una sola fila, id_caja = 1).
+    Se actualiza en la misma transacción que cada ingreso en efectivo,
+    gasto o depósito (alta y anulación), así el saldo es una lectura O(1).
+    Puede recalcularse desde cero con CajaService.reconciliar_ledger().
+    """
+    __tablename__ = 'caja_saldo'
+    id_caja = Column(Integer, primary_key=True)
+    total_ingresos_efectivo = Column(Numeric(14, 2), default=0.00, nullable=False)
+    total_gastos = Column(Numeric(14, 2), default=0.00, nullable=False)
+    total_depositos = Column(Numeric(14, 2), default=0.00, nullable=False)
+    fecha_actualizacion = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+# --- IDEMPOTENCIA DE POST QUE MUEVEN DINERO ---
+
+class IdempotencyKey(Base):
+    """
+    Una fila por (usuario, Idempotency-Key). La restricción única es el candado:
+    dos reintentos simultáneos no pueden ejecutar el servicio dos veces.
+    Guarda el hash de la solicitud y la respuesta para re-emitirla tal cual.
+    Las vencidas se purgan con la tarea programada 'idempotency-purge'.
+    """
+    __tablename__ = 'idempotency_key'
+    __table_args__ = (
+        UniqueConstraint('id_usuario', 'clave', name='uq_idempotency_usuario_clave'),
+        Index('ix_idempotency_expiracion', 'fecha_expiracion'),
+    )
+    id_idempotency = Column(Integer, primary_key=True)
+    id_usuario = Column(Integer, ForeignKey('usuario.id_usuario'), nullable=False)
+    clave = Column(String(100), nullable=False)
+    endpoint = Column(String(100), nullable=False)         # "POST /v1/egresos/"
+    hash_solicitud = Column(String(64), nullable=False)    # sha256 de método + ruta + body
+    estado = Column(String(20), nullable=False, default='en_proceso')  # en_proceso / ejecutado / completado
+    status_code = Column(Integer, nullable=True)
+    respuesta = Column(JSON, nullable=True)
+    fecha_creacion = Column(DateTime, default=datetime.utcnow, nullable=False)
+    fecha_expiracion = Column(DateTime, nullable=False)
+
+# --- RESUMEN MATERIALIZADO POR CONTRATO ---
+
+class ResumenRelacion(Base):
+    """
+    Totales de deuda por contrato (una fila por RelacionCliente), mantenidos en la
+    misma transacción que cada pago, anulación, generación o barrido de vencimientos
+    (ResumenRelacionService.refrescar). Los dashboards leen una fila por contrato en
+    lugar de agregar item_facturable. Se reconstruye con: python -m app.cli reconstruir-resumen
+    """
+    __tablename__ = 'resumen_relacion'
+    __table_args__ = (
+        Index('ix_resumen_total_vencido', 'total_vencido'),
+        Index('ix_resumen_vencimiento_antiguo', 'vencimiento_mas_antiguo'),
+    )
+    id_relacion = Column(Integer, ForeignKey('relacion_cliente.id_relacion', ondelete='CASCADE'), primary_key=True)
+    total_pendiente = Column(Numeric(12, 2), default=0.00, nullable=False)
+    total_vencido = Column(Numeric(12, 2), default=0.00, nullable=False)   # Vencido al momento del último refresco
+    vencimiento_mas_antiguo = Column(Date, nullable=True)                  # De las deudas abiertas
+    items_abiertos = Column(Integer, default=0, nullable=False)
+    items_vencidos = Column(Integer, default=0, nullable=False)
+    ultimo_periodo_pagado = Column(String(10), nullable=True)
+    saldo_favor = Column(Numeric(10, 2), default=0.00, nullable=False)
+    fecha_actualizacion = Column(DateTime, default=datetime.utcnow, nullable=False)
+
+    relacion = relationship("RelacionCliente")
+
+# --- TEXTO DE BÚSQUEDA (BUSCADOR UNIFICADO /buscar) ---
+# Se recalcula en cada INSERT/UPDATE hecho por el ORM. Las filas anteriores se completan
+# con: python -m app.cli reindexar-busqueda
+
+def texto_busqueda_persona(p: Persona) -> str:
+    return normalizar_busqueda(p.nombres, p.apellidos, p.telefono, p.celular, p.email)
+
+def texto_busqueda_unidad(u: UnidadServicio) -> str:
+    return normalizar_busqueda(u.identificador_unico, u.tipo_unidad)
+
+@event.listens_for(Persona, "before_insert")
+@event.listens_for(Persona, "before_update")
+def _actualizar_busqueda_persona(mapper, connection, target):
+    target.texto_busqueda = texto_busqueda_persona(target)
+
+@event.listens_for(UnidadServicio, "before_insert")
+@event.listens_for(UnidadServicio, "before_update")
+def _actualizar_busqueda_unidad(mapper, connection, target):
+    target.texto_busqueda = texto_busqueda_unidad(target)
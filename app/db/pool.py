@@ -0,0 +1,59 @@
+# Archivo: app/db/pool.py
+# Pool de conexiones instrumentado: además de lo que ya reporta QueuePool
+# (checked-out, overflow) mide cuántas veces y cuánto se esperó por una conexión.
+import os
+import threading
+import time
+
+from sqlalchemy.exc import TimeoutError as PoolTimeoutError
+from sqlalchemy.pool import QueuePool
+
+# Una espera mayor a esto (ms) se cuenta como "espera real" por el pool
+UMBRAL_ESPERA_MS = 5.0
+
+
+class InstrumentedQueuePool(QueuePool):
+    """QueuePool que acumula métricas de checkout (por proceso/worker)."""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._metricas_lock = threading.Lock()
+        self._checkouts = 0
+        self._esperas = 0
+        self._timeouts = 0
+        self._espera_total_ms = 0.0
+        self._espera_max_ms = 0.0
+
+    def _do_get(self):
+        inicio = time.perf_counter()
+        try:
+            return super()._do_get()
+        except PoolTimeoutError:
+            with self._metricas_lock:
+                self._timeouts += 1
+            raise
+        finally:
+            espera_ms = (time.perf_counter() - inicio) * 1000
+            with self._metricas_lock:
+                self._checkouts += 1
+                self._espera_total_ms += espera_ms
+                self._espera_max_ms = max(self._espera_max_ms, espera_ms)
+                if espera_ms > UMBRAL_ESPERA_MS:
+                    self._esperas += 1
+
+    def estadisticas(self) -> dict:
+        with self._metricas_lock:
+            return {
+                "pid": os.getpid(),
+                "pool_size": self.size(),
+                "checked_out": self.checkedout(),
+                "checked_in": self.checkedin(),
+                "overflow": self.overflow(),
+                "max_overflow": self._max_overflow,
+                "timeout_s": self._timeout,
+                "checkouts_totales": self._checkouts,
+                "esperas": self._esperas,
+                "timeouts": self._timeouts,
+                "espera_promedio_ms": round(self._espera_total_ms / self._checkouts, 3) if self._checkouts else 0.0,
+                "espera_max_ms": round(self._espera_max_ms, 3),
+            }
@@ -0,0 +1,27 @@
+# Archivo: app/schemas/busqueda_schema.py
+from pydantic import BaseModel
+from typing import List, Optional, Literal
+
+# ======================================================================
+# BUSCADOR UNIFICADO (PERSONAS, UNIDADES, CONTRATOS)
+# ======================================================================
+
+TipoResultadoBusqueda = Literal["persona", "unidad", "relacion"]
+
+class ResultadoBusqueda(BaseModel):
+    tipo: TipoResultadoBusqueda
+    id: int                               # id_persona, id_unidad o id_relacion según el tipo
+    titulo: str                           # Ej: "Juan Pérez", "A-101", "A-101 · Juan Pérez"
+    detalle: Optional[str] = None         # Celular, tipo de unidad o tipo de relación
+    rango: int                            # 0 = igual, 1 = empieza, 2 = palabra empieza, 3 = contiene
+    id_persona: Optional[int] = None
+    id_unidad: Optional[int] = None
+
+class BusquedaResponse(BaseModel):
+    consulta: str
+    resultados: List[ResultadoBusqueda]
+
+class ReindexacionBusqueda(BaseModel):
+    personas: int
+    unidades: int
+    duracion_ms: float
@@ -1,7 +1,7 @@
 # Archivo: app/schemas/caja_schema.py
 from pydantic import BaseModel
-from datetime import datetime
-from typing import List, Optional
+from datetime import datetime, date
+from typing import List, Optional, Dict
 
 # --- MODELO 1: EL BALANCE (FOTO DEL MOMENTO) ---
 class BalanceCaja(BaseModel):
@@ -29,7 +29,22 @@ class MovimientoCaja(BaseModel):
     class Config:
         from_attributes = True
 
-# --- MODELO 3: EL LIBRO DIARIO COMPLETO ---
+# --- MODELO 3: EL LIBRO DIARIO (PÁGINA) ---
 class ReporteLibroCaja(BaseModel):
     saldo_actual: float
-    movimientos: List[MovimientoCaja]
\ No newline at end of file
+    saldo_apertura: float = 0.0  # Saldo al inicio de fecha_desde
+    saldo_cierre: float = 0.0    # Saldo al final de fecha_hasta
+    fecha_desde: Optional[date] = None
+    fecha_hasta: Optional[date] = None
+    next_cursor: Optional[str] = None  # None = no hay más páginas
+    movimientos: List[MovimientoCaja]
+
+# --- MODELO 4: RECONCILIACIÓN DEL LEDGER ---
+class ReconciliacionCaja(BaseModel):
+    ledger_existia: bool
+    saldo_ledger: float
+    saldo_recalculado: float
+    diferencias: Dict[str, float]  # ledger - recalculado, por componente
+    desfase_detectado: bool
+    corregido: bool
+    fecha_corte: datetime
@@ -0,0 +1,41 @@
+# Archivo: app/schemas/importacion_pagos_schema.py
+from pydantic import BaseModel
+from datetime import date
+from typing import Optional, Literal
+
+# ======================================================================
+# IMPORTACIÓN MASIVA DE PAGOS (EXTRACTO BANCARIO)
+# ======================================================================
+
+EstadoFilaImportacion = Literal["aplicado", "sin_coincidencia", "duplicado", "invalido", "error"]
+
+class FilaExtracto(BaseModel):
+    """Una fila del extracto, ya normalizada (CSV o JSON)."""
+    fila: int
+    fecha: date
+    monto: float
+    referencia: Optional[str] = None      # Nº de operación del banco -> num_documento
+    unidad: Optional[str] = None          # identificador_unico de la unidad (si el banco lo trae)
+    id_relacion: Optional[int] = None     # Si el archivo ya viene conciliado
+    descripcion: Optional[str] = None
+
+class ResultadoFilaImportacion(BaseModel):
+    """Una línea del reporte: qué pasó con cada fila del archivo."""
+    fila: int
+    estado: EstadoFilaImportacion
+    referencia: Optional[str] = None
+    monto: Optional[float] = None
+    id_relacion: Optional[int] = None
+    id_transaccion: Optional[int] = None
+    monto_aplicado_deudas: Optional[float] = None
+    monto_a_billetera: Optional[float] = None
+    detalle: Optional[str] = None
+
+class ResumenImportacion(BaseModel):
+    filas: int = 0
+    aplicado: int = 0
+    sin_coincidencia: int = 0
+    duplicado: int = 0
+    invalido: int = 0
+    error: int = 0
+    monto_aplicado: float = 0.0
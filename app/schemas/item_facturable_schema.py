@@ -71,6 +71,12 @@ class ItemFacturableFilter(BaseModel):
             self.periodo, self.fecha_vencimiento_min, self.fecha_vencimiento_max
         ])
 
+# --- 5.1 Resultado del barrido de vencimientos ---
+class OverdueCheckResult(BaseModel):
+    fecha_corte: date
+    total_actualizados: int = Field(..., description="Cantidad de items marcados como 'vencido'.")
+    ids_actualizados: List[int] = Field(default=[], description="Muestra (acotada) de IDs afectados.")
+
 # --- 6. GENERACIÓN INTELIGENTE ---
 class GenerarCuotaRequest(BaseModel):
     id_unidad: int
@@ -1,4 +1,4 @@
-from pydantic import BaseModel
+from pydantic import BaseModel, Field
 from typing import List, Optional
 from datetime import date, datetime
 
@@ -44,6 +44,10 @@ class EstadoCuentaResponse(BaseModel):
     deudas_pendientes: List[ItemDeuda]
     ultimos_pagos: List[ItemPago]
 
+class EstadoCuentaLoteRequest(BaseModel):
+    """Lista de personas para generar estados de cuenta en bloque (Ej: envío mensual)."""
+    ids_persona: List[int] = Field(..., min_length=1, max_length=500)
+
 # 4. REPORTE GERENCIAL (TABLA DE MOROSIDAD)
 
 class DetalleDeudaMoroso(BaseModel):
@@ -59,7 +63,50 @@ class MorosoResponse(BaseModel):
     nombre_inquilino: str
     total_deuda: float
     cantidad_meses: int
+    dias_atraso_max: int = 0
     detalles: List[DetalleDeudaMoroso] = []
 
     class Config:
-        from_attributes = True
\ No newline at end of file
+        from_attributes = True
+# 5. RESUMEN MATERIALIZADO POR CONTRATO (DASHBOARDS)
+
+class ResumenContratoResponse(BaseModel):
+    """Una fila de resumen_relacion con los nombres para mostrar."""
+    id_relacion: int
+    id_unidad: int
+    identificador_unico: str
+    nombre_inquilino: str
+    estado_contrato: str
+    total_pendiente: float
+    total_vencido: float
+    vencimiento_mas_antiguo: Optional[date] = None
+    items_abiertos: int
+    items_vencidos: int
+    ultimo_periodo_pagado: Optional[str] = None
+    saldo_favor: float
+    fecha_actualizacion: datetime
+
+class ReconstruccionResumen(BaseModel):
+    contratos: int
+    duracion_ms: float
+
+# 6. ANTIGÜEDAD DE SALDOS (CUENTAS POR COBRAR VENCIDAS)
+
+class BucketsAntiguedad(BaseModel):
+    """Saldo vencido repartido por días de atraso."""
+    dias_0_30: float = 0.0
+    dias_31_60: float = 0.0
+    dias_61_90: float = 0.0
+    dias_90_mas: float = 0.0
+    total: float = 0.0
+    cantidad_items: int = 0
+
+class FilaAntiguedad(BucketsAntiguedad):
+    clave: str      # id_unidad, id_concepto o periodo
+    etiqueta: str   # identificador de la unidad, nombre del concepto o periodo
+
+class ReporteAntiguedadResponse(BaseModel):
+    fecha_corte: date
+    agrupado_por: str
+    totales: BucketsAntiguedad
+    filas: List[FilaAntiguedad]
@@ -119,7 +119,8 @@ class TransaccionIngresoAnulacion(BaseModel):
     motivo_anulacion: str = Field(..., min_length=10)
     model_config = ConfigDict(from_attributes=True)
         
-class TransaccionIngreso(TransaccionIngresoBase):
+class TransaccionIngresoResumen(TransaccionIngresoBase):
+    """Vista liviana para tablas: cabecera + cliente, sin detalles."""
     id_transaccion: int
     estado: str
     id_catalogo: int 
@@ -127,11 +128,15 @@ class TransaccionIngreso(TransaccionIngresoBase):
     fecha_modificacion: datetime 
     fecha_anulacion: Optional[datetime] = None
     monto_billetera_usado: float = 0.0
-    detalles: List[TransaccionIngresoDetalle] = []  
     relacion_cliente: Optional[RelacionClienteReporte] = None
     
     model_config = ConfigDict(from_attributes=True)
 
+class TransaccionIngreso(TransaccionIngresoResumen):
+    detalles: List[TransaccionIngresoDetalle] = []  
+    
+    model_config = ConfigDict(from_attributes=True)
+
 # ======================================================================
 # ESQUEMAS PARA SIMULACIÓN
 # ======================================================================
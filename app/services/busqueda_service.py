@@ -0,0 +1,159 @@
+# Archivo: app/services/busqueda_service.py
+# Buscador unificado de caja: personas, unidades y contratos en una sola llamada.
+# Filtra por texto_busqueda (normalizado, índice GIN pg_trgm) y ordena por relevancia:
+# coincidencia exacta, luego prefijo, luego prefijo de alguna palabra, luego "contiene".
+# Cada consulta lleva LIMIT: el costo no crece con el tamaño del padrón.
+import time
+from typing import Dict, List
+
+from sqlalchemy import case, func, or_
+from sqlalchemy.orm import Session
+
+from app.core.busqueda import contiene, escapar_like, terminos_busqueda
+from app.db import models
+from app.db.models import Persona, RelacionCliente, UnidadServicio
+from app.schemas import busqueda_schema
+
+ORDEN_TIPOS = {"persona": 0, "unidad": 1, "relacion": 2}
+TAMANO_LOTE_REINDEXADO = 1000
+
+
+class BusquedaService:
+    def __init__(self, db: Session):
+        self.db = db
+
+    # ----------------------------------------------------------------------
+    # 1. BÚSQUEDA
+    # ----------------------------------------------------------------------
+    @staticmethod
+    def _rango(columna, consulta: str):
+        patron = escapar_like(consulta)
+        return case(
+            (columna == consulta, 0),
+            (columna.like(f"{patron}%", escape="\\"), 1),
+            (columna.like(f"% {patron}%", escape="\\"), 2),
+            else_=3
+        ).label("rango")
+
+    @staticmethod
+    def _rango_heredado(rango_persona: Dict[int, int], rango_unidad: Dict[int, int]):
+        """Mejor rango entre la persona y la unidad del contrato (3 si ninguna coincidió)."""
+        condiciones = []
+        for valor in sorted(set(rango_persona.values()) | set(rango_unidad.values())):
+            ids_persona = [i for i, r in rango_persona.items() if r == valor]
+            ids_unidad = [i for i, r in rango_unidad.items() if r == valor]
+            condiciones.append((or_(
+                RelacionCliente.id_persona.in_(ids_persona),
+                RelacionCliente.id_unidad.in_(ids_unidad)
+            ), valor))
+        return case(*condiciones, else_=3).label("rango")
+
+    def _filtrar(self, query, modelo, terminos: List[str]):
+        return query.filter(*(contiene(modelo.texto_busqueda, t) for t in terminos))
+
+    def buscar(self, q: str, limite: int = 20, solo_activos: bool = True) -> busqueda_schema.BusquedaResponse:
+        terminos = terminos_busqueda(q)
+        consulta = " ".join(terminos)
+        if not terminos:
+            return busqueda_schema.BusquedaResponse(consulta=consulta, resultados=[])
+
+        # A. PERSONAS
+        rango = self._rango(Persona.texto_busqueda, consulta)
+        query = self._filtrar(
+            self.db.query(Persona.id_persona, Persona.nombres, Persona.apellidos, Persona.celular, rango),
+            Persona, terminos
+        )
+        if solo_activos:
+            query = query.filter(Persona.activo == True)
+        personas = query.order_by(rango, func.length(Persona.texto_busqueda), Persona.id_persona).limit(limite).all()
+
+        # B. UNIDADES
+        rango = self._rango(UnidadServicio.texto_busqueda, consulta)
+        query = self._filtrar(
+            self.db.query(UnidadServicio.id_unidad, UnidadServicio.identificador_unico, UnidadServicio.tipo_unidad, rango),
+            UnidadServicio, terminos
+        )
+        if solo_activos:
+            query = query.filter(UnidadServicio.activo == True)
+        unidades = query.order_by(rango, func.length(UnidadServicio.texto_busqueda), UnidadServicio.id_unidad).limit(limite).all()
+
+        resultados = [
+            busqueda_schema.ResultadoBusqueda(
+                tipo="persona", id=p.id_persona, titulo=f"{p.nombres} {p.apellidos}",
+                detalle=p.celular, rango=p.rango, id_persona=p.id_persona
+            )
+            for p in personas
+        ] + [
+            busqueda_schema.ResultadoBusqueda(
+                tipo="unidad", id=u.id_unidad, titulo=u.identificador_unico,
+                detalle=u.tipo_unidad, rango=u.rango, id_unidad=u.id_unidad
+            )
+            for u in unidades
+        ]
+
+        # C. CONTRATOS de las personas/unidades encontradas (heredan el mejor rango).
+        # El rango heredado se calcula en SQL y se ordena por él ANTES del LIMIT: si no, con
+        # muchos contratos los de la coincidencia exacta podrían quedar fuera.
+        rango_persona = {p.id_persona: p.rango for p in personas}
+        rango_unidad = {u.id_unidad: u.rango for u in unidades}
+        if rango_persona or rango_unidad:
+            rango = self._rango_heredado(rango_persona, rango_unidad)
+            relaciones = self.db.query(
+                RelacionCliente.id_relacion,
+                RelacionCliente.id_persona,
+                RelacionCliente.id_unidad,
+                RelacionCliente.tipo_relacion,
+                UnidadServicio.identificador_unico,
+                Persona.nombres,
+                Persona.apellidos,
+                rango
+            ).outerjoin(UnidadServicio, UnidadServicio.id_unidad == RelacionCliente.id_unidad)\
+                .outerjoin(Persona, Persona.id_persona == RelacionCliente.id_persona)\
+                .filter(
+                    RelacionCliente.estado == 'Activo',
+                    or_(
+                        RelacionCliente.id_persona.in_(list(rango_persona)),
+                        RelacionCliente.id_unidad.in_(list(rango_unidad))
+                    )
+                ).order_by(rango, RelacionCliente.id_relacion).limit(limite).all()
+
+            for r in relaciones:
+                nombre = f"{r.nombres} {r.apellidos}" if r.nombres is not None else "Desconocido"
+                resultados.append(busqueda_schema.ResultadoBusqueda(
+                    tipo="relacion", id=r.id_relacion,
+                    titulo=f"{r.identificador_unico or f'ID-{r.id_unidad}'} · {nombre}",
+                    detalle=r.tipo_relacion, rango=r.rango,
+                    id_persona=r.id_persona, id_unidad=r.id_unidad
+                ))
+
+        resultados.sort(key=lambda r: (r.rango, ORDEN_TIPOS[r.tipo]))
+        return busqueda_schema.BusquedaResponse(consulta=consulta, resultados=resultados[:limite])
+
+    # ----------------------------------------------------------------------
+    # 2. MANTENIMIENTO (FILAS ANTERIORES A LA COLUMNA texto_busqueda)
+    # ----------------------------------------------------------------------
+    def reindexar(self) -> busqueda_schema.ReindexacionBusqueda:
+        """Recalcula texto_busqueda de todas las personas y unidades (commit por lote)."""
+        inicio = time.perf_counter()
+        personas = self._reindexar(Persona, Persona.id_persona, models.texto_busqueda_persona)
+        unidades = self._reindexar(UnidadServicio, UnidadServicio.id_unidad, models.texto_busqueda_unidad)
+        return busqueda_schema.ReindexacionBusqueda(
+            personas=personas,
+            unidades=unidades,
+            duracion_ms=round((time.perf_counter() - inicio) * 1000, 1)
+        )
+
+    def _reindexar(self, modelo, pk, calcular) -> int:
+        actualizadas, ultimo = 0, 0
+        while True:
+            filas = self.db.query(modelo).filter(pk > ultimo).order_by(pk).limit(TAMANO_LOTE_REINDEXADO).all()
+            if not filas:
+                return actualizadas
+            for fila in filas:
+                texto = calcular(fila)
+                if fila.texto_busqueda != texto:
+                    fila.texto_busqueda = texto
+                    actualizadas += 1
+            ultimo = getattr(filas[-1], pk.key)
+            self.db.commit()
+            self.db.expunge_all()
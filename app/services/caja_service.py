@@ -1,31 +1,37 @@
 # Archivo: app/services/caja_service.py
 from sqlalchemy.orm import Session
-from sqlalchemy import func
+from sqlalchemy import func, update, select, union_all, literal, cast, case, String, Numeric
+from sqlalchemy.dialects import postgresql, sqlite
 from fastapi import HTTPException
-from datetime import datetime
-from typing import List
+from datetime import datetime, date, time, timedelta
+from typing import List, Optional, Iterator
 
 from app.db import models
 from app.schemas import caja_schema
+from app.core.pagination import filtro_cursor, cortar_pagina
+from app.core.catalog_cache import catalog_cache
+
+# Fila única del ledger de caja (tabla caja_saldo)
+LEDGER_ID = 1
+
+# Filas por lote al exportar el libro diario (cursor del lado del servidor)
+EXPORT_BATCH_SIZE = 1000
 
 class CajaService:
     def __init__(self, db: Session):
         self.db = db
 
     def _get_id_efectivo(self) -> int:
-        """Helper para buscar el ID del medio de pago Efectivo."""
-        # Ajusta el string dentro del ilike si tu BD dice "Efectivo/Caja"
-        medio = self.db.query(models.MedioIngreso).filter(
-            models.MedioIngreso.nombre.ilike("%Efectivo%") 
-        ).first()
-        return medio.id_medio_ingreso if medio else 0
+        """Helper para buscar el ID del medio de pago Efectivo (desde el caché de catálogos)."""
+        return catalog_cache.id_medio_efectivo(self.db)
 
     # -------------------------------------------------------------------------
     # 1. CÁLCULO DE SALDO (VALIDADOR)
     # -------------------------------------------------------------------------
-    def calcular_balance(self) -> caja_schema.BalanceCaja:
+    def _sumar_desde_origen(self):
         """
-        Calcula: (Entradas Efectivo) - (Gastos) - (Depósitos Confirmados)
+        Recalcula los 3 totales escaneando las tablas de origen.
+        Solo se usa para inicializar o reconciliar el ledger (caja_saldo).
         """
         id_efectivo = self._get_id_efectivo()
 
@@ -45,8 +51,30 @@ class CajaService:
             models.Deposito.estado == 'confirmado'
         ).scalar() or 0.0
 
+        return float(total_ingresos), float(total_gastos), float(total_depositos)
+
+    def _get_ledger(self, for_update: bool = False) -> Optional[models.CajaSaldo]:
+        query = self.db.query(models.CajaSaldo).filter(models.CajaSaldo.id_caja == LEDGER_ID)
+        if for_update:
+            query = query.with_for_update()
+        return query.first()
+
+    def calcular_balance(self, for_update: bool = False) -> caja_schema.BalanceCaja:
+        """
+        Calcula: (Entradas Efectivo) - (Gastos) - (Depósitos Confirmados)
+        Lectura O(1) desde el ledger; si aún no existe, se suma desde el origen.
+        """
+        ledger = self._get_ledger(for_update=for_update)
+
+        if ledger:
+            total_ingresos = float(ledger.total_ingresos_efectivo)
+            total_gastos = float(ledger.total_gastos)
+            total_depositos = float(ledger.total_depositos)
+        else:
+            total_ingresos, total_gastos, total_depositos = self._sumar_desde_origen()
+
         # D. SALDO FINAL
-        saldo = float(total_ingresos) - float(total_gastos) - float(total_depositos)
+        saldo = total_ingresos - total_gastos - total_depositos
 
         return caja_schema.BalanceCaja(
             total_ingresos_efectivo=total_ingresos,
@@ -59,8 +87,9 @@ class CajaService:
     def validar_fondos_suficientes(self, monto_a_gastar: float):
         """
         Método crítico para bloquear gastos sin fondos.
+        Bloquea la fila del ledger: dos gastos simultáneos no pueden usar el mismo saldo.
         """
-        balance = self.calcular_balance()
+        balance = self.calcular_balance(for_update=True)
         if balance.saldo_actual_en_caja < (monto_a_gastar - 0.01): # Pequeña tolerancia decimal
             raise HTTPException(
                 status_code=400,
@@ -68,78 +97,266 @@ class CajaService:
             )
         return True
 
+    # -------------------------------------------------------------------------
+    # 1.1 LEDGER INCREMENTAL (Se llama dentro de la transacción del movimiento)
+    # -------------------------------------------------------------------------
+    def es_efectivo(self, id_medio_ingreso: int) -> bool:
+        return id_medio_ingreso == self._get_id_efectivo()
+
+    def _sumar_al_ledger(self, ingresos: float, gastos: float, depositos: float) -> int:
+        resultado = self.db.execute(
+            update(models.CajaSaldo)
+            .where(models.CajaSaldo.id_caja == LEDGER_ID)
+            .values(
+                total_ingresos_efectivo=models.CajaSaldo.total_ingresos_efectivo + ingresos,
+                total_gastos=models.CajaSaldo.total_gastos + gastos,
+                total_depositos=models.CajaSaldo.total_depositos + depositos
+            )
+            .execution_options(synchronize_session=False)
+        )
+        return resultado.rowcount
+
+    def registrar_movimiento(self, ingresos: float = 0.0, gastos: float = 0.0, depositos: float = 0.0):
+        """
+        Aplica un delta al ledger con un UPDATE atómico (sin leer-modificar-escribir).
+        NO hace commit: queda dentro de la transacción del llamador.
+        """
+        if self._sumar_al_ledger(ingresos, gastos, depositos):
+            return
+
+        # Primera vez: el ledger nace desde el origen (que ya incluye este movimiento)
+        self.db.flush()
+        total_ingresos, total_gastos, total_depositos = self._sumar_desde_origen()
+        dialecto = self.db.get_bind().dialect.name
+        insert = sqlite.insert if dialecto == "sqlite" else postgresql.insert
+        creado = self.db.execute(
+            insert(models.CajaSaldo).values(
+                id_caja=LEDGER_ID,
+                total_ingresos_efectivo=total_ingresos,
+                total_gastos=total_gastos,
+                total_depositos=total_depositos
+            ).on_conflict_do_nothing(index_elements=[models.CajaSaldo.id_caja])
+        ).rowcount
+        if not creado:
+            # Otra transacción creó el ledger a la vez (el INSERT esperó su commit): su total
+            # no incluye este movimiento, así que se suma como cualquier otro delta
+            self._sumar_al_ledger(ingresos, gastos, depositos)
+
+    def reconciliar_ledger(self, corregir: bool = True) -> caja_schema.ReconciliacionCaja:
+        """
+        Recalcula la caja desde cero y reporta la diferencia contra el ledger.
+        Si corregir=True, sobrescribe el ledger con los valores recalculados.
+        """
+        ledger = self._get_ledger(for_update=True)
+        ledger_existia = ledger is not None
+        total_ingresos, total_gastos, total_depositos = self._sumar_desde_origen()
+
+        ledger_ingresos = float(ledger.total_ingresos_efectivo) if ledger else 0.0
+        ledger_gastos = float(ledger.total_gastos) if ledger else 0.0
+        ledger_depositos = float(ledger.total_depositos) if ledger else 0.0
+
+        diferencias = {
+            "ingresos": round(ledger_ingresos - total_ingresos, 2),
+            "gastos": round(ledger_gastos - total_gastos, 2),
+            "depositos": round(ledger_depositos - total_depositos, 2),
+        }
+        hay_desfase = not ledger_existia or any(abs(v) > 0.001 for v in diferencias.values())
+
+        if corregir and hay_desfase:
+            if not ledger:
+                ledger = models.CajaSaldo(id_caja=LEDGER_ID)
+                self.db.add(ledger)
+            ledger.total_ingresos_efectivo = total_ingresos
+            ledger.total_gastos = total_gastos
+            ledger.total_depositos = total_depositos
+            ledger.fecha_actualizacion = datetime.now()
+
+        self.db.commit()
+
+        return caja_schema.ReconciliacionCaja(
+            ledger_existia=ledger_existia,
+            saldo_ledger=ledger_ingresos - ledger_gastos - ledger_depositos,
+            saldo_recalculado=total_ingresos - total_gastos - total_depositos,
+            diferencias=diferencias,
+            desfase_detectado=hay_desfase,
+            corregido=corregir and hay_desfase,
+            fecha_corte=datetime.now()
+        )
+
     # -------------------------------------------------------------------------
     # 2. GENERACIÓN DE REPORTE (LIBRO DIARIO)
     # -------------------------------------------------------------------------
-    def generar_libro_caja(self) -> caja_schema.ReporteLibroCaja:
+    def _movimientos_subquery(self, inicio: Optional[datetime] = None, fin: Optional[datetime] = None):
         """
-        Mezcla las 3 tablas en una sola lista cronológica.
+        Une las 3 fuentes de caja en SQL (UNION ALL) con columnas homogéneas.
+        Los filtros de fecha se aplican dentro de cada rama.
         """
-        movimientos = []
         id_efectivo = self._get_id_efectivo()
+        cero = cast(0, Numeric(10, 2))
 
-        # A. OBTENER INGRESOS
-        ingresos_db = self.db.query(models.TransaccionIngreso).filter(
+        def _rango(query, columna):
+            if inicio is not None:
+                query = query.where(columna >= inicio)
+            if fin is not None:
+                query = query.where(columna < fin)
+            return query
+
+        # A. INGRESOS (Solo efectivo y confirmados)
+        ingresos = _rango(select(
+            models.TransaccionIngreso.fecha_creacion.label("fecha"),
+            literal("INGRESO").label("tipo"),
+            models.TransaccionIngreso.id_transaccion.label("referencia_id"),
+            (literal("Recibo #") + cast(models.TransaccionIngreso.id_transaccion, String) + literal(" - ")
+                + func.coalesce(models.TransaccionIngreso.descripcion, "Sin descripción")).label("descripcion"),
+            models.TransaccionIngreso.monto_total.label("monto_entrada"),
+            cero.label("monto_salida"),
+            models.TransaccionIngreso.id_usuario_creador.label("id_usuario")
+        ).where(
             models.TransaccionIngreso.id_medio_ingreso == id_efectivo,
             models.TransaccionIngreso.estado == 'APLICADO'
-        ).all()
-
-        for i in ingresos_db:
-            # Tratamos de obtener nombre del usuario creador
-            responsable = i.usuario_creador.nombres if i.usuario_creador else f"User {i.id_usuario_creador}"
-            movimientos.append(caja_schema.MovimientoCaja(
-                fecha=i.fecha_creacion, # Usamos fecha exacta con hora
-                tipo="INGRESO",
-                descripcion=f"Recibo #{i.id_transaccion} - {i.descripcion or 'Sin descripción'}",
-                monto_entrada=float(i.monto_total),
-                monto_salida=0.0,
-                referencia_id=i.id_transaccion,
-                usuario_responsable=responsable
-            ))
-
-        # B. OBTENER GASTOS
-        egresos_db = self.db.query(models.Egreso).filter(
+        ), models.TransaccionIngreso.fecha_creacion)
+
+        # B. GASTOS (Solo activos)
+        egresos = _rango(select(
+            models.Egreso.fecha_creacion.label("fecha"),
+            literal("GASTO").label("tipo"),
+            models.Egreso.id_egreso.label("referencia_id"),
+            (literal("Gasto #") + cast(models.Egreso.id_egreso, String) + literal(" (")
+                + func.coalesce(models.Categoria.nombre_cuenta, "General") + literal(") - ")
+                + models.Egreso.beneficiario).label("descripcion"),
+            cero.label("monto_entrada"),
+            models.Egreso.monto.label("monto_salida"),
+            models.Egreso.id_usuario_creador.label("id_usuario")
+        ).select_from(models.Egreso).outerjoin(
+            models.Categoria, models.Categoria.id_catalogo == models.Egreso.id_catalogo
+        ).where(
             models.Egreso.estado != 'cancelado'
-        ).all()
-
-        for e in egresos_db:
-            responsable = e.administrador.nombres if e.administrador else f"Admin {e.id_administrador}"
-            cat_nombre = e.catalogo.nombre_cuenta if e.catalogo else "General"
-            movimientos.append(caja_schema.MovimientoCaja(
-                fecha=e.fecha_creacion,
-                tipo="GASTO",
-                descripcion=f"Gasto #{e.id_egreso} ({cat_nombre}) - {e.beneficiario}",
-                monto_entrada=0.0,
-                monto_salida=float(e.monto),
-                referencia_id=e.id_egreso,
-                usuario_responsable=responsable
-            ))
-
-        # C. OBTENER DEPÓSITOS
-        depositos_db = self.db.query(models.Deposito).filter(
+        ), models.Egreso.fecha_creacion)
+
+        # C. DEPÓSITOS (Dinero enviado al banco)
+        depositos = _rango(select(
+            models.Deposito.fecha_creacion.label("fecha"),
+            literal("DEPOSITO").label("tipo"),
+            models.Deposito.id_deposito.label("referencia_id"),
+            (literal("Traslado a Banco #") + func.coalesce(models.Deposito.num_referencia, "")
+                + literal(" (") + func.coalesce(models.Deposito.banco, "") + literal(")")).label("descripcion"),
+            cero.label("monto_entrada"),
+            models.Deposito.monto.label("monto_salida"),
+            models.Deposito.id_usuario_creador.label("id_usuario")
+        ).where(
             models.Deposito.estado == 'confirmado'
-        ).all()
-
-        for d in depositos_db:
-            responsable = d.administrador.nombres if d.administrador else f"Admin {d.id_administrador}"
-            movimientos.append(caja_schema.MovimientoCaja(
-                fecha=d.fecha_creacion,
-                tipo="DEPOSITO",
-                descripcion=f"Traslado a Banco #{d.num_referencia} ({d.banco})",
-                monto_entrada=0.0,
-                monto_salida=float(d.monto),
-                referencia_id=d.id_deposito,
-                usuario_responsable=responsable
-            ))
-
-        # D. ORDENAR CRONOLÓGICAMENTE
-        # La magia de Python: ordenamos la lista mixta por fecha
-        movimientos.sort(key=lambda x: x.fecha, reverse=True) # Del más reciente al más antiguo
-
-        # E. OBTENER SALDO ACTUAL
-        balance_actual = self.calcular_balance()
+        ), models.Deposito.fecha_creacion)
+
+        return union_all(ingresos, egresos, depositos).subquery("movimientos")
+
+    def _movimientos_query(self, inicio: Optional[datetime], fin: Optional[datetime], descendente: bool = True):
+        """Movimientos + nombre del responsable (JOIN usuario -> persona), ya ordenados."""
+        mov = self._movimientos_subquery(inicio, fin)
+        responsable = func.coalesce(
+            models.Persona.nombres + literal(" ") + models.Persona.apellidos,
+            literal("User ") + cast(mov.c.id_usuario, String)
+        )
+        orden = (mov.c.fecha, mov.c.tipo, mov.c.referencia_id)
+
+        query = select(
+            mov.c.fecha, mov.c.tipo, mov.c.referencia_id, mov.c.descripcion,
+            mov.c.monto_entrada, mov.c.monto_salida,
+            responsable.label("usuario_responsable")
+        ).select_from(mov).outerjoin(
+            models.Usuario, models.Usuario.id_usuario == mov.c.id_usuario
+        ).outerjoin(
+            models.Persona, models.Persona.id_persona == models.Usuario.id_persona
+        ).order_by(*[c.desc() if descendente else c.asc() for c in orden])
+        return query, mov
+
+    def _saldos_periodo(self, inicio: Optional[datetime], fin: Optional[datetime], saldo_actual: float):
+        """
+        Saldo de apertura/cierre a partir del saldo corriente (ledger) menos el neto
+        de lo ocurrido después de cada corte. Solo escanea desde el corte más antiguo.
+        """
+        if inicio is None and fin is None:
+            return 0.0, saldo_actual
+
+        mov = self._movimientos_subquery(inicio if inicio is not None else fin)
+        neto = mov.c.monto_entrada - mov.c.monto_salida
+        neto_desde_inicio, neto_desde_fin = self.db.execute(select(
+            func.coalesce(func.sum(case((mov.c.fecha >= inicio, neto), else_=0)), 0) if inicio is not None else literal(0),
+            func.coalesce(func.sum(case((mov.c.fecha >= fin, neto), else_=0)), 0) if fin is not None else literal(0)
+        )).one()
+
+        saldo_apertura = saldo_actual - float(neto_desde_inicio) if inicio is not None else 0.0
+        saldo_cierre = saldo_actual - float(neto_desde_fin)
+        return saldo_apertura, saldo_cierre
+
+    @staticmethod
+    def _rango_fechas(fecha_desde: Optional[date], fecha_hasta: Optional[date]):
+        inicio = datetime.combine(fecha_desde, time.min) if fecha_desde else None
+        fin = datetime.combine(fecha_hasta + timedelta(days=1), time.min) if fecha_hasta else None
+        return inicio, fin
+
+    def generar_libro_caja(
+        self,
+        fecha_desde: Optional[date] = None,
+        fecha_hasta: Optional[date] = None,
+        cursor: Optional[str] = None,
+        limit: int = 500
+    ) -> caja_schema.ReporteLibroCaja:
+        """
+        Libro diario paginado (del más reciente al más antiguo).
+        La mezcla y el orden se hacen en SQL; la paginación es por cursor (keyset).
+        """
+        inicio, fin = self._rango_fechas(fecha_desde, fecha_hasta)
+        query, mov = self._movimientos_query(inicio, fin)
+
+        orden = (mov.c.fecha, mov.c.tipo, mov.c.referencia_id)
+        if cursor:
+            query = query.where(filtro_cursor(orden, cursor))
+
+        pagina = cortar_pagina(self.db.execute(query.limit(limit + 1)).all(), orden, limit)
+
+        movimientos = [
+            caja_schema.MovimientoCaja(
+                fecha=f.fecha,
+                tipo=f.tipo,
+                descripcion=f.descripcion,
+                monto_entrada=float(f.monto_entrada),
+                monto_salida=float(f.monto_salida),
+                referencia_id=f.referencia_id,
+                usuario_responsable=f.usuario_responsable
+            )
+            for f in pagina.items
+        ]
+
+        # SALDOS: Corriente (ledger O(1)) y cortes del periodo
+        saldo_actual = self.calcular_balance().saldo_actual_en_caja
+        saldo_apertura, saldo_cierre = self._saldos_periodo(inicio, fin, saldo_actual)
 
         return caja_schema.ReporteLibroCaja(
-            saldo_actual=balance_actual.saldo_actual_en_caja,
+            saldo_actual=saldo_actual,
+            saldo_apertura=saldo_apertura,
+            saldo_cierre=saldo_cierre,
+            fecha_desde=fecha_desde,
+            fecha_hasta=fecha_hasta,
+            next_cursor=pagina.next_cursor,
             movimientos=movimientos
-        )
\ No newline at end of file
+        )
+
+    def iterar_libro_caja(self, fecha_desde: Optional[date] = None, fecha_hasta: Optional[date] = None) -> Iterator[dict]:
+        """
+        Recorre el libro en orden cronológico con cursor del lado del servidor
+        (memoria constante). Pensado para exportaciones NDJSON/CSV de un año completo.
+        """
+        inicio, fin = self._rango_fechas(fecha_desde, fecha_hasta)
+        query, _ = self._movimientos_query(inicio, fin, descendente=False)
+
+        resultado = self.db.execute(query.execution_options(yield_per=EXPORT_BATCH_SIZE))
+        for f in resultado:
+            yield {
+                "fecha": f.fecha.isoformat() if f.fecha else None,
+                "tipo": f.tipo,
+                "referencia_id": f.referencia_id,
+                "descripcion": f.descripcion,
+                "monto_entrada": float(f.monto_entrada),
+                "monto_salida": float(f.monto_salida),
+                "usuario_responsable": f.usuario_responsable
+            }
@@ -1,10 +1,12 @@
 # Archivo: app/services/categoria_service.py
 from sqlalchemy.orm import Session
 from fastapi import HTTPException, status
-from typing import List, Optional
+from typing import Optional
 
 from app.db import models
 from app.schemas import categoria_schema as schemas
+from app.core.catalog_cache import catalog_cache
+from app.core.busqueda import normalizar_busqueda
 
 class CategoriaService:
     def __init__(self, db: Session):
@@ -13,17 +15,19 @@ class CategoriaService:
     def get_categoria_by_id(self, categoria_id: int) -> Optional[models.Categoria]:
         return self.db.query(models.Categoria).filter(models.Categoria.id_catalogo == categoria_id).first()
 
-    def get_all_categorias(self, filters: schemas.CategoriaFilter, skip: int = 0, limit: int = 100) -> List[models.Categoria]:
-        query = self.db.query(models.Categoria)
+    def get_all_categorias(self, filters: schemas.CategoriaFilter, skip: int = 0, limit: int = 100) -> list:
+        """Lee del caché de catálogos (filtros aplicados en memoria; son pocas filas)."""
+        categorias = catalog_cache.listar(self.db, "categorias")
         
         if filters.nombre_cuenta:
-            query = query.filter(models.Categoria.nombre_cuenta.ilike(f"%{filters.nombre_cuenta}%"))
+            texto = normalizar_busqueda(filters.nombre_cuenta)
+            categorias = [c for c in categorias if texto in normalizar_busqueda(c.nombre_cuenta)]
         if filters.tipo:
-            query = query.filter(models.Categoria.tipo == filters.tipo)
+            categorias = [c for c in categorias if c.tipo == filters.tipo]
         if filters.activo is not None:
-            query = query.filter(models.Categoria.activo == filters.activo)
+            categorias = [c for c in categorias if c.activo == filters.activo]
             
-        return query.offset(skip).limit(limit).all()
+        return categorias[skip:skip + limit]
 
     def create_categoria(self, categoria_in: schemas.CategoriaCreate) -> models.Categoria:
         # Validar duplicados
@@ -38,6 +42,7 @@ class CategoriaService:
         )
         self.db.add(db_categoria)
         self.db.commit()
+        catalog_cache.invalidar()
         self.db.refresh(db_categoria)
         return db_categoria
 
@@ -52,11 +57,13 @@ class CategoriaService:
             setattr(db_categoria, key, value)
             
         self.db.commit()
+        catalog_cache.invalidar()
         self.db.refresh(db_categoria)
         return db_categoria
 
     def deactivate_categoria(self, db_categoria: models.Categoria) -> models.Categoria:
         db_categoria.activo = False
         self.db.commit()
+        catalog_cache.invalidar()
         self.db.refresh(db_categoria)
         return db_categoria
\ No newline at end of file
@@ -1,10 +1,11 @@
 # Archivo: app/services/concepto_deuda_service.py
 from sqlalchemy.orm import Session
 from fastapi import HTTPException, status
-from typing import List, Optional
+from typing import Optional
 
 from app.db import models
 from app.schemas import concepto_deuda_schema as schemas
+from app.core.catalog_cache import catalog_cache
 
 class ConceptoDeudaService:
     def __init__(self, db: Session):
@@ -13,8 +14,9 @@ class ConceptoDeudaService:
     def get_concepto_by_id(self, concepto_id: int) -> Optional[models.ConceptoDeuda]:
         return self.db.query(models.ConceptoDeuda).filter(models.ConceptoDeuda.id_concepto == concepto_id).first()
 
-    def get_all_conceptos(self, skip: int = 0, limit: int = 100) -> List[models.ConceptoDeuda]:
-        return self.db.query(models.ConceptoDeuda).offset(skip).limit(limit).all()
+    def get_all_conceptos(self, skip: int = 0, limit: int = 100) -> list:
+        """Lee del caché de catálogos."""
+        return catalog_cache.listar(self.db, "conceptos")[skip:skip + limit]
 
     def create_concepto(self, concepto_in: schemas.ConceptoDeudaCreate) -> models.ConceptoDeuda:
         existe = self.db.query(models.ConceptoDeuda).filter(
@@ -33,6 +35,7 @@ class ConceptoDeudaService:
         
         self.db.add(nuevo_concepto)
         self.db.commit()
+        catalog_cache.invalidar()
         self.db.refresh(nuevo_concepto)
         return nuevo_concepto
 
@@ -54,6 +57,7 @@ class ConceptoDeudaService:
             setattr(db_concepto, field, value)
 
         self.db.commit()
+        catalog_cache.invalidar()
         self.db.refresh(db_concepto)
         return db_concepto
 
@@ -76,5 +80,6 @@ class ConceptoDeudaService:
         db_concepto.activo = False
         
         self.db.commit()
+        catalog_cache.invalidar()
         self.db.refresh(db_concepto)
         return db_concepto
\ No newline at end of file
@@ -1,10 +1,12 @@
 from sqlalchemy.orm import Session
-from sqlalchemy import desc
 from fastapi import HTTPException
-from typing import List
+from typing import List, Optional
 
 from app.db import models
 from app.schemas import deposito_schema
+from app.services.caja_service import CajaService
+from app.core.catalog_cache import catalog_cache
+from app.core.pagination import Pagina, paginar
 
 class DepositoService:
     def __init__(self, db: Session):
@@ -17,17 +19,15 @@ class DepositoService:
         """
         Busca transacciones en EFECTIVO que no tienen depósito.
         """
-        # 1. Identificar el medio de pago "Efectivo"
-        medio_efectivo = self.db.query(models.MedioIngreso).filter(
-            models.MedioIngreso.nombre.ilike("Efectivo") 
-        ).first()
+        # 1. Identificar el medio de pago "Efectivo" (caché de catálogos, sin consulta)
+        id_efectivo = catalog_cache.id_medio_efectivo(self.db)
         
-        if not medio_efectivo:
+        if not id_efectivo:
             return [] 
 
         # 2. Buscar transacciones "sueltas"
         pendientes_db = self.db.query(models.TransaccionIngreso).filter(
-            models.TransaccionIngreso.id_medio_ingreso == medio_efectivo.id_medio_ingreso,
+            models.TransaccionIngreso.id_medio_ingreso == id_efectivo,
             models.TransaccionIngreso.id_deposito == None, 
             models.TransaccionIngreso.estado != 'ANULADO'
         ).order_by(models.TransaccionIngreso.fecha.asc()).all()
@@ -105,6 +105,9 @@ class DepositoService:
                 trx.id_deposito = nuevo_deposito.id_deposito
                 self.db.add(trx)
 
+            # E. LEDGER DE CAJA (El dinero sale del cajón hacia el banco)
+            CajaService(self.db).registrar_movimiento(depositos=float(datos.monto))
+
             self.db.commit()
             self.db.refresh(nuevo_deposito)
             return nuevo_deposito
@@ -119,5 +122,6 @@ class DepositoService:
     # -------------------------------------------------------------------------
     # 3. HISTORIAL
     # -------------------------------------------------------------------------
-    def get_depositos(self, skip: int = 0, limit: int = 100):
-        return self.db.query(models.Deposito).order_by(desc(models.Deposito.fecha)).offset(skip).limit(limit).all()
\ No newline at end of file
+    def get_depositos(self, skip: int = 0, limit: int = 100, cursor: Optional[str] = None) -> Pagina:
+        orden = (models.Deposito.fecha, models.Deposito.id_deposito)
+        return paginar(self.db.query(models.Deposito), orden, cursor=cursor, limit=limit, skip=skip)
\ No newline at end of file
@@ -1,12 +1,13 @@
 # Archivo: app/services/egreso_service.py
 from sqlalchemy.orm import Session
-from sqlalchemy import desc
 from fastapi import HTTPException
-from typing import List
+from typing import List, Optional
 
 from app.db import models
 from app.schemas import egreso_schema
 from app.services.caja_service import CajaService
+from app.core.catalog_cache import catalog_cache
+from app.core.pagination import Pagina, paginar
 
 class EgresoService:
     def __init__(self, db: Session):
@@ -18,9 +19,7 @@ class EgresoService:
     def create_egreso(self, egreso_in: egreso_schema.EgresoCreate, id_usuario: int) -> egreso_schema.EgresoResponse: 
         try:
             # A. VALIDACIÓN CONTABLE
-            catalogo = self.db.query(models.Categoria).filter(
-                models.Categoria.id_catalogo == egreso_in.id_catalogo
-            ).first()
+            catalogo = catalog_cache.obtener(self.db, "categorias", egreso_in.id_catalogo)
 
             if not catalogo:
                 raise HTTPException(status_code=404, detail="Cuenta contable no encontrada")
@@ -52,6 +51,10 @@ class EgresoService:
             )
 
             self.db.add(nuevo_egreso)
+
+            # LEDGER DE CAJA (Misma transacción que el gasto)
+            servicio_caja.registrar_movimiento(gastos=float(egreso_in.monto))
+
             self.db.commit()
             self.db.refresh(nuevo_egreso)
 
@@ -81,11 +84,12 @@ class EgresoService:
     # -------------------------------------------------------------------------
     # 2. LISTAR GASTOS
     # -------------------------------------------------------------------------
-    def get_egresos(self, skip: int = 0, limit: int = 100):
-        egresos = self.db.query(models.Egreso).order_by(desc(models.Egreso.fecha)).offset(skip).limit(limit).all()
+    def get_egresos(self, skip: int = 0, limit: int = 100, cursor: Optional[str] = None) -> Pagina:
+        orden = (models.Egreso.fecha, models.Egreso.id_egreso)
+        pagina = paginar(self.db.query(models.Egreso), orden, cursor=cursor, limit=limit, skip=skip)
         
         resultados = []
-        for e in egresos:
+        for e in pagina.items:
             resp = egreso_schema.EgresoResponse.model_validate(e)
             if e.catalogo:
                 resp.nombre_cuenta = e.catalogo.nombre_cuenta
@@ -93,13 +97,17 @@ class EgresoService:
                 resp.tipo_egreso = e.tipo_egreso.nombre
             resultados.append(resp)
             
-        return resultados
+        return Pagina(items=resultados, next_cursor=pagina.next_cursor)
 
     # -------------------------------------------------------------------------
     # 3. ANULAR GASTO
     # -------------------------------------------------------------------------
     def anular_egreso(self, id_egreso: int):
-        egreso = self.db.query(models.Egreso).filter(models.Egreso.id_egreso == id_egreso).first()
+        # Bloqueo de la fila: dos anulaciones simultáneas no pueden descontar dos veces del ledger
+        egreso = self.db.query(models.Egreso)\
+            .filter(models.Egreso.id_egreso == id_egreso)\
+            .with_for_update()\
+            .first()
         if not egreso:
             raise HTTPException(status_code=404, detail="Gasto no encontrado")
             
@@ -107,6 +115,7 @@ class EgresoService:
             raise HTTPException(status_code=400, detail="El gasto ya está anulado")
             
         egreso.estado = 'cancelado'
+        CajaService(self.db).registrar_movimiento(gastos=-float(egreso.monto))
         self.db.commit()
         self.db.refresh(egreso)
         return egreso
\ No newline at end of file
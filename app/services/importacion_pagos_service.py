@@ -0,0 +1,435 @@
+# Archivo: app/services/importacion_pagos_service.py
+# Importación masiva de pagos desde extractos bancarios (transferencias / QR).
+# - Lectura en streaming (CSV o JSON/NDJSON): nunca se carga el archivo completo.
+# - Procesa por LOTES: cada lote resuelve contratos, duplicados y deudas con un puñado
+#   de consultas (no una por fila), aplica los pagos en memoria y hace UN commit.
+# - Un lote que falla se revierte entero y sus filas salen como 'error'; los anteriores quedan.
+import csv
+import json
+from collections import Counter
+from datetime import date, datetime
+from decimal import Decimal, InvalidOperation
+from itertools import islice
+from typing import Dict, Iterable, Iterator, List, Optional, TextIO, Tuple, Union
+
+from fastapi import HTTPException
+from pydantic import ValidationError
+from sqlalchemy import func, tuple_
+from sqlalchemy.orm import Session
+
+from app.db import models
+from app.db.models import ItemFacturable, RelacionCliente, TransaccionIngreso
+from app.core.catalog_cache import catalog_cache
+from app.core.config import settings
+from app.services.caja_service import CajaService
+from app.services.resumen_relacion_service import ResumenRelacionService
+from app.services.transaccion_ingreso_service import TransaccionIngresoService
+from app.schemas.importacion_pagos_schema import (
+    FilaExtracto,
+    ResultadoFilaImportacion,
+    ResumenImportacion
+)
+
+FORMATOS_IMPORTACION = ("csv", "json")
+
+
+# ----------------------------------------------------------------------
+# LECTURA DEL ARCHIVO (STREAMING)
+# ----------------------------------------------------------------------
+
+def _objetos_json(texto: TextIO, tam_bloque: int = 1 << 16) -> Iterator[dict]:
+    """
+    Objetos de un arreglo JSON ([{...}, {...}]) o de JSON Lines, leyendo por bloques.
+    Solo mantiene en memoria el bloque actual, no el documento entero.
+    """
+    decoder = json.JSONDecoder()
+    buffer, fin = "", False
+    while True:
+        buffer = buffer.lstrip(" \t\r\n,[]")
+        if buffer:
+            try:
+                objeto, fin_objeto = decoder.raw_decode(buffer)
+            except json.JSONDecodeError:
+                pass  # Objeto incompleto: falta leer el siguiente bloque
+            else:
+                yield objeto
+                buffer = buffer[fin_objeto:]
+                continue
+        if fin:
+            if buffer:
+                raise ValueError("JSON mal formado al final del archivo.")
+            return
+        bloque = texto.read(tam_bloque)
+        fin = not bloque
+        buffer += bloque
+
+def _a_monto(valor) -> float:
+    if isinstance(valor, (int, float, Decimal)):
+        return float(valor)
+    texto = str(valor).strip().replace(" ", "")
+    if "," in texto and "." in texto:
+        texto = texto.replace(".", "").replace(",", ".") if texto.rfind(",") > texto.rfind(".") else texto.replace(",", "")
+    elif "," in texto:
+        texto = texto.replace(",", ".")
+    try:
+        return float(Decimal(texto))
+    except InvalidOperation:
+        raise ValueError(f"Monto inválido: {valor!r}")
+
+def _a_fecha(valor) -> date:
+    if isinstance(valor, date):
+        return valor
+    texto = str(valor).strip()
+    for formato in ("%Y-%m-%d", "%d/%m/%Y", "%d-%m-%Y"):
+        try:
+            return datetime.strptime(texto, formato).date()
+        except ValueError:
+            continue
+    raise ValueError(f"Fecha inválida: {valor!r}")
+
+def _texto_o_none(valor) -> Optional[str]:
+    if valor is None:
+        return None
+    texto = str(valor).strip()
+    return texto or None
+
+def normalizar_fila(numero: int, crudo: dict) -> FilaExtracto:
+    """Columnas: fecha, monto, referencia, unidad, id_relacion, descripcion (sin importar mayúsculas)."""
+    datos = {str(k).strip().lower(): v for k, v in crudo.items() if k is not None}
+    id_relacion = _texto_o_none(datos.get("id_relacion"))
+    return FilaExtracto(
+        fila=numero,
+        fecha=_a_fecha(datos.get("fecha")),
+        monto=_a_monto(datos.get("monto")),
+        referencia=_texto_o_none(datos.get("referencia")),
+        unidad=_texto_o_none(datos.get("unidad")),
+        id_relacion=int(id_relacion) if id_relacion else None,
+        descripcion=_texto_o_none(datos.get("descripcion"))
+    )
+
+def leer_extracto(texto: TextIO, formato: str) -> Iterator[Union[FilaExtracto, ResultadoFilaImportacion]]:
+    """Filas normalizadas; las que no se pueden interpretar salen ya como resultado 'invalido'."""
+    crudas = csv.DictReader(texto) if formato == "csv" else _objetos_json(texto)
+    numero = 0
+    try:
+        for numero, crudo in enumerate(crudas, start=1):
+            try:
+                if not isinstance(crudo, dict):
+                    raise ValueError("Se esperaba un objeto por fila.")
+                fila = normalizar_fila(numero, crudo)
+                if fila.monto <= 0:
+                    raise ValueError("El monto debe ser mayor a 0.")
+                yield fila
+            except (ValueError, TypeError, ValidationError) as e:
+                yield ResultadoFilaImportacion(fila=numero, estado="invalido", detalle=str(e))
+    except (ValueError, csv.Error) as e:
+        # Archivo roto a mitad de camino: lo ya leído se procesa, el resto no
+        yield ResultadoFilaImportacion(fila=numero + 1, estado="invalido", detalle=f"Lectura abortada: {e}")
+
+
+# ----------------------------------------------------------------------
+# DUPLICADOS
+# ----------------------------------------------------------------------
+
+def _clave_movimiento(fila: FilaExtracto, id_relacion: int) -> tuple:
+    """Misma forma que (fecha, monto_total, num_documento, id_relacion) de TransaccionIngreso."""
+    return (fila.fecha, Decimal(str(fila.monto)).quantize(Decimal("0.01")), fila.referencia, id_relacion)
+
+def _es_referencia_bancaria(fila: FilaExtracto) -> bool:
+    """La referencia identifica la operación del banco salvo que haya sido el código de unidad."""
+    if not fila.referencia or not (fila.id_relacion or fila.unidad):
+        return False  # Sin unidad ni contrato, la referencia fue la que encontró el contrato
+    return fila.referencia.upper() != (fila.unidad or "").upper()
+
+
+class _MovimientosVistos:
+    """Por importación: cuántas veces apareció cada movimiento y cuántas se aplicaron (confirmadas)."""
+
+    def __init__(self):
+        self.ocurrencias = Counter()
+        self.aplicadas = Counter()
+
+    def confirmar(self, asignadas: List[Tuple[FilaExtracto, int]]):
+        """Llamar después del commit del lote con las filas que se aplicaron."""
+        self.aplicadas.update(_clave_movimiento(fila, id_relacion) for fila, id_relacion in asignadas)
+
+
+# ----------------------------------------------------------------------
+# SERVICIO
+# ----------------------------------------------------------------------
+
+class ImportacionPagosService:
+    def __init__(self, db: Session):
+        self.db = db
+
+    def importar(
+        self,
+        texto: TextIO,
+        formato: str,
+        id_medio_ingreso: int,
+        id_usuario: int,
+        tamano_lote: Optional[int] = None
+    ) -> Iterator[ResultadoFilaImportacion]:
+        """
+        Valida los parámetros (antes de leer nada) y devuelve un iterador con una línea de
+        reporte por fila del extracto, en el orden del archivo.
+        Cada lote se confirma (commit) antes de emitir sus resultados.
+        """
+        if formato not in FORMATOS_IMPORTACION:
+            raise HTTPException(status_code=400, detail=f"Formato no soportado: {formato}.")
+        medio = catalog_cache.obtener(self.db, "medios_ingreso", id_medio_ingreso)
+        if not medio:
+            raise HTTPException(status_code=404, detail="El medio de pago seleccionado no existe.")
+
+        return self._importar_por_lotes(
+            leer_extracto(texto, formato), medio, id_usuario, tamano_lote or settings.IMPORTACION_PAGOS_LOTE
+        )
+
+    def _importar_por_lotes(self, filas, medio, id_usuario: int, tamano_lote: int) -> Iterator[ResultadoFilaImportacion]:
+        vistas = _MovimientosVistos()  # Movimientos de ESTE archivo (ocurrencias y ya aplicados)
+        while True:
+            lote = list(islice(filas, tamano_lote))
+            if not lote:
+                return
+            yield from self._procesar_lote(lote, medio, id_usuario, vistas)
+            # Suelta las filas del lote del identity map: memoria constante entre lotes
+            self.db.expunge_all()
+
+    @staticmethod
+    def resumir(resultados: Iterable[ResultadoFilaImportacion], resumen: ResumenImportacion) -> Iterator[ResultadoFilaImportacion]:
+        """Deja pasar los resultados acumulando los totales en `resumen`."""
+        for resultado in resultados:
+            resumen.filas += 1
+            setattr(resumen, resultado.estado, getattr(resumen, resultado.estado) + 1)
+            if resultado.estado == "aplicado":
+                resumen.monto_aplicado = round(resumen.monto_aplicado + (resultado.monto or 0.0), 2)
+            yield resultado
+
+    # ----------------------------------------------------------------------
+    # LOTE
+    # ----------------------------------------------------------------------
+    def _procesar_lote(self, lote, medio, id_usuario: int, vistas: "_MovimientosVistos") -> List[ResultadoFilaImportacion]:
+        resultados: Dict[int, ResultadoFilaImportacion] = {}
+        filas: List[FilaExtracto] = []
+        for elemento in lote:
+            if isinstance(elemento, ResultadoFilaImportacion):
+                resultados[elemento.fila] = elemento
+            else:
+                filas.append(elemento)
+
+        try:
+            # 1. CONCILIACIÓN: fila -> contrato
+            asignadas = self._conciliar(filas, resultados)
+
+            # 2. DUPLICADOS (mismo movimiento bancario ya registrado con este medio)
+            asignadas = self._descartar_duplicados(asignadas, medio.id_medio_ingreso, vistas, resultados)
+
+            # 3. APLICACIÓN (bloqueos + deudas en una consulta, un flush, un commit)
+            if asignadas:
+                resultados.update(self._aplicar(asignadas, medio, id_usuario))
+            self.db.commit()
+            vistas.confirmar(asignadas)
+        except Exception as e:
+            self.db.rollback()
+            detalle = e.detail if isinstance(e, HTTPException) else str(e)
+            for fila in filas:
+                resultados[fila.fila] = ResultadoFilaImportacion(
+                    fila=fila.fila, estado="error", referencia=fila.referencia,
+                    monto=fila.monto, detalle=f"Lote revertido: {detalle}"
+                )
+
+        return [resultados[numero] for numero in sorted(resultados)]
+
+    def _descartar_duplicados(
+        self,
+        asignadas: List[Tuple[FilaExtracto, int]],
+        id_medio: int,
+        vistas: "_MovimientosVistos",
+        resultados: dict
+    ) -> List[Tuple[FilaExtracto, int]]:
+        """
+        Un movimiento bancario es (medio, fecha, monto, referencia, contrato). La referencia
+        sola no alcanza: puede ser el código de unidad, que se repite todos los meses.
+        Se compara como multiconjunto: si el archivo trae el mismo movimiento k veces y ya
+        hay m registrados, solo se aplican las k - m ocurrencias que faltan. Así reimportar
+        el mismo extracto (con o sin referencia) no paga dos veces, y dos pagos idénticos
+        legítimos del mismo día se aplican la primera vez. Una referencia bancaria real no se
+        repite: su segunda aparición en el archivo es siempre duplicado.
+        """
+        if not asignadas:
+            return []
+        claves = [_clave_movimiento(fila, id_relacion) for fila, id_relacion in asignadas]
+        registradas = Counter({
+            (fecha, monto, referencia, id_relacion): cantidad
+            for fecha, monto, referencia, id_relacion, cantidad in self.db.query(
+                TransaccionIngreso.fecha,
+                TransaccionIngreso.monto_total,
+                TransaccionIngreso.num_documento,
+                TransaccionIngreso.id_relacion,
+                func.count(TransaccionIngreso.id_transaccion)
+            ).filter(
+                TransaccionIngreso.id_medio_ingreso == id_medio,
+                TransaccionIngreso.fecha.in_({c[0] for c in claves}),
+                TransaccionIngreso.id_relacion.in_({c[3] for c in claves}),
+                TransaccionIngreso.estado != 'ANULADO'
+            ).group_by(
+                TransaccionIngreso.fecha, TransaccionIngreso.monto_total,
+                TransaccionIngreso.num_documento, TransaccionIngreso.id_relacion
+            )
+        })
+
+        pendientes = []
+        for (fila, id_relacion), clave in zip(asignadas, claves):
+            # Registradas ANTES de este archivo (lo aplicado en lotes previos ya está en la BD)
+            previas = registradas[clave] - vistas.aplicadas[clave]
+            vistas.ocurrencias[clave] += 1
+            repetida = _es_referencia_bancaria(fila) and vistas.ocurrencias[clave] > 1
+            if repetida or vistas.ocurrencias[clave] <= previas:
+                resultados[fila.fila] = ResultadoFilaImportacion(
+                    fila=fila.fila, estado="duplicado", referencia=fila.referencia, monto=fila.monto,
+                    id_relacion=id_relacion,
+                    detalle="Pago ya registrado con este medio (misma fecha, monto, referencia y contrato)."
+                )
+                continue
+            pendientes.append((fila, id_relacion))
+        return pendientes
+
+    def _conciliar(self, filas: List[FilaExtracto], resultados: dict) -> List[Tuple[FilaExtracto, int]]:
+        """
+        Prioridad: id_relacion explícito > unidad (o referencia = código de unidad).
+        Si la unidad tiene varios contratos activos, desempata el monto contra monto_mensual.
+        """
+        ids_explicitos = {f.id_relacion for f in filas if f.id_relacion}
+        activas_por_id = {
+            r.id_relacion: r for r in self.db.query(RelacionCliente).filter(
+                RelacionCliente.id_relacion.in_(ids_explicitos),
+                RelacionCliente.estado == 'Activo'
+            )
+        } if ids_explicitos else {}
+
+        codigos = set()
+        for f in filas:
+            codigos.update(c.upper() for c in (f.unidad, f.referencia) if c)
+        por_unidad: Dict[str, List[RelacionCliente]] = {}
+        if codigos:
+            consulta = self.db.query(RelacionCliente, func.upper(models.UnidadServicio.identificador_unico))\
+                .join(models.UnidadServicio, RelacionCliente.id_unidad == models.UnidadServicio.id_unidad)\
+                .filter(
+                    func.upper(models.UnidadServicio.identificador_unico).in_(codigos),
+                    RelacionCliente.estado == 'Activo'
+                )
+            for relacion, codigo in consulta:
+                por_unidad.setdefault(codigo, []).append(relacion)
+
+        asignadas = []
+        for fila in filas:
+            relacion, motivo = None, "Sin contrato activo para la unidad/referencia."
+            if fila.id_relacion:
+                relacion = activas_por_id.get(fila.id_relacion)
+                motivo = f"Contrato {fila.id_relacion} inexistente o inactivo."
+            else:
+                for codigo in (fila.unidad, fila.referencia):
+                    candidatas = por_unidad.get(codigo.upper(), []) if codigo else []
+                    if len(candidatas) > 1:
+                        candidatas = [
+                            r for r in candidatas
+                            if r.monto_mensual and abs(float(r.monto_mensual) - fila.monto) < 0.005
+                        ]
+                        motivo = "Unidad con varios contratos activos y el monto no desempata."
+                    if len(candidatas) == 1:
+                        relacion = candidatas[0]
+                        break
+
+            if relacion is None:
+                resultados[fila.fila] = ResultadoFilaImportacion(
+                    fila=fila.fila, estado="sin_coincidencia", referencia=fila.referencia,
+                    monto=fila.monto, detalle=motivo
+                )
+            else:
+                asignadas.append((fila, relacion.id_relacion))
+        return asignadas
+
+    def _aplicar(self, asignadas: List[Tuple[FilaExtracto, int]], medio, id_usuario: int) -> Dict[int, ResultadoFilaImportacion]:
+        """
+        Versión por lotes de la imputación de create_transaccion:
+        - Mismo orden de bloqueo (RelacionCliente, luego ItemFacturable por id_item ASC).
+        - UNA consulta trae todas las deudas pendientes de todos los contratos del lote.
+        - Cada pago cubre deudas de la más antigua a la más nueva; el excedente va a la
+          billetera (saldo_favor), igual que lo revierte anular_transaccion.
+        - Las deudas con bloqueo_pago_automatico no se tocan (requieren cobro manual).
+        """
+        ids_relacion = sorted({id_relacion for _, id_relacion in asignadas})
+        relaciones = {
+            r.id_relacion: r for r in self.db.query(RelacionCliente)
+                .filter(RelacionCliente.id_relacion.in_(ids_relacion))
+                .order_by(RelacionCliente.id_relacion)
+                .with_for_update()
+        }
+
+        pares = {(r.id_persona, r.id_unidad) for r in relaciones.values()}
+        deudas_por_par: Dict[tuple, List[ItemFacturable]] = {}
+        deudas = self.db.query(ItemFacturable).filter(
+            tuple_(ItemFacturable.id_persona, ItemFacturable.id_unidad).in_(pares),
+            ItemFacturable.saldo_pendiente > 0.001,
+            ItemFacturable.estado.notin_(('anulado', 'cancelado')),
+            ItemFacturable.bloqueo_pago_automatico.isnot(True)
+        ).order_by(ItemFacturable.id_item).with_for_update()
+        for item in deudas:
+            deudas_por_par.setdefault((item.id_persona, item.id_unidad), []).append(item)
+        for lista in deudas_por_par.values():
+            lista.sort(key=lambda i: (i.fecha_vencimiento, i.id_item))
+
+        imputador = TransaccionIngresoService(self.db)
+        es_efectivo = medio.id_medio_ingreso == catalog_cache.id_medio_efectivo(self.db)
+        transacciones, detalles, aplicadas = [], [], []
+        total_efectivo = 0.0
+
+        # Pagos del mismo contrato: primero el de fecha más antigua
+        for fila, id_relacion in sorted(asignadas, key=lambda a: (a[0].fecha, a[0].fila)):
+            relacion = relaciones[id_relacion]
+            transaccion = models.TransaccionIngreso(
+                id_relacion=id_relacion,
+                id_usuario_creador=id_usuario,
+                id_catalogo=medio.id_catalogo,
+                id_medio_ingreso=medio.id_medio_ingreso,
+                monto_total=fila.monto,
+                fecha=fila.fecha,
+                num_documento=fila.referencia,
+                descripcion=fila.descripcion or "Importación de extracto bancario",
+                fecha_creacion=datetime.now(),
+                estado="APLICADO",
+                monto_billetera_usado=0.0
+            )
+            transacciones.append(transaccion)
+
+            disponible = fila.monto
+            for item in deudas_por_par.get((relacion.id_persona, relacion.id_unidad), []):
+                if disponible <= 0.001: break
+                if float(item.saldo_pendiente) <= 0.001: continue
+                detalle = imputador._aplicar_pago_item(transaccion, item, disponible)
+                detalles.append(detalle)
+                disponible -= float(detalle.monto_aplicado)
+
+            excedente = round(max(disponible, 0.0), 2)
+            if excedente > 0:
+                relacion.saldo_favor = float(relacion.saldo_favor or 0) + excedente
+            if es_efectivo:
+                total_efectivo += fila.monto
+            aplicadas.append((fila, transaccion, excedente))
+
+        # ESCRITURA EN BLOQUE: un flush para todas las cabeceras y detalles del lote
+        self.db.add_all(transacciones)
+        self.db.add_all(detalles)
+        if total_efectivo:
+            CajaService(self.db).registrar_movimiento(ingresos=total_efectivo)
+        # refrescar() hace el flush que asigna los id_transaccion del reporte
+        ResumenRelacionService(self.db).refrescar(ids_relacion)
+
+        return {
+            fila.fila: ResultadoFilaImportacion(
+                fila=fila.fila, estado="aplicado", referencia=fila.referencia, monto=fila.monto,
+                id_relacion=transaccion.id_relacion, id_transaccion=transaccion.id_transaccion,
+                monto_aplicado_deudas=round(fila.monto - excedente, 2), monto_a_billetera=excedente
+            )
+            for fila, transaccion, excedente in aplicadas
+        }
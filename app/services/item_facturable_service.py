@@ -1,5 +1,5 @@
 from sqlalchemy.orm import Session, joinedload
-from sqlalchemy import desc, func, and_
+from sqlalchemy import func, and_, exists, insert, update, case
 from fastapi import HTTPException, status
 from typing import List, Optional, Dict, Any
 from datetime import date, datetime
@@ -8,6 +8,8 @@ from calendar import monthrange
 from app.db import models
 from app.db.models import RelacionCliente
 from app.schemas import item_facturable_schema as schemas
+from app.core.pagination import Pagina, paginar
+from app.services.resumen_relacion_service import ResumenRelacionService
 
 class ItemFacturableService:
     def __init__(self, db: Session):
@@ -17,8 +19,11 @@ class ItemFacturableService:
     # ----------------------------------------------------------------------
     # 1. CONSULTAS (LECTURA)
     # ----------------------------------------------------------------------
-    def get_item_by_id(self, item_id: int) -> Optional[models.ItemFacturable]:
-        return self.db.query(models.ItemFacturable).filter(models.ItemFacturable.id_item == item_id).first()
+    def get_item_by_id(self, item_id: int, for_update: bool = False) -> Optional[models.ItemFacturable]:
+        query = self.db.query(models.ItemFacturable).filter(models.ItemFacturable.id_item == item_id)
+        if for_update:
+            query = query.with_for_update()
+        return query.first()
     
     def get_items_by_unidad(self, unidad_id: int) -> List[models.ItemFacturable]:
         return self.db.query(models.ItemFacturable)\
@@ -26,10 +31,14 @@ class ItemFacturableService:
             .filter(models.ItemFacturable.id_unidad == unidad_id)\
             .all()
     
-    def get_all_items(self, skip: int = 0, limit: int = 100) -> List[models.ItemFacturable]:
-        return self.db.query(models.ItemFacturable).order_by(desc(models.ItemFacturable.fecha_creacion)).offset(skip).limit(limit).all()
+    # Orden total para keyset: solo la PK (fecha_creacion admite NULL y paginar() exige
+    # columnas NOT NULL; el id crece con la fecha de creación de todos modos)
+    ORDEN_LISTADO = (models.ItemFacturable.id_item,)
 
-    def get_filtered_items(self, filters: schemas.ItemFacturableFilter, skip: int = 0, limit: int = 100):
+    def get_all_items(self, skip: int = 0, limit: int = 100, cursor: Optional[str] = None) -> Pagina:
+        return paginar(self.db.query(models.ItemFacturable), self.ORDEN_LISTADO, cursor=cursor, limit=limit, skip=skip)
+
+    def get_filtered_items(self, filters: schemas.ItemFacturableFilter, skip: int = 0, limit: int = 100, cursor: Optional[str] = None) -> Pagina:
         query = self.db.query(models.ItemFacturable)
         
         if filters.id_persona: query = query.filter(models.ItemFacturable.id_persona == filters.id_persona)
@@ -40,7 +49,7 @@ class ItemFacturableService:
         if filters.fecha_vencimiento_min: query = query.filter(models.ItemFacturable.fecha_vencimiento >= filters.fecha_vencimiento_min)
         if filters.fecha_vencimiento_max: query = query.filter(models.ItemFacturable.fecha_vencimiento <= filters.fecha_vencimiento_max)
 
-        return query.order_by(desc(models.ItemFacturable.fecha_creacion)).offset(skip).limit(limit).all()
+        return paginar(query, self.ORDEN_LISTADO, cursor=cursor, limit=limit, skip=skip)
 
     # ----------------------------------------------------------------------
     # 2. CREACIÓN MANUAL (CON AUDITORÍA)
@@ -100,6 +109,7 @@ class ItemFacturableService:
         )
 
         self.db.add(nuevo_item)
+        ResumenRelacionService(self.db).refrescar_pares([(nuevo_item.id_persona, nuevo_item.id_unidad)])
         self.db.commit()
         self.db.refresh(nuevo_item)
         return nuevo_item
@@ -128,6 +138,7 @@ class ItemFacturableService:
         db_item.id_usuario_modificacion = id_usuario
         db_item.fecha_modificacion = datetime.now()
 
+        ResumenRelacionService(self.db).refrescar_pares([(db_item.id_persona, db_item.id_unidad)])
         self.db.commit()
         self.db.refresh(db_item)
         return db_item
@@ -147,6 +158,7 @@ class ItemFacturableService:
         db_item.id_usuario_modificacion = id_usuario
         db_item.fecha_modificacion = datetime.now()
         
+        ResumenRelacionService(self.db).refrescar_pares([(db_item.id_persona, db_item.id_unidad)])
         self.db.commit()
         self.db.refresh(db_item)
         return db_item
@@ -154,7 +166,7 @@ class ItemFacturableService:
     def apply_payment(self, item_id: int, monto_pago: float, id_usuario: int) -> models.ItemFacturable:
         # Nota: Normalmente los pagos van por TransaccionIngresoService. 
         # Este método es para ajustes manuales directos.
-        db_item = self.get_item_by_id(item_id)
+        db_item = self.get_item_by_id(item_id, for_update=True)
         if not db_item: raise HTTPException(status_code=404)
         
         if db_item.estado in self.FINAL_STATUSES and db_item.saldo_pendiente <= 0:
@@ -177,23 +189,39 @@ class ItemFacturableService:
         db_item.id_usuario_modificacion = id_usuario
         db_item.fecha_modificacion = datetime.now()
         
+        ResumenRelacionService(self.db).refrescar_pares([(db_item.id_persona, db_item.id_unidad)])
         self.db.commit()
         self.db.refresh(db_item)
         return db_item
 
-    def check_for_overdue(self) -> List[models.ItemFacturable]:
+    def check_for_overdue(self, limite_ids: int = 100) -> Dict[str, Any]:
+        """
+        Barrido de vencimientos en UNA sola sentencia:
+        UPDATE ... WHERE estado='pendiente' AND fecha_vencimiento < :hoy RETURNING id_item
+        (Usa el índice ix_item_estado_vencimiento; no carga objetos en memoria.)
+        """
         # Tarea automática, no requiere usuario
         hoy = date.today()
-        vencidos = self.db.query(models.ItemFacturable).filter(
-            models.ItemFacturable.estado == 'pendiente',
-            models.ItemFacturable.fecha_vencimiento < hoy
-        ).all()
-        
-        for item in vencidos:
-            item.estado = 'vencido'
-        
+        resultado = self.db.execute(
+            update(models.ItemFacturable)
+            .where(
+                models.ItemFacturable.estado == 'pendiente',
+                models.ItemFacturable.fecha_vencimiento < hoy
+            )
+            .values(estado='vencido')
+            .returning(models.ItemFacturable.id_item)
+            .execution_options(synchronize_session=False)
+        )
+        ids_vencidos = resultado.scalars().all()
+        # Contratos cuyas deudas pasaron a vencidas desde su último refresco
+        ResumenRelacionService(self.db).refrescar_vencidos(hoy)
         self.db.commit()
-        return vencidos
+
+        return {
+            "fecha_corte": hoy,
+            "total_actualizados": len(ids_vencidos),
+            "ids_actualizados": ids_vencidos[:limite_ids]
+        }
 
     # ----------------------------------------------------------------------
     # 5. GENERACIÓN INTELIGENTE (CON AUDITORÍA)
@@ -204,11 +232,12 @@ class ItemFacturableService:
         monto_final = datos.monto_base
         relacion = None
 
+        # CONCURRENCIA: El contrato se bloquea (FOR UPDATE) antes de tocar su billetera
         if not id_persona_final or not monto_final:
             relacion = self.db.query(RelacionCliente).filter(
                 RelacionCliente.id_unidad == datos.id_unidad,
                 RelacionCliente.estado == "Activo"
-            ).first()
+            ).with_for_update().first()
 
             if not relacion:
                 raise HTTPException(status_code=404, detail="No se encontró contrato activo.")
@@ -256,7 +285,7 @@ class ItemFacturableService:
                 RelacionCliente.id_persona == id_persona_final,
                 RelacionCliente.id_unidad == datos.id_unidad,
                 RelacionCliente.estado == "Activo"
-            ).first()
+            ).with_for_update().first()
 
         monto_descontado = 0.0
         mensaje = "Cuota generada exitosamente."
@@ -279,6 +308,7 @@ class ItemFacturableService:
                 monto_descontado = monto_a_usar
                 mensaje = f"Se descontaron {monto_descontado} automáticamente del saldo a favor."
 
+        ResumenRelacionService(self.db).refrescar_pares([(id_persona_final, datos.id_unidad)])
         self.db.commit()
         self.db.refresh(nuevo_item)
         
@@ -358,9 +388,29 @@ class ItemFacturableService:
         }
 
     def generar_cuotas_globales(self, datos: schemas.GenerarGlobalRequest, id_usuario: int = None):
-        contratos_activos = self.db.query(RelacionCliente).filter(
+        """
+        Motor masivo del Botón Maestro.
+        Calcula el universo en una sola consulta (contratos activos menos lo ya
+        facturado), inserta todas las cuotas nuevas en un único INSERT multi-fila,
+        descuenta las billeteras con un único UPDATE y confirma una sola vez.
+        """
+        ya_facturado = exists().where(
+            models.ItemFacturable.id_unidad == RelacionCliente.id_unidad,
+            models.ItemFacturable.id_concepto == datos.id_concepto,
+            models.ItemFacturable.periodo == datos.periodo,
+            models.ItemFacturable.estado != 'anulado'
+        )
+
+        contratos_activos = self.db.query(
+            RelacionCliente.id_relacion,
+            RelacionCliente.id_unidad,
+            RelacionCliente.id_persona,
+            RelacionCliente.monto_mensual,
+            RelacionCliente.saldo_favor,
+            ya_facturado.label("ya_facturado")
+        ).filter(
             RelacionCliente.estado == 'Activo'
-        ).all()
+        ).order_by(RelacionCliente.id_relacion).with_for_update(of=RelacionCliente).all()
 
         if not contratos_activos:
             return {"mensaje": "No hay contratos activos.", "procesados": 0}
@@ -369,37 +419,89 @@ class ItemFacturableService:
         mes = int(datos.periodo[5:7])
         _, ultimo_dia = monthrange(año, mes)
         fecha_venc = date(año, mes, ultimo_dia)
+        ahora = datetime.now()
 
         resultados = []
-        contador_exito = 0
+        nuevos_items = []
+        descuentos_billetera = {}  # id_relacion -> monto descontado
+        unidades_tomadas = set()
+        contratos_generados = []
 
+        # A. PREPARAR FILAS EN MEMORIA (Misma regla R2: una cuota por unidad/concepto/periodo)
         for contrato in contratos_activos:
-            req = schemas.GenerarCuotaRequest(
-                id_unidad=contrato.id_unidad,
-                id_persona=contrato.id_persona,
-                monto_base=contrato.monto_mensual,
-                id_concepto=datos.id_concepto,
-                periodo=datos.periodo,
-                fecha_vencimiento=fecha_venc
-            )
+            if contrato.ya_facturado or contrato.id_unidad in unidades_tomadas:
+                resultados.append({
+                    "unidad": contrato.id_unidad,
+                    "estado": "ERROR",
+                    "detalle": f"409: Ya existe cuota para {datos.periodo}"
+                })
+                continue
 
-            try:
-                # PASAMOS EL USUARIO AQUÍ
-                res = self.generar_cuota_con_cruce(req, id_usuario)
-                
+            if contrato.monto_mensual is None:
                 resultados.append({
                     "unidad": contrato.id_unidad,
-                    "estado": "OK", 
-                    "detalle": f"Generado. Estado: {res['item'].estado}"
+                    "estado": "ERROR",
+                    "detalle": "El contrato no tiene monto mensual definido."
                 })
-                contador_exito += 1
-                
-            except Exception as e:
-                # Simplificado para brevedad
-                resultados.append({"unidad": contrato.id_unidad, "estado": "ERROR", "detalle": str(e)})
+                continue
+
+            unidades_tomadas.add(contrato.id_unidad)
+            contratos_generados.append(contrato.id_relacion)
+
+            # B. CRUCE DE BILLETERA (calculado, se aplica abajo en bloque)
+            deuda_inicial = float(contrato.monto_mensual)
+            saldo_disponible = float(contrato.saldo_favor or 0)
+            monto_a_usar = min(saldo_disponible, deuda_inicial) if saldo_disponible > 0 else 0.0
+
+            saldo_item = deuda_inicial - monto_a_usar
+            estado_item = "pendiente"
+            if monto_a_usar > 0:
+                estado_item = "pagado" if saldo_item <= 0.001 else "pagado_parcial"
+                descuentos_billetera[contrato.id_relacion] = monto_a_usar
+
+            nuevos_items.append({
+                "id_unidad": contrato.id_unidad,
+                "id_persona": contrato.id_persona,
+                "id_concepto": datos.id_concepto,
+                "id_usuario_creador": id_usuario,
+                "monto_base": deuda_inicial,
+                "saldo_pendiente": saldo_item,
+                "periodo": datos.periodo,
+                "año": año,
+                "mes": mes,
+                "fecha_vencimiento": fecha_venc,
+                "fecha_creacion": ahora,
+                "estado": estado_item
+            })
+            resultados.append({
+                "unidad": contrato.id_unidad,
+                "estado": "OK",
+                "detalle": f"Generado. Estado: {estado_item}"
+            })
+
+        # C. ESCRITURA EN BLOQUE (Un INSERT, un UPDATE, un COMMIT)
+        try:
+            if nuevos_items:
+                self.db.execute(insert(models.ItemFacturable), nuevos_items)
+
+            if descuentos_billetera:
+                self.db.execute(
+                    update(RelacionCliente)
+                    .where(RelacionCliente.id_relacion.in_(list(descuentos_billetera)))
+                    .values(saldo_favor=RelacionCliente.saldo_favor - case(
+                        descuentos_billetera, value=RelacionCliente.id_relacion
+                    ))
+                    .execution_options(synchronize_session=False)
+                )
+
+            ResumenRelacionService(self.db).refrescar(contratos_generados)
+            self.db.commit()
+        except Exception as e:
+            self.db.rollback()
+            raise HTTPException(status_code=500, detail=f"Error en la generación global: {str(e)}")
 
         return {
-            "mensaje": f"Global finalizado. {contador_exito} generados.",
+            "mensaje": f"Global finalizado. {len(nuevos_items)} generados.",
             "detalles": resultados
         }
     # Agrega este método dentro de la clase ItemFacturableService
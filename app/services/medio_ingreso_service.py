@@ -1,17 +1,18 @@
 # Archivo: app/services/medio_ingreso_service.py
 from sqlalchemy.orm import Session
 from fastapi import HTTPException, status
-from typing import List
 
 from app.db import models
 from app.schemas import medio_ingreso_schema as schemas
+from app.core.catalog_cache import catalog_cache
 
 class MedioIngresoService:
     def __init__(self, db: Session):
         self.db = db
 
-    def get_all(self, skip: int = 0, limit: int = 100) -> List[models.MedioIngreso]:
-        return self.db.query(models.MedioIngreso).offset(skip).limit(limit).all()
+    def get_all(self, skip: int = 0, limit: int = 100) -> list:
+        """Lee del caché de catálogos."""
+        return catalog_cache.listar(self.db, "medios_ingreso")[skip:skip + limit]
 
     def get_by_id(self, id: int) -> models.MedioIngreso:
         medio = self.db.query(models.MedioIngreso).filter(models.MedioIngreso.id_medio_ingreso == id).first()
@@ -48,6 +49,7 @@ class MedioIngresoService:
         try:
             self.db.add(db_obj)
             self.db.commit()
+            catalog_cache.invalidar()
             self.db.refresh(db_obj)
             return db_obj
             
@@ -88,6 +90,7 @@ class MedioIngresoService:
 
         try:
             self.db.commit()
+            catalog_cache.invalidar()
             self.db.refresh(db_obj)
             return db_obj
             
@@ -125,10 +128,12 @@ class MedioIngresoService:
             db_obj.activo = False
             self.db.add(db_obj)
             self.db.commit()
+            catalog_cache.invalidar()
             self.db.refresh(db_obj)
             return db_obj 
         else:
             # HARD DELETE (Si es nuevo y sin uso)
             self.db.delete(db_obj)
             self.db.commit()
+            catalog_cache.invalidar()
             return db_obj
\ No newline at end of file
@@ -3,6 +3,8 @@ from sqlalchemy.orm import Session
 from typing import List, Optional
 from app.db import models
 from app.schemas import persona_schema as schemas
+from app.core.pagination import Pagina, paginar
+from app.core.busqueda import contiene, normalizada, terminos_busqueda
 
 # Excepción personalizada que tu endpoint espera importar
 class PersonaNotFoundError(Exception):
@@ -15,22 +17,31 @@ class PersonaService:
     def get_persona_by_id(self, persona_id: int) -> Optional[models.Persona]:
         return self.db.query(models.Persona).filter(models.Persona.id_persona == persona_id).first()
 
-    def get_all_personas(self, skip: int = 0, limit: int = 100) -> List[models.Persona]:
-        return self.db.query(models.Persona).offset(skip).limit(limit).all()
+    def get_all_personas(self, skip: int = 0, limit: int = 100, cursor: Optional[str] = None) -> Pagina:
+        # Antes sin ORDER BY (orden no determinista); ahora por PK ascendente
+        return paginar(self.db.query(models.Persona), (models.Persona.id_persona,), cursor=cursor, limit=limit, skip=skip, descendente=False)
 
-    def get_filtered_personas(self, filters: schemas.PersonaFilter) -> List[models.Persona]:
+    def get_filtered_personas(self, filters: schemas.PersonaFilter, limit: int = 100) -> List[models.Persona]:
+        # Cada palabra de cada filtro debe aparecer EN SU COLUMNA, sin distinguir tildes ni
+        # mayúsculas. texto_busqueda (índice trigram) hace la selección gruesa; el predicado por
+        # columna (sin índice) descarta, p. ej., un nombre "Ana" al filtrar apellidos=ana.
         query = self.db.query(models.Persona)
-        
-        if filters.nombres:
-            query = query.filter(models.Persona.nombres.ilike(f"%{filters.nombres}%"))
-        if filters.apellidos:
-            query = query.filter(models.Persona.apellidos.ilike(f"%{filters.apellidos}%"))
-        if filters.telefono:
-            query = query.filter(models.Persona.telefono.like(f"%{filters.telefono}%"))
+
+        por_columna = (
+            (filters.nombres, normalizada(models.Persona.nombres)),
+            (filters.apellidos, normalizada(models.Persona.apellidos)),
+            (filters.telefono, models.Persona.telefono),
+        )
+        for texto, columna in por_columna:
+            for termino in terminos_busqueda(texto):
+                query = query.filter(
+                    contiene(models.Persona.texto_busqueda, termino),
+                    contiene(columna, termino)
+                )
         if filters.activo is not None:
             query = query.filter(models.Persona.activo == filters.activo)
-            
-        return query.all()
+
+        return query.order_by(models.Persona.apellidos, models.Persona.nombres, models.Persona.id_persona).limit(limit).all()
 
     def create_persona(self, persona_in: schemas.PersonaCreate) -> models.Persona:
         # Aquí podrías validar CI duplicado si quisieras
@@ -1,11 +1,12 @@
 # Archivo: app/services/relacion_cliente_service.py
 from sqlalchemy.orm import Session
-from sqlalchemy import desc
-from typing import List, Optional
+from typing import Optional
 from datetime import date
 
 from app.db import models
 from app.schemas import relacion_cliente_schema as schemas
+from app.core.pagination import Pagina, paginar
+from app.services.resumen_relacion_service import ResumenRelacionService
 
 class NotFoundError(Exception):
     pass
@@ -22,7 +23,7 @@ class RelacionClienteService:
             raise NotFoundError(f"La relación con ID {relacion_id} no existe.")
         return relacion
 
-    def get_all_relaciones(self, filtros: schemas.RelacionClienteFilter, skip: int = 0, limit: int = 100) -> List[models.RelacionCliente]:
+    def get_all_relaciones(self, filtros: schemas.RelacionClienteFilter, skip: int = 0, limit: int = 100, cursor: Optional[str] = None) -> Pagina:
         query = self.db.query(models.RelacionCliente)
 
         if filtros.id_persona:
@@ -34,8 +35,8 @@ class RelacionClienteService:
         if filtros.tipo_relacion:
             query = query.filter(models.RelacionCliente.tipo_relacion == filtros.tipo_relacion)
 
-        query = query.order_by(desc(models.RelacionCliente.fecha_inicio))
-        return query.offset(skip).limit(limit).all()
+        orden = (models.RelacionCliente.fecha_inicio, models.RelacionCliente.id_relacion)
+        return paginar(query, orden, cursor=cursor, limit=limit, skip=skip)
 
     def create_relacion(self, relacion_in: schemas.RelacionClienteCreate) -> models.RelacionCliente:
         # 1. Validaciones existentes...
@@ -74,6 +75,8 @@ class RelacionClienteService:
             self.db.add(unidad) # Agregamos la unidad a la transacción
         # -----------------------------------------------------------
 
+        self.db.flush()
+        ResumenRelacionService(self.db).refrescar([nueva_relacion.id_relacion])
         self.db.commit()
         self.db.refresh(nueva_relacion)
         return nueva_relacion
@@ -128,6 +131,8 @@ class RelacionClienteService:
         for field, value in update_data.items():
             setattr(db_relacion, field, value)
 
+        # Cambio de unidad, persona o billetera: el resumen se recalcula en la misma transacción
+        ResumenRelacionService(self.db).refrescar([db_relacion.id_relacion])
         self.db.commit()
         self.db.refresh(db_relacion)
         return db_relacion
@@ -1,37 +1,146 @@
 # Archivo: app/services/reporte_service.py
 from sqlalchemy.orm import Session
-from sqlalchemy import desc, asc
+from sqlalchemy import desc, asc, select, func, cast, String
 from fastapi import HTTPException
-from datetime import datetime, date
-from typing import List  # <--- Agregamos esto para el nuevo método
+from datetime import datetime, date, timedelta
+from typing import List, Dict
+from collections import defaultdict
 
+from app.core.report_cache import antiguedad_cache
+from app.db.database import en_primario
 from app.db import models
 from app.schemas import reporte_schema
 
+# Estados con deuda viva: el IN sobre la primera columna de ix_item_estado_vencimiento
+# (estado, fecha_vencimiento) permite recorrer solo el rango vencido de cada estado
+ESTADOS_ABIERTOS = ('pendiente', 'vencido', 'pago_parcial', 'pagado_parcial')
+
 class ReporteService:
     def __init__(self, db: Session):
         self.db = db
 
     # -------------------------------------------------------------------------
-    # 1. ESTADO DE CUENTA INDIVIDUAL (TU CÓDIGO ORIGINAL - INTACTO)
+    # 1. ESTADO DE CUENTA INDIVIDUAL Y POR LOTE (NÚMERO FIJO DE CONSULTAS)
     # -------------------------------------------------------------------------
     def obtener_estado_cuenta(self, id_persona: int) -> reporte_schema.EstadoCuentaResponse:
-        # 1. Verificar Persona
-        persona = self.db.query(models.Persona).filter(models.Persona.id_persona == id_persona).first()
-        if not persona:
+        estados = self.obtener_estados_cuenta([id_persona])
+        if id_persona not in estados:
             raise HTTPException(status_code=404, detail="Persona no encontrada")
+        return estados[id_persona]
+
+    def obtener_estados_cuenta(self, ids_persona: List[int]) -> Dict[int, reporte_schema.EstadoCuentaResponse]:
+        """
+        Construye los estados de cuenta de varias personas con 4 consultas en total
+        (personas, billeteras, deudas, últimos pagos), sin importar cuántas deudas
+        o pagos tenga cada una. Las personas inexistentes se omiten del resultado.
+        """
+        ids = list(dict.fromkeys(ids_persona))
+        if not ids:
+            return {}
+
+        # 1. Verificar Personas
+        personas = self.db.execute(
+            select(models.Persona.id_persona, models.Persona.nombres, models.Persona.apellidos)
+            .where(models.Persona.id_persona.in_(ids))
+        ).all()
+        if not personas:
+            return {}
+        ids = [p.id_persona for p in personas]
 
-        # A. CALCULAR BILLETERAS Y SALDOS A FAVOR
-        relaciones = self.db.query(models.RelacionCliente).filter(
-            models.RelacionCliente.id_persona == id_persona,
-            models.RelacionCliente.estado == 'Activo'
+        # A. BILLETERAS Y SALDOS A FAVOR (JOIN a unidad)
+        relaciones = self.db.execute(
+            select(
+                models.RelacionCliente.id_persona,
+                models.RelacionCliente.id_unidad,
+                models.RelacionCliente.tipo_relacion,
+                models.RelacionCliente.saldo_favor,
+                models.UnidadServicio.identificador_unico
+            ).select_from(models.RelacionCliente)
+            .outerjoin(models.UnidadServicio, models.UnidadServicio.id_unidad == models.RelacionCliente.id_unidad)
+            .where(
+                models.RelacionCliente.id_persona.in_(ids),
+                models.RelacionCliente.estado == 'Activo'
+            )
         ).all()
 
+        # B. DEUDAS (Vencidas y Pendientes) con nombre de concepto proyectado
+        items_pendientes = self.db.execute(
+            select(
+                models.ItemFacturable.id_persona,
+                models.ItemFacturable.periodo,
+                models.ItemFacturable.monto_base,
+                models.ItemFacturable.saldo_pendiente,
+                models.ItemFacturable.fecha_vencimiento,
+                models.ItemFacturable.estado,
+                func.coalesce(models.ConceptoDeuda.nombre, "Concepto General").label("concepto")
+            ).select_from(models.ItemFacturable)
+            .outerjoin(models.ConceptoDeuda, models.ConceptoDeuda.id_concepto == models.ItemFacturable.id_concepto)
+            .where(
+                models.ItemFacturable.id_persona.in_(ids),
+                models.ItemFacturable.saldo_pendiente > 0.001,
+                models.ItemFacturable.estado != 'cancelado'
+            )
+            .order_by(asc(models.ItemFacturable.fecha_vencimiento))
+        ).all()
+
+        # C. HISTORIAL DE PAGOS (Últimos 10 por persona, vía sus contratos)
+        numero_fila = func.row_number().over(
+            partition_by=models.RelacionCliente.id_persona,
+            order_by=(desc(models.TransaccionIngreso.fecha), desc(models.TransaccionIngreso.id_transaccion))
+        ).label("n")
+        pagos_sq = select(
+            models.RelacionCliente.id_persona,
+            models.TransaccionIngreso.fecha,
+            models.TransaccionIngreso.fecha_creacion,
+            models.TransaccionIngreso.monto_total,
+            models.TransaccionIngreso.descripcion,
+            models.TransaccionIngreso.num_documento,
+            func.coalesce(models.MedioIngreso.nombre, "Desconocido").label("medio_pago"),
+            numero_fila
+        ).select_from(models.TransaccionIngreso)\
+            .join(models.RelacionCliente, models.RelacionCliente.id_relacion == models.TransaccionIngreso.id_relacion)\
+            .outerjoin(models.MedioIngreso, models.MedioIngreso.id_medio_ingreso == models.TransaccionIngreso.id_medio_ingreso)\
+            .where(
+                models.RelacionCliente.id_persona.in_(ids),
+                models.TransaccionIngreso.estado != 'ANULADO'
+            ).subquery("pagos")
+        ultimos_pagos_db = self.db.execute(
+            select(pagos_sq).where(pagos_sq.c.n <= 10).order_by(pagos_sq.c.id_persona, pagos_sq.c.n)
+        ).all()
+
+        # ENSAMBLADO EN MEMORIA
+        billeteras_por_persona = defaultdict(list)
+        for rel in relaciones:
+            billeteras_por_persona[rel.id_persona].append(rel)
+
+        deudas_por_persona = defaultdict(list)
+        for item in items_pendientes:
+            deudas_por_persona[item.id_persona].append(item)
+
+        pagos_por_persona = defaultdict(list)
+        for pago in ultimos_pagos_db:
+            pagos_por_persona[pago.id_persona].append(pago)
+
+        hoy = date.today()
+        ahora = datetime.now()
+        return {
+            persona.id_persona: self._armar_estado_cuenta(
+                persona,
+                billeteras_por_persona[persona.id_persona],
+                deudas_por_persona[persona.id_persona],
+                pagos_por_persona[persona.id_persona],
+                hoy,
+                ahora
+            )
+            for persona in personas
+        }
+
+    def _armar_estado_cuenta(self, persona, relaciones, items_pendientes, ultimos_pagos, hoy: date, ahora: datetime) -> reporte_schema.EstadoCuentaResponse:
         lista_billeteras = []
         total_saldo_favor = 0.0
 
         for rel in relaciones:
-            nombre_unidad = rel.unidad.identificador_unico if rel.unidad else f"Unidad {rel.id_unidad}"
+            nombre_unidad = rel.identificador_unico or f"Unidad {rel.id_unidad}"
             saldo = float(rel.saldo_favor)
             
             lista_billeteras.append({
@@ -41,17 +150,9 @@ class ReporteService:
             })
             total_saldo_favor += saldo
 
-        # B. CALCULAR DEUDAS (Vencidas y Pendientes)
-        items_pendientes = self.db.query(models.ItemFacturable).filter(
-            models.ItemFacturable.id_persona == id_persona,
-            models.ItemFacturable.saldo_pendiente > 0.001,
-            models.ItemFacturable.estado != 'cancelado'
-        ).order_by(asc(models.ItemFacturable.fecha_vencimiento)).all()
-
         lista_deudas = []
         total_deuda_pendiente = 0.0
         total_deuda_vencida = 0.0
-        hoy = date.today()
 
         for item in items_pendientes:
             saldo_item = float(item.saldo_pendiente)
@@ -59,7 +160,7 @@ class ReporteService:
 
             lista_deudas.append(reporte_schema.ItemDeuda(
                 periodo=item.periodo,
-                concepto=item.concepto.nombre if item.concepto else "Concepto General",
+                concepto=item.concepto,
                 monto_base=float(item.monto_base),
                 saldo_pendiente=saldo_item,
                 fecha_vencimiento=item.fecha_vencimiento,
@@ -70,21 +171,16 @@ class ReporteService:
             if es_vencido:
                 total_deuda_vencida += saldo_item
 
-        # C. HISTORIAL DE PAGOS (Últimos 10)
-        ultimos_pagos_db = self.db.query(models.TransaccionIngreso).filter(
-            models.TransaccionIngreso.id_usuario_creador == id_persona,
-            models.TransaccionIngreso.estado != 'ANULADO'
-        ).order_by(desc(models.TransaccionIngreso.fecha)).limit(10).all()
-        
-        lista_pagos = []
-        for pago in ultimos_pagos_db:
-            lista_pagos.append(reporte_schema.ItemPago(
+        lista_pagos = [
+            reporte_schema.ItemPago(
                 fecha=pago.fecha_creacion,
                 monto_total=float(pago.monto_total),
                 descripcion=pago.descripcion or "Pago de cuotas",
                 num_documento=pago.num_documento,
-                medio_pago=pago.medio_ingreso.nombre if pago.medio_ingreso else "Desconocido"
-            ))
+                medio_pago=pago.medio_pago
+            )
+            for pago in ultimos_pagos
+        ]
 
         # D. DETERMINAR ESTADO GENERAL (SEMÁFORO)
         estado_general = "Al día"
@@ -104,7 +200,7 @@ class ReporteService:
         )
 
         return reporte_schema.EstadoCuentaResponse(
-            fecha_reporte=datetime.now(),
+            fecha_reporte=ahora,
             id_persona=persona.id_persona,
             nombre_persona=f"{persona.nombres} {persona.apellidos}",
             resumen=resumen_fin,
@@ -114,55 +210,190 @@ class ReporteService:
         )
 
     # -------------------------------------------------------------------------
-    # 2. REPORTE DE MOROSIDAD (NUEVO MÉTODO AGREGADO) 
+    # 2. REPORTE DE MOROSIDAD (AGREGADO EN SQL)
     # -------------------------------------------------------------------------
-    def obtener_lista_morosos(self) -> List[reporte_schema.MorosoResponse]:
-        hoy = date.today()
-        
-        deudas_vencidas = self.db.query(models.ItemFacturable).filter(
+    def _filtro_morosidad(self, hoy: date, dias_minimos: int):
+        """Deuda vencida hace al menos 'dias_minimos' días (usa el índice de fecha_vencimiento)."""
+        return (
             models.ItemFacturable.saldo_pendiente > 0.01,
-            models.ItemFacturable.fecha_vencimiento < hoy,
+            models.ItemFacturable.fecha_vencimiento <= hoy - timedelta(days=dias_minimos),
             models.ItemFacturable.estado != 'anulado',
             models.ItemFacturable.estado != 'cancelado'
+        )
+
+    def obtener_lista_morosos(
+        self,
+        skip: int = 0,
+        limit: int = 100,
+        ordenar_por: str = "total_deuda",
+        descendente: bool = True,
+        dias_minimos: int = 1,
+        incluir_detalles: bool = True
+    ) -> List[reporte_schema.MorosoResponse]:
+        hoy = date.today()
+        filtros = self._filtro_morosidad(hoy, dias_minimos)
+
+        # A. AGRUPACIÓN POR UNIDAD (Totales, meses y vencimiento más antiguo en SQL).
+        # Los días de atraso se calculan en Python: restar fechas en SQL depende del dialecto
+        # (en SQLite da años). Mayor atraso = vencimiento más antiguo.
+        agregado = select(
+            models.ItemFacturable.id_unidad.label("id_unidad"),
+            func.sum(models.ItemFacturable.saldo_pendiente).label("total_deuda"),
+            func.count(models.ItemFacturable.id_item).label("cantidad_meses"),
+            func.min(models.ItemFacturable.fecha_vencimiento).label("vencimiento_mas_antiguo"),
+            func.min(models.ItemFacturable.id_persona).label("id_persona")
+        ).where(*filtros).group_by(models.ItemFacturable.id_unidad).subquery("morosos")
+
+        columnas_orden = {
+            "total_deuda": agregado.c.total_deuda,
+            "cantidad_meses": agregado.c.cantidad_meses,
+            "dias_atraso": agregado.c.vencimiento_mas_antiguo,
+            "identificador": models.UnidadServicio.identificador_unico,
+        }
+        columna = columnas_orden.get(ordenar_por, agregado.c.total_deuda)
+        if ordenar_por == "dias_atraso":
+            descendente = not descendente  # Más días de atraso = fecha menor
+
+        # B. NOMBRES EN EL MISMO VIAJE (JOIN unidad y persona)
+        filas = self.db.execute(
+            select(
+                agregado,
+                models.UnidadServicio.identificador_unico,
+                models.Persona.nombres,
+                models.Persona.apellidos
+            ).select_from(agregado)
+            .outerjoin(models.UnidadServicio, models.UnidadServicio.id_unidad == agregado.c.id_unidad)
+            .outerjoin(models.Persona, models.Persona.id_persona == agregado.c.id_persona)
+            .order_by(columna.desc() if descendente else columna.asc(), agregado.c.id_unidad)
+            .offset(skip).limit(limit)
         ).all()
 
-        agrupado = {} 
+        agrupado = {}
+        for f in filas:
+            nombre_inquilino = f"{f.nombres} {f.apellidos}" if f.nombres is not None else "Desconocido"
+            agrupado[f.id_unidad] = reporte_schema.MorosoResponse(
+                id_unidad=f.id_unidad,
+                identificador_unico=f.identificador_unico or f"ID-{f.id_unidad}",
+                nombre_inquilino=nombre_inquilino,
+                total_deuda=float(f.total_deuda),
+                cantidad_meses=f.cantidad_meses,
+                dias_atraso_max=(hoy - f.vencimiento_mas_antiguo).days,
+                detalles=[]
+            )
 
-        for item in deudas_vencidas:
-            uid = item.id_unidad
-            
-            # 1. Obtenemos el valor (el string "2J")
-            valor_identificador = item.unidad.identificador_unico if item.unidad else f"ID-{uid}"
-
-            if uid not in agrupado:
-                nombre_inquilino = "Desconocido"
-                if item.persona:
-                    nombre_inquilino = f"{item.persona.nombres} {item.persona.apellidos}"
-                
-                # 2. Creamos el objeto (AQUÍ ESTABA EL ERROR)
-                agrupado[uid] = reporte_schema.MorosoResponse(
-                    id_unidad=uid,
-                    
-                    # ❌ ANTES (Error): iden_unico = valor_identificador
-                    # ✅ AHORA (Correcto): El nombre debe ser idéntico al Schema
-                    identificador_unico = valor_identificador, 
-                    
-                    nombre_inquilino=nombre_inquilino,
-                    total_deuda=0.0,
-                    cantidad_meses=0,
-                    detalles=[]
-                )
-            
-            # ... resto del código igual (cálculo de días y acumuladores) ...
-            dias_atraso = (hoy - item.fecha_vencimiento).days
-            agrupado[uid].total_deuda += float(item.saldo_pendiente)
-            agrupado[uid].cantidad_meses += 1
-            
-            agrupado[uid].detalles.append(reporte_schema.DetalleDeudaMoroso(
-                periodo=item.periodo,
-                concepto=item.concepto.nombre if item.concepto else "General",
-                monto_pendiente=float(item.saldo_pendiente),
-                dias_atraso=dias_atraso
+        if not incluir_detalles or not agrupado:
+            return list(agrupado.values())
+
+        # C. DETALLE DE LA PÁGINA EN UNA SOLA CONSULTA
+        detalles = self.db.execute(
+            select(
+                models.ItemFacturable.id_unidad,
+                models.ItemFacturable.periodo,
+                func.coalesce(models.ConceptoDeuda.nombre, "General").label("concepto"),
+                models.ItemFacturable.saldo_pendiente,
+                models.ItemFacturable.fecha_vencimiento
+            ).select_from(models.ItemFacturable)
+            .outerjoin(models.ConceptoDeuda, models.ConceptoDeuda.id_concepto == models.ItemFacturable.id_concepto)
+            .where(*filtros, models.ItemFacturable.id_unidad.in_(list(agrupado)))
+            .order_by(models.ItemFacturable.id_unidad, models.ItemFacturable.fecha_vencimiento)
+        ).all()
+
+        for d in detalles:
+            agrupado[d.id_unidad].detalles.append(reporte_schema.DetalleDeudaMoroso(
+                periodo=d.periodo,
+                concepto=d.concepto,
+                monto_pendiente=float(d.saldo_pendiente),
+                dias_atraso=(hoy - d.fecha_vencimiento).days
             ))
             
-        return list(agrupado.values())
\ No newline at end of file
+        return list(agrupado.values())
+
+    # -------------------------------------------------------------------------
+    # 3. ANTIGÜEDAD DE SALDOS (BUCKETS CON FILTER EN SQL, CACHÉ DIARIO)
+    # -------------------------------------------------------------------------
+    def obtener_antiguedad(self, agrupar_por: str = "unidad") -> reporte_schema.ReporteAntiguedadResponse:
+        """
+        Saldo vencido por tramos de atraso (0-30, 31-60, 61-90, +90 días) agrupado por
+        unidad, concepto o periodo. Un único SELECT agregado; el resultado se cachea por
+        día y se invalida tras cada commit que mueve saldos (ver report_cache).
+        """
+        hoy = date.today()
+        clave = (hoy, agrupar_por)
+        cacheado = antiguedad_cache.get(clave)
+        if cacheado is not None:
+            return cacheado
+
+        version = antiguedad_cache.version
+        # Lo que se cachea se calcula en el primario: la réplica puede no ver aún el pago
+        # cuyo commit acaba de invalidar el caché
+        with en_primario(self.db):
+            reporte = self._calcular_antiguedad(hoy, agrupar_por)
+        antiguedad_cache.put(clave, reporte, version)
+        return reporte
+
+    def _calcular_antiguedad(self, hoy: date, agrupar_por: str) -> reporte_schema.ReporteAntiguedadResponse:
+        item = models.ItemFacturable
+        saldo = item.saldo_pendiente
+        # Los tramos se expresan como rangos de fecha (no como resta de fechas) para comparar
+        # directo contra la columna indexada
+        corte_30, corte_60, corte_90 = (hoy - timedelta(days=d) for d in (30, 60, 90))
+
+        def suma(*condiciones):
+            return func.coalesce(func.sum(saldo).filter(*condiciones), 0)
+
+        dimensiones = {
+            "unidad": (item.id_unidad, func.coalesce(models.UnidadServicio.identificador_unico, "Sin unidad"),
+                       (models.UnidadServicio, models.UnidadServicio.id_unidad == item.id_unidad)),
+            "concepto": (item.id_concepto, func.coalesce(models.ConceptoDeuda.nombre, "General"),
+                         (models.ConceptoDeuda, models.ConceptoDeuda.id_concepto == item.id_concepto)),
+            "periodo": (item.periodo, item.periodo, None),
+        }
+        clave, etiqueta, join = dimensiones.get(agrupar_por, dimensiones["unidad"])
+
+        consulta = select(
+            cast(clave, String).label("clave"),
+            etiqueta.label("etiqueta"),
+            suma(item.fecha_vencimiento >= corte_30).label("dias_0_30"),
+            suma(item.fecha_vencimiento < corte_30, item.fecha_vencimiento >= corte_60).label("dias_31_60"),
+            suma(item.fecha_vencimiento < corte_60, item.fecha_vencimiento >= corte_90).label("dias_61_90"),
+            suma(item.fecha_vencimiento < corte_90).label("dias_90_mas"),
+            func.sum(saldo).label("total"),
+            func.count(item.id_item).label("cantidad_items")
+        ).select_from(item)
+        if join is not None:
+            consulta = consulta.outerjoin(*join)
+
+        filas = self.db.execute(
+            consulta.where(
+                item.estado.in_(ESTADOS_ABIERTOS),
+                item.fecha_vencimiento < hoy,
+                saldo > 0.01
+            ).group_by(clave, etiqueta).order_by(desc("total"), clave)
+        ).all()
+
+        totales = reporte_schema.BucketsAntiguedad()
+        lista = []
+        for f in filas:
+            fila = reporte_schema.FilaAntiguedad(
+                clave=f.clave if f.clave is not None else "",
+                etiqueta=f.etiqueta,
+                dias_0_30=float(f.dias_0_30),
+                dias_31_60=float(f.dias_31_60),
+                dias_61_90=float(f.dias_61_90),
+                dias_90_mas=float(f.dias_90_mas),
+                total=float(f.total),
+                cantidad_items=f.cantidad_items
+            )
+            for campo in ("dias_0_30", "dias_31_60", "dias_61_90", "dias_90_mas", "total", "cantidad_items"):
+                setattr(totales, campo, getattr(totales, campo) + getattr(fila, campo))
+            lista.append(fila)
+
+        for campo in ("dias_0_30", "dias_31_60", "dias_61_90", "dias_90_mas", "total"):
+            setattr(totales, campo, round(getattr(totales, campo), 2))
+
+        return reporte_schema.ReporteAntiguedadResponse(
+            fecha_corte=hoy,
+            agrupado_por=agrupar_por,
+            totales=totales,
+            filas=lista
+        )
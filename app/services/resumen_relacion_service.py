@@ -0,0 +1,189 @@
+# Archivo: app/services/resumen_relacion_service.py
+# Mantenimiento y lectura de la tabla materializada resumen_relacion.
+# Regla: todo camino que cambia saldos de items o la billetera de un contrato llama a
+# refrescar(...) ANTES de su commit -> el resumen cambia en la misma transacción.
+# El refresco es un único INSERT ... SELECT agregado ... ON CONFLICT DO UPDATE por tramo
+# de contratos: recalcula desde item_facturable (no suma deltas), así nunca se desfasa.
+import time
+from datetime import date, datetime
+from typing import Iterable, List, Optional, Tuple
+
+from sqlalchemy import Date, DateTime, and_, case, cast, func, literal, select, true, tuple_
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.orm import Session
+
+from app.core.report_cache import antiguedad_cache, invalidar_al_confirmar
+from app.db import models
+from app.db.models import ItemFacturable, RelacionCliente, ResumenRelacion
+from app.schemas import reporte_schema
+
+# Estados que ya no cuentan como deuda aunque tengan saldo
+ESTADOS_CERRADOS = ('anulado', 'cancelado')
+TAMANO_TRAMO = 1000
+
+COLUMNAS_RESUMEN = [
+    "id_relacion", "total_pendiente", "total_vencido", "vencimiento_mas_antiguo",
+    "items_abiertos", "items_vencidos", "ultimo_periodo_pagado", "saldo_favor", "fecha_actualizacion",
+]
+
+
+class ResumenRelacionService:
+    def __init__(self, db: Session):
+        self.db = db
+
+    # ----------------------------------------------------------------------
+    # 1. CÁLCULO (SQL)
+    # ----------------------------------------------------------------------
+    @staticmethod
+    def _abierto():
+        return and_(ItemFacturable.saldo_pendiente > 0.001, ItemFacturable.estado.notin_(ESTADOS_CERRADOS))
+
+    def _select_agregado(self, condicion, hoy: date, ahora: datetime):
+        """Una fila por contrato con sus totales, leída de item_facturable (persona + unidad)."""
+        abierto = self._abierto()
+        vencido = and_(abierto, ItemFacturable.fecha_vencimiento < hoy)
+        return select(
+            RelacionCliente.id_relacion,
+            func.coalesce(func.sum(case((abierto, ItemFacturable.saldo_pendiente), else_=0)), 0),
+            func.coalesce(func.sum(case((vencido, ItemFacturable.saldo_pendiente), else_=0)), 0),
+            func.min(case((abierto, ItemFacturable.fecha_vencimiento))),
+            func.count(case((abierto, ItemFacturable.id_item))),
+            func.count(case((vencido, ItemFacturable.id_item))),
+            func.max(case((ItemFacturable.estado == 'pagado', ItemFacturable.periodo))),
+            func.coalesce(RelacionCliente.saldo_favor, 0),
+            literal(ahora, DateTime),
+        ).select_from(RelacionCliente)\
+            .outerjoin(ItemFacturable, and_(
+                ItemFacturable.id_persona == RelacionCliente.id_persona,
+                ItemFacturable.id_unidad == RelacionCliente.id_unidad
+            ))\
+            .where(condicion)\
+            .group_by(RelacionCliente.id_relacion, RelacionCliente.saldo_favor)
+
+    def _upsert(self, condicion) -> None:
+        """INSERT ... SELECT ... ON CONFLICT (id_relacion) DO UPDATE (Postgres; SQLite para pruebas)."""
+        dialecto = self.db.get_bind().dialect.name
+        insert = sqlite.insert if dialecto == "sqlite" else postgresql.insert
+        sentencia = insert(ResumenRelacion).from_select(
+            COLUMNAS_RESUMEN, self._select_agregado(condicion, date.today(), datetime.now())
+        )
+        sentencia = sentencia.on_conflict_do_update(
+            index_elements=[ResumenRelacion.id_relacion],
+            set_={c: sentencia.excluded[c] for c in COLUMNAS_RESUMEN if c != "id_relacion"}
+        )
+        self.db.execute(sentencia)
+
+    # ----------------------------------------------------------------------
+    # 2. MANTENIMIENTO (LLAMAR ANTES DEL COMMIT DEL LLAMADOR)
+    # ----------------------------------------------------------------------
+    def refrescar(self, ids_relacion: Iterable[Optional[int]]) -> int:
+        """Recalcula los contratos indicados. NO hace commit: queda en la transacción del llamador."""
+        ids = sorted({i for i in ids_relacion if i})
+        if not ids:
+            return 0
+        # Los saldos cambiaron: el reporte de antigüedad se recalcula tras el commit
+        invalidar_al_confirmar(self.db, antiguedad_cache)
+        # autoflush está apagado: el agregado debe ver los cambios pendientes de la sesión
+        self.db.flush()
+        for inicio in range(0, len(ids), TAMANO_TRAMO):
+            self._upsert(RelacionCliente.id_relacion.in_(ids[inicio:inicio + TAMANO_TRAMO]))
+        return len(ids)
+
+    def refrescar_pares(self, pares: Iterable[Tuple[int, int]]) -> int:
+        """Igual que refrescar(), a partir de (id_persona, id_unidad) de los items tocados."""
+        pares = {p for p in pares if p[0] and p[1]}
+        if not pares:
+            return 0
+        ids = self.db.query(RelacionCliente.id_relacion).filter(
+            tuple_(RelacionCliente.id_persona, RelacionCliente.id_unidad).in_(pares)
+        )
+        return self.refrescar(i for (i,) in ids)
+
+    def refrescar_vencidos(self, hoy: Optional[date] = None) -> int:
+        """
+        'Vencido' depende de la fecha: un resumen calculado el día D queda viejo cuando
+        alguna deuda abierta con D <= vencimiento < hoy pasa a estar vencida. Solo esos
+        contratos se recalculan (barrido diario y check_for_overdue).
+        """
+        hoy = hoy or date.today()
+        ids = self.db.query(ResumenRelacion.id_relacion)\
+            .join(RelacionCliente, RelacionCliente.id_relacion == ResumenRelacion.id_relacion)\
+            .join(ItemFacturable, and_(
+                ItemFacturable.id_persona == RelacionCliente.id_persona,
+                ItemFacturable.id_unidad == RelacionCliente.id_unidad
+            ))\
+            .filter(
+                self._abierto(),
+                ItemFacturable.fecha_vencimiento < hoy,
+                ItemFacturable.fecha_vencimiento >= cast(ResumenRelacion.fecha_actualizacion, Date)
+            ).distinct()
+        return self.refrescar(i for (i,) in ids)
+
+    def reconstruir(self) -> reporte_schema.ReconstruccionResumen:
+        """Recalcula TODA la tabla desde item_facturable y relacion_cliente, y confirma."""
+        inicio = time.perf_counter()
+        self._upsert(true())
+        contratos = self.db.query(func.count(ResumenRelacion.id_relacion)).scalar()
+        self.db.commit()
+        return reporte_schema.ReconstruccionResumen(
+            contratos=contratos,
+            duracion_ms=round((time.perf_counter() - inicio) * 1000, 1)
+        )
+
+    # ----------------------------------------------------------------------
+    # 3. LECTURA (DASHBOARDS)
+    # ----------------------------------------------------------------------
+    def listar(
+        self,
+        skip: int = 0,
+        limit: int = 100,
+        solo_morosos: bool = False,
+        solo_activos: bool = True,
+        ordenar_por: str = "total_vencido"
+    ) -> List[reporte_schema.ResumenContratoResponse]:
+        """Una fila indexada por contrato + nombres (JOIN), sin tocar item_facturable."""
+        columnas_orden = {
+            "total_vencido": ResumenRelacion.total_vencido.desc(),
+            "total_pendiente": ResumenRelacion.total_pendiente.desc(),
+            "vencimiento_mas_antiguo": ResumenRelacion.vencimiento_mas_antiguo.asc(),
+            "identificador": models.UnidadServicio.identificador_unico.asc(),
+        }
+        query = self.db.query(
+            ResumenRelacion,
+            RelacionCliente.id_unidad,
+            RelacionCliente.estado,
+            models.UnidadServicio.identificador_unico,
+            models.Persona.nombres,
+            models.Persona.apellidos
+        ).join(RelacionCliente, RelacionCliente.id_relacion == ResumenRelacion.id_relacion)\
+            .outerjoin(models.UnidadServicio, models.UnidadServicio.id_unidad == RelacionCliente.id_unidad)\
+            .outerjoin(models.Persona, models.Persona.id_persona == RelacionCliente.id_persona)
+
+        if solo_activos:
+            query = query.filter(RelacionCliente.estado == 'Activo')
+        if solo_morosos:
+            query = query.filter(ResumenRelacion.total_vencido > 0)
+
+        filas = query.order_by(
+            columnas_orden.get(ordenar_por, columnas_orden["total_vencido"]).nulls_last(),
+            ResumenRelacion.id_relacion
+        ).offset(skip).limit(limit).all()
+
+        return [
+            reporte_schema.ResumenContratoResponse(
+                id_relacion=r.id_relacion,
+                id_unidad=id_unidad,
+                identificador_unico=identificador or f"ID-{id_unidad}",
+                nombre_inquilino=f"{nombres} {apellidos}" if nombres is not None else "Desconocido",
+                estado_contrato=estado,
+                total_pendiente=float(r.total_pendiente),
+                total_vencido=float(r.total_vencido),
+                vencimiento_mas_antiguo=r.vencimiento_mas_antiguo,
+                items_abiertos=r.items_abiertos,
+                items_vencidos=r.items_vencidos,
+                ultimo_periodo_pagado=r.ultimo_periodo_pagado,
+                saldo_favor=float(r.saldo_favor),
+                fecha_actualizacion=r.fecha_actualizacion
+            )
+            for r, id_unidad, estado, identificador, nombres, apellidos in filas
+        ]
@@ -1,10 +1,10 @@
 # Archivo: app/services/tipo_egreso_service.py
 from sqlalchemy.orm import Session
 from fastapi import HTTPException, status
-from typing import List
 
 from app.db import models
 from app.schemas import tipo_egreso_schema as schemas
+from app.core.catalog_cache import catalog_cache
 
 class TipoEgresoService:
     def __init__(self, db: Session):
@@ -20,11 +20,12 @@ class TipoEgresoService:
     def get_by_id(self, tipo_egreso_id: int) -> models.TipoEgreso:
         return self._get_by_id_or_error(tipo_egreso_id)
 
-    def get_all(self, skip: int = 0, limit: int = 100, include_inactive: bool = False) -> List[models.TipoEgreso]:
-        query = self.db.query(models.TipoEgreso)
+    def get_all(self, skip: int = 0, limit: int = 100, include_inactive: bool = False) -> list:
+        """Lee del caché de catálogos."""
+        tipos = catalog_cache.listar(self.db, "tipos_egreso")
         if not include_inactive:
-            query = query.filter(models.TipoEgreso.activo == True)
-        return query.offset(skip).limit(limit).all()
+            tipos = [t for t in tipos if t.activo]
+        return tipos[skip:skip + limit]
 
     def create(self, tipo_in: schemas.TipoEgresoCreate) -> models.TipoEgreso:
         # Validar duplicados
@@ -39,6 +40,7 @@ class TipoEgresoService:
         )
         self.db.add(nuevo)
         self.db.commit()
+        catalog_cache.invalidar()
         self.db.refresh(nuevo)
         return nuevo
 
@@ -56,6 +58,7 @@ class TipoEgresoService:
             setattr(db_obj, field, value)
 
         self.db.commit()
+        catalog_cache.invalidar()
         self.db.refresh(db_obj)
         return db_obj
 
@@ -66,6 +69,7 @@ class TipoEgresoService:
         
         db_obj.activo = False
         self.db.commit()
+        catalog_cache.invalidar()
         self.db.refresh(db_obj)
         return db_obj
 
@@ -76,5 +80,6 @@ class TipoEgresoService:
         
         db_obj.activo = True
         self.db.commit()
+        catalog_cache.invalidar()
         self.db.refresh(db_obj)
         return db_obj
\ No newline at end of file
@@ -1,18 +1,22 @@
 # Archivo: app/services/transaccion_ingreso_service.py
-from sqlalchemy.orm import Session
-from sqlalchemy import desc, asc
+from sqlalchemy.orm import Session, joinedload, selectinload
+from sqlalchemy import desc, asc, and_, func, or_, select
 from fastapi import HTTPException, status
-from typing import List, Optional
+from typing import List, Optional, Dict
 from datetime import datetime, date
 
 from app.db import models
 from app.db.models import (
     TransaccionIngreso, 
     RelacionCliente, 
-    ItemFacturable,
-    MedioIngreso
+    ItemFacturable
 )
 
+from app.services.caja_service import CajaService
+from app.services.resumen_relacion_service import ResumenRelacionService
+from app.core.catalog_cache import catalog_cache
+from app.core.pagination import Pagina, paginar
+
 from app.schemas.transaccion_ingreso_schema import (
     TransaccionIngresoCreate, 
     ResultadoSimulacionIngreso,
@@ -26,10 +30,13 @@ class TransaccionIngresoService:
     # ----------------------------------------------------------------------
     # HELPERS
     # ----------------------------------------------------------------------
-    def _get_transaccion_or_404(self, transaccion_id: int) -> models.TransaccionIngreso:
-        db_transaccion = self.db.query(models.TransaccionIngreso).filter(
+    def _get_transaccion_or_404(self, transaccion_id: int, for_update: bool = False) -> models.TransaccionIngreso:
+        query = self.db.query(models.TransaccionIngreso).filter(
             models.TransaccionIngreso.id_transaccion == transaccion_id
-        ).first()
+        )
+        if for_update:
+            query = query.with_for_update()
+        db_transaccion = query.first()
         
         if not db_transaccion:
             raise HTTPException(
@@ -43,6 +50,14 @@ class TransaccionIngresoService:
             models.ItemFacturable.id_item == item_id
         ).first()
 
+    # CONCURRENCIA: Todo camino que mueve saldos bloquea filas (SELECT ... FOR UPDATE)
+    # SIEMPRE en el mismo orden para evitar deadlocks entre cajeros:
+    #   1) TransaccionIngreso (solo anulación)  2) RelacionCliente  3) ItemFacturable por id_item ASC
+    def _lock_relacion(self, relacion_id: int) -> Optional[RelacionCliente]:
+        return self.db.query(RelacionCliente).filter(
+            RelacionCliente.id_relacion == relacion_id
+        ).with_for_update().first()
+
     # ----------------------------------------------------------------------
     # 1. SIMULADOR (Sin Cambios Lógicos)
     # ----------------------------------------------------------------------
@@ -142,54 +157,49 @@ class TransaccionIngresoService:
     # ----------------------------------------------------------------------
     def create_transaccion(self, transaccion: TransaccionIngresoCreate, id_usuario: int) -> models.TransaccionIngreso:
         try:
-            # 1. VALIDAR CONTRATO
-            relacion = self.db.query(RelacionCliente).filter(
-                RelacionCliente.id_relacion == transaccion.id_relacion
-            ).first()
+            # 1. VALIDAR CONTRATO (y bloquearlo hasta el commit)
+            relacion = self._lock_relacion(transaccion.id_relacion)
 
             if not relacion:
                 raise HTTPException(status_code=404, detail="Contrato no encontrado.")
 
             # OBTENER CUENTA CONTABLE
-            medio_obj = self.db.query(MedioIngreso).filter(
-                MedioIngreso.id_medio_ingreso == transaccion.id_medio_ingreso
-            ).first()
+            medio_obj = catalog_cache.obtener(self.db, "medios_ingreso", transaccion.id_medio_ingreso)
 
             if not medio_obj:
                 raise HTTPException(status_code=404, detail="El medio de pago seleccionado no existe.")
             
             id_catalogo_destino = medio_obj.id_catalogo 
 
+            # PRE-CARGA: Todas las deudas referenciadas y candidatas en UNA consulta (bloqueadas)
+            items_por_id = self._prefetch_items(relacion, [d.id_item for d in transaccion.detalles])
+
             # 2. PROCESAR DETALLES
-            detalles_a_procesar = transaccion.detalles 
+            detalles_a_procesar = [(d.id_item, float(d.monto_aplicado)) for d in transaccion.detalles]
 
             if not detalles_a_procesar:
-                # Automático
-                deudas_pendientes = self.db.query(ItemFacturable).filter(
-                    ItemFacturable.id_persona == relacion.id_persona,
-                    ItemFacturable.id_unidad == relacion.id_unidad,
-                    ItemFacturable.saldo_pendiente > 0.001,
-                    ItemFacturable.estado != 'anulado'
-                ).order_by(asc(ItemFacturable.fecha_vencimiento)).all()
-
-                detalles_generados = []
+                # Automático (se resuelve en memoria sobre la pre-carga)
+                deudas_pendientes = sorted(
+                    (
+                        i for i in items_por_id.values()
+                        if i.id_persona == relacion.id_persona
+                        and i.id_unidad == relacion.id_unidad
+                        and float(i.saldo_pendiente) > 0.001
+                        and i.estado != 'anulado'
+                    ),
+                    key=lambda i: (i.fecha_vencimiento, i.id_item)
+                )
+
                 dinero_disponible_auto = float(transaccion.monto_total)
 
-                class DetalleDummy:
-                    def __init__(self, id_item, monto):
-                        self.id_item = id_item
-                        self.monto_aplicado = monto
-                    
                 for deuda in deudas_pendientes:
                     if dinero_disponible_auto <= 0.001: break
                     
                     saldo_actual = float(deuda.saldo_pendiente)
                     monto_a_pagar = min(dinero_disponible_auto, saldo_actual)
                     
-                    detalles_generados.append(DetalleDummy(deuda.id_item, monto_a_pagar))
+                    detalles_a_procesar.append((deuda.id_item, monto_a_pagar))
                     dinero_disponible_auto -= monto_a_pagar
-                
-                detalles_a_procesar = detalles_generados
             
             # 3. CREAR CABECERA
             new_ingreso = models.TransaccionIngreso(
@@ -210,39 +220,30 @@ class TransaccionIngresoService:
                 monto_billetera_usado=0.0
             )
             self.db.add(new_ingreso)
-            self.db.flush() 
 
             monto_disponible_real = float(transaccion.monto_total)
             ultimo_item_procesado = None
+            nuevos_detalles = []
 
             # 4. APLICAR DETALLES
-            for detalle_in in detalles_a_procesar:
-                item_facturable = self._get_item_facturable(detalle_in.id_item)
-                if not item_facturable: raise HTTPException(status_code=404, detail=f"Deuda {detalle_in.id_item} no encontrada.")
+            for id_item, monto_solicitado in detalles_a_procesar:
+                item_facturable = items_por_id.get(id_item)
+                if not item_facturable: raise HTTPException(status_code=404, detail=f"Deuda {id_item} no encontrada.")
                 
                 if item_facturable.id_persona != relacion.id_persona:
                        raise HTTPException(status_code=400, detail="Error seguridad: Deuda ajena al contrato.")
 
-                saldo_pendiente = float(item_facturable.saldo_pendiente)
-                monto_a_pagar = min(float(detalle_in.monto_aplicado), saldo_pendiente)
-                
-                item_facturable.saldo_pendiente = saldo_pendiente - monto_a_pagar
-                item_facturable.estado = "pagado" if item_facturable.saldo_pendiente <= 0.001 else "pagado_parcial"
-                
-                nuevo_detalle = models.TransaccionIngresoDetalle(
-                    id_transaccion=new_ingreso.id_transaccion,
-                    id_item=item_facturable.id_item,
-                    monto_aplicado=monto_a_pagar,
-                    saldo_anterior=saldo_pendiente,
-                    saldo_posterior=item_facturable.saldo_pendiente,
-                    estado="APLICADO"
-                )
-                self.db.add(nuevo_detalle)
-                
-                monto_disponible_real -= monto_a_pagar
+                nuevos_detalles.append(self._aplicar_pago_item(new_ingreso, item_facturable, monto_solicitado))
+                monto_disponible_real -= float(nuevos_detalles[-1].monto_aplicado)
                 ultimo_item_procesado = item_facturable
 
-            # 5. GENERACIÓN DE FUTURO
+            # 5. GENERACIÓN DE FUTURO (Resuelto contra el mapa en memoria)
+            items_por_periodo = {}
+            for item in sorted(items_por_id.values(), key=lambda i: i.id_item):
+                if item.id_unidad == relacion.id_unidad:
+                    items_por_periodo.setdefault((item.periodo, item.id_concepto), item)
+
+            nuevos_items = []
             while monto_disponible_real > 0.001:
                 
                 if ultimo_item_procesado:
@@ -263,11 +264,7 @@ class TransaccionIngresoService:
                 
                 next_periodo = f"{next_anio}-{next_mes:02d}"
 
-                siguiente_item = self.db.query(ItemFacturable).filter(
-                    ItemFacturable.id_unidad == relacion.id_unidad,
-                    ItemFacturable.periodo == next_periodo,
-                    ItemFacturable.id_concepto == id_concepto
-                ).first()
+                siguiente_item = items_por_periodo.get((next_periodo, id_concepto))
 
                 if not siguiente_item:
                     monto_base = float(relacion.monto_mensual) if relacion.monto_mensual else 0.0
@@ -290,28 +287,27 @@ class TransaccionIngresoService:
                         año=next_anio,
                         mes=next_mes
                     )
-                    self.db.add(siguiente_item)
-                    self.db.flush() 
+                    nuevos_items.append(siguiente_item)
+                    items_por_periodo[(next_periodo, id_concepto)] = siguiente_item
                 
-                saldo_futuro = float(siguiente_item.saldo_pendiente)
-                monto_adelanto = min(monto_disponible_real, saldo_futuro)
+                detalle_adelanto = self._aplicar_pago_item(new_ingreso, siguiente_item, monto_disponible_real)
+                nuevos_detalles.append(detalle_adelanto)
                 
-                siguiente_item.saldo_pendiente = saldo_futuro - monto_adelanto
-                siguiente_item.estado = "pagado" if siguiente_item.saldo_pendiente <= 0.001 else "pagado_parcial"
-
-                detalle_adelanto = models.TransaccionIngresoDetalle(
-                    id_transaccion=new_ingreso.id_transaccion,
-                    id_item=siguiente_item.id_item,
-                    monto_aplicado=monto_adelanto,
-                    saldo_anterior=saldo_futuro,
-                    saldo_posterior=siguiente_item.saldo_pendiente,
-                    estado="APLICADO"
-                )
-                self.db.add(detalle_adelanto)
-                
-                monto_disponible_real -= monto_adelanto
+                monto_disponible_real -= float(detalle_adelanto.monto_aplicado)
                 ultimo_item_procesado = siguiente_item
 
+            # 6. ESCRITURA EN BLOQUE: Un solo flush agrupa los INSERT de items y detalles
+            self.db.add_all(nuevos_items)
+            self.db.add_all(nuevos_detalles)
+
+            # 7. LEDGER DE CAJA (Solo efectivo, misma transacción)
+            servicio_caja = CajaService(self.db)
+            if servicio_caja.es_efectivo(transaccion.id_medio_ingreso):
+                servicio_caja.registrar_movimiento(ingresos=float(transaccion.monto_total))
+
+            # 8. RESUMEN MATERIALIZADO DEL CONTRATO (misma transacción)
+            ResumenRelacionService(self.db).refrescar([relacion.id_relacion])
+
             self.db.commit()
             self.db.refresh(new_ingreso)
             return new_ingreso
@@ -319,17 +315,74 @@ class TransaccionIngresoService:
         except Exception as e:
             self.db.rollback()
             raise e
+
+    def _prefetch_items(self, relacion: RelacionCliente, ids_referenciados: List[int]) -> Dict[int, models.ItemFacturable]:
+        """
+        Carga en una sola consulta, bloqueadas (FOR UPDATE) en orden de id_item:
+        - las deudas abiertas del contrato (persona + unidad): candidatas del pago automático,
+        - las deudas pedidas explícitamente,
+        - las filas de la unidad posteriores al último periodo abierto (o al de la primera deuda
+          pedida, o al mes actual si no hay ninguna): las que puede reutilizar la generación de futuro.
+        El historial ya pagado y las deudas de otros inquilinos anteriores no se leen ni se bloquean.
+        """
+        abiertas = and_(
+            ItemFacturable.id_persona == relacion.id_persona,
+            ItemFacturable.id_unidad == relacion.id_unidad,
+            ItemFacturable.saldo_pendiente > 0.001,
+            ItemFacturable.estado != 'anulado'
+        )
+        hoy = date.today()
+        ultimo_abierto = select(func.max(ItemFacturable.periodo)).where(abiertas).scalar_subquery()
+        condiciones = [
+            abiertas,
+            and_(
+                ItemFacturable.id_unidad == relacion.id_unidad,
+                ItemFacturable.periodo > func.coalesce(ultimo_abierto, f"{hoy.year}-{hoy.month:02d}")
+            )
+        ]
+        if ids_referenciados:
+            primer_referenciado = select(func.min(ItemFacturable.periodo))\
+                .where(ItemFacturable.id_item.in_(ids_referenciados)).scalar_subquery()
+            condiciones += [
+                ItemFacturable.id_item.in_(ids_referenciados),
+                and_(ItemFacturable.id_unidad == relacion.id_unidad, ItemFacturable.periodo > primer_referenciado)
+            ]
+
+        items = self.db.query(ItemFacturable).filter(or_(*condiciones))\
+            .order_by(ItemFacturable.id_item)\
+            .with_for_update()\
+            .all()
+        return {item.id_item: item for item in items}
+
+    def _aplicar_pago_item(self, transaccion: models.TransaccionIngreso, item: models.ItemFacturable, monto: float) -> models.TransaccionIngresoDetalle:
+        """Descuenta el pago del item y devuelve el detalle (aún sin insertar)."""
+        saldo_anterior = float(item.saldo_pendiente)
+        monto_a_pagar = min(float(monto), saldo_anterior)
+
+        item.saldo_pendiente = saldo_anterior - monto_a_pagar
+        item.estado = "pagado" if item.saldo_pendiente <= 0.001 else "pagado_parcial"
+
+        # Se enlaza por relación (no por ID) para no forzar un flush por cada fila
+        return models.TransaccionIngresoDetalle(
+            transaccion=transaccion,
+            item_facturable=item,
+            monto_aplicado=monto_a_pagar,
+            saldo_anterior=saldo_anterior,
+            saldo_posterior=item.saldo_pendiente,
+            estado="APLICADO"
+        )
             
     # ----------------------------------------------------------------------
     # 3. ANULACIÓN
     # ----------------------------------------------------------------------
     def anular_transaccion(self, transaccion_id: int, id_usuario_anulacion: int) -> models.TransaccionIngreso:
         
-        db_transaccion = self._get_transaccion_or_404(transaccion_id)
+        # Bloqueo de la cabecera: dos anulaciones simultáneas no pueden revertir dos veces
+        db_transaccion = self._get_transaccion_or_404(transaccion_id, for_update=True)
         if db_transaccion.estado == 'ANULADO': raise HTTPException(status_code=400, detail="Transacción ya estaba anulada.")
 
         try:
-            relacion = db_transaccion.relacion_cliente
+            relacion = self._lock_relacion(db_transaccion.id_relacion)
             if not relacion:
                  raise HTTPException(status_code=404, detail="El contrato asociado a esta transacción no existe.")
 
@@ -343,10 +396,19 @@ class TransaccionIngresoService:
             if monto_usado_de_billetera > 0.001:
                 relacion.saldo_favor = float(relacion.saldo_favor) + monto_usado_de_billetera
 
+            ids_items = sorted({d.id_item for d in db_transaccion.detalles if d.estado == 'APLICADO'})
+            items_por_id = {
+                item.id_item: item for item in self.db.query(ItemFacturable)
+                    .filter(ItemFacturable.id_item.in_(ids_items))
+                    .order_by(ItemFacturable.id_item)
+                    .with_for_update()
+                    .all()
+            } if ids_items else {}
+
             for detalle in db_transaccion.detalles:
                 if detalle.estado != 'APLICADO': continue
                 
-                item = self._get_item_facturable(detalle.id_item)
+                item = items_por_id.get(detalle.id_item)
                 if item:
                     item.saldo_pendiente = float(item.saldo_pendiente) + float(detalle.monto_aplicado)
                     if item.saldo_pendiente >= float(item.monto_base) - 0.01:
@@ -356,11 +418,18 @@ class TransaccionIngresoService:
                 
                 detalle.estado = "REVERSADO"
 
+            estado_previo = db_transaccion.estado
             db_transaccion.estado = 'ANULADO'
             db_transaccion.fecha_anulacion = datetime.now()
+
+            # Ledger de caja: el efectivo anulado sale del cajón
+            servicio_caja = CajaService(self.db)
+            if estado_previo == 'APLICADO' and servicio_caja.es_efectivo(db_transaccion.id_medio_ingreso):
+                servicio_caja.registrar_movimiento(ingresos=-float(db_transaccion.monto_total))
             # Podríamos guardar 'id_usuario_anulacion' si tuviéramos un campo en BD,
             # pero por ahora queda en el Log de Auditoría (AuditLog).
-            
+
+            ResumenRelacionService(self.db).refrescar([relacion.id_relacion])
             self.db.commit()
             return db_transaccion
 
@@ -371,14 +440,42 @@ class TransaccionIngresoService:
     # ----------------------------------------------------------------------
     # 4. LECTURA Y OTROS
     # ----------------------------------------------------------------------
+    @staticmethod
+    def _opciones_carga(incluir_detalles: bool = True) -> list:
+        """
+        Carga exactamente el grafo que serializa schemas.TransaccionIngreso:
+        - relacion_cliente -> persona / unidad: JOIN (muchos-a-uno, no multiplica filas ni rompe el LIMIT)
+        - detalles -> item_facturable: 1 SELECT ... IN (...) extra para toda la página
+        Sin esto, una página de 100 dispara cientos de lazy loads.
+        """
+        relacion = joinedload(models.TransaccionIngreso.relacion_cliente)
+        opciones = [
+            relacion.joinedload(RelacionCliente.persona),
+            relacion.joinedload(RelacionCliente.unidad),
+        ]
+        if incluir_detalles:
+            opciones.append(
+                selectinload(models.TransaccionIngreso.detalles)
+                .joinedload(models.TransaccionIngresoDetalle.item_facturable)
+            )
+        return opciones
+
     def get_transaccion_by_id(self, transaccion_id: int) -> Optional[models.TransaccionIngreso]:
-        return self.db.query(models.TransaccionIngreso).filter(models.TransaccionIngreso.id_transaccion == transaccion_id).first()
+        return self.db.query(models.TransaccionIngreso)\
+            .options(*self._opciones_carga())\
+            .filter(models.TransaccionIngreso.id_transaccion == transaccion_id)\
+            .first()
     
-    def get_transacciones(self, skip: int = 0, limit: int = 100) -> List[models.TransaccionIngreso]:
-        return self.db.query(models.TransaccionIngreso).order_by(desc(models.TransaccionIngreso.fecha)).offset(skip).limit(limit).all()
+    def get_transacciones(self, skip: int = 0, limit: int = 100, cursor: Optional[str] = None, incluir_detalles: bool = True) -> Pagina:
+        """incluir_detalles=False: modo resumen (2 consultas menos por página, sin detalles)."""
+        # fecha no es única: la PK desempata para que el cursor no salte ni repita filas
+        orden = (models.TransaccionIngreso.fecha, models.TransaccionIngreso.id_transaccion)
+        query = self.db.query(models.TransaccionIngreso).options(*self._opciones_carga(incluir_detalles))
+        return paginar(query, orden, cursor=cursor, limit=limit, skip=skip)
 
     def get_transacciones_by_persona(self, persona_id: int, skip: int = 0, limit: int = 100) -> List[models.TransaccionIngreso]:
         return self.db.query(models.TransaccionIngreso)\
+            .options(*self._opciones_carga())\
             .join(RelacionCliente)\
             .filter(RelacionCliente.id_persona == persona_id)\
             .order_by(desc(models.TransaccionIngreso.fecha))\
@@ -389,4 +486,9 @@ class TransaccionIngresoService:
         if db_transaccion.detalles:
             raise HTTPException(status_code=409, detail="No se puede borrar transacciones con detalles. Use Anular.")
         self.db.delete(db_transaccion)
+
+        servicio_caja = CajaService(self.db)
+        if db_transaccion.estado == 'APLICADO' and servicio_caja.es_efectivo(db_transaccion.id_medio_ingreso):
+            servicio_caja.registrar_movimiento(ingresos=-float(db_transaccion.monto_total))
+
         self.db.commit()
\ No newline at end of file
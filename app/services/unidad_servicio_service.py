@@ -1,8 +1,10 @@
 # Archivo: app/services/unidad_servicio_service.py
 from sqlalchemy.orm import Session
-from typing import List, Optional
+from typing import Optional
 from app.db import models
 from app.schemas import unidad_servicio_schema as schemas
+from app.core.pagination import Pagina, paginar
+from app.core.busqueda import contiene, terminos_busqueda
 
 class UnidadServicioService:
     def __init__(self, db: Session):
@@ -11,15 +13,16 @@ class UnidadServicioService:
     def get_unidad_by_id(self, unidad_id: int) -> Optional[models.UnidadServicio]:
         return self.db.query(models.UnidadServicio).filter(models.UnidadServicio.id_unidad == unidad_id).first()
 
-    def get_all_unidades(self, skip: int = 0, limit: int = 100) -> List[models.UnidadServicio]:
-        return self.db.query(models.UnidadServicio).offset(skip).limit(limit).all()
+    def get_all_unidades(self, skip: int = 0, limit: int = 100, cursor: Optional[str] = None) -> Pagina:
+        return paginar(self.db.query(models.UnidadServicio), (models.UnidadServicio.id_unidad,), cursor=cursor, limit=limit, skip=skip, descendente=False)
 
-    def search_unidades(self, filters: schemas.UnidadServicioFilter, skip: int = 0, limit: int = 100) -> List[models.UnidadServicio]:
+    def search_unidades(self, filters: schemas.UnidadServicioFilter, skip: int = 0, limit: int = 100, cursor: Optional[str] = None) -> Pagina:
         query = self.db.query(models.UnidadServicio)
 
         # Aplicamos los filtros dinámicamente
-        if filters.identificador_unico:
-            query = query.filter(models.UnidadServicio.identificador_unico.ilike(f"%{filters.identificador_unico}%"))
+        # Parcial y sin tildes sobre texto_busqueda (índice trigram)
+        for termino in terminos_busqueda(filters.identificador_unico):
+            query = query.filter(contiene(models.UnidadServicio.texto_busqueda, termino))
         
         if filters.tipo_unidad:
             query = query.filter(models.UnidadServicio.tipo_unidad == filters.tipo_unidad)
@@ -30,7 +33,7 @@ class UnidadServicioService:
         if filters.activo is not None:
             query = query.filter(models.UnidadServicio.activo == filters.activo)
 
-        return query.offset(skip).limit(limit).all()
+        return paginar(query, (models.UnidadServicio.id_unidad,), cursor=cursor, limit=limit, skip=skip, descendente=False)
 
     def create_unidad(self, unidad_in: schemas.UnidadServicioCreate) -> Optional[models.UnidadServicio]:
         # 1. Validar unicidad del identificador
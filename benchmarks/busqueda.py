@@ -0,0 +1,62 @@
+# Archivo: benchmarks/busqueda.py
+# Latencia de GET /v1/buscar con un padrón grande (por defecto 100.000 personas, cada una con
+# su unidad y su contrato). Con Postgres mide el índice GIN pg_trgm; sin él (o en SQLite)
+# muestra el costo del escaneo completo.
+#   BENCH_DATABASE_URL=postgresql://... python -m benchmarks.busqueda
+#   python -m benchmarks.busqueda --personas 5000 --repeticiones 20   # prueba rápida en SQLite
+import argparse
+import time
+
+from benchmarks.comun import (
+    crear_usuario, describir_base, imprimir_tabla, medir, preparar_esquema, resumen, sembrar_padron
+)
+
+# (descripción, q): nombre completo, prefijo, término muy común, teléfono, unidad, sin resultados
+CONSULTAS = [
+    ("nombre completo", "jose perez"),
+    ("prefijo", "mar"),
+    ("término común", "luis"),
+    ("teléfono", "00001234"),
+    ("unidad", "b-000001"),
+    ("sin tildes/mayúsc.", "NUNEZ AVILA"),
+    ("sin resultados", "zzqx"),
+]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Latencia de /v1/buscar sobre un padrón grande.")
+    parser.add_argument("--personas", type=int, default=100_000)
+    parser.add_argument("--repeticiones", type=int, default=200)
+    parser.add_argument("--limite", type=int, default=20)
+    args = parser.parse_args()
+
+    from fastapi.testclient import TestClient
+    from main import app
+
+    print(f"Base: {describir_base()}")
+    preparar_esquema()
+    inicio = time.perf_counter()
+    sembrar_padron(args.personas)
+    print(f"Padrón de {args.personas} personas sembrado en {time.perf_counter() - inicio:.1f} s\n")
+    cabeceras = crear_usuario(rol="Cajero")
+
+    filas = []
+    with TestClient(app) as cliente:
+        for descripcion, q in CONSULTAS:
+            respuesta = cliente.get("/v1/buscar", params={"q": q, "limite": args.limite}, headers=cabeceras)
+            respuesta.raise_for_status()
+
+            def buscar():
+                cliente.get("/v1/buscar", params={"q": q, "limite": args.limite}, headers=cabeceras)
+
+            filas.append({
+                "consulta": f"{descripcion}: {q!r}",
+                "resultados": len(respuesta.json()["resultados"]),
+                "sentencias": respuesta.headers.get("X-DB-Queries", "-"),
+                **resumen(medir(buscar, args.repeticiones)),
+            })
+    imprimir_tabla(filas)
+
+
+if __name__ == "__main__":
+    main()
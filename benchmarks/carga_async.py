@@ -0,0 +1,123 @@
+# Archivo: benchmarks/carga_async.py
+# Throughput y p99 de /v1/reportes/* bajo concurrencia: stack ASYNC (los endpoints reales:
+# AsyncSession + run_sync) contra un stack SYNC equivalente (`def` + get_db en el threadpool),
+# ambos servidos por el mismo uvicorn real (un worker). Mismos servicios, mismo auth, misma
+# serialización: solo cambia cómo se sirve la E/S de BD.
+#   BENCH_DATABASE_URL=postgresql://... python -m benchmarks.carga_async
+#   python -m benchmarks.carga_async --contratos 300 --total 200 --concurrencia 1 8   # prueba rápida
+import argparse
+import time
+from typing import List, Literal
+
+from fastapi import APIRouter, Depends, Query
+from sqlalchemy.orm import Session
+
+from benchmarks.comun import (
+    cargar, crear_usuario, describir_base, imprimir_tabla, preparar_esquema, sembrar_cartera,
+    sembrar_padron, servidor
+)
+from app.core.config import ROLES_LECTURA
+from app.core.deps import require_roles
+from app.core.responses import responder_lista, responder_objeto
+from app.db.database import get_db
+from app.schemas import reporte_schema
+from app.services.reporte_service import ReporteService
+from app.services.resumen_relacion_service import ResumenRelacionService
+
+# ----------------------------------------------------------------------
+# 1. STACK SYNC (gemelo de app/api/v1/endpoints/reportes.py)
+# ----------------------------------------------------------------------
+sincrono = APIRouter(prefix="/reportes", dependencies=[Depends(require_roles(ROLES_LECTURA))])
+
+
+@sincrono.get("/estado-cuenta/{id_persona}", response_model=reporte_schema.EstadoCuentaResponse)
+def estado_cuenta_sync(id_persona: int, db: Session = Depends(get_db)):
+    return responder_objeto(reporte_schema.EstadoCuentaResponse, ReporteService(db).obtener_estado_cuenta(id_persona))
+
+
+@sincrono.get("/morosidad", response_model=List[reporte_schema.MorosoResponse])
+def morosidad_sync(
+    skip: int = Query(0, ge=0),
+    limit: int = Query(100, ge=1, le=1000),
+    ordenar_por: Literal["total_deuda", "cantidad_meses", "dias_atraso", "identificador"] = Query("total_deuda"),
+    db: Session = Depends(get_db)
+):
+    morosos = ReporteService(db).obtener_lista_morosos(skip=skip, limit=limit, ordenar_por=ordenar_por)
+    return responder_lista(reporte_schema.MorosoResponse, morosos, validado=True)
+
+
+@sincrono.get("/resumen-contratos", response_model=List[reporte_schema.ResumenContratoResponse])
+def resumen_contratos_sync(
+    skip: int = Query(0, ge=0),
+    limit: int = Query(100, ge=1, le=1000),
+    db: Session = Depends(get_db)
+):
+    filas = ResumenRelacionService(db).listar(skip=skip, limit=limit)
+    return responder_lista(reporte_schema.ResumenContratoResponse, filas, validado=True)
+
+
+@sincrono.get("/antiguedad", response_model=reporte_schema.ReporteAntiguedadResponse)
+def antiguedad_sync(db: Session = Depends(get_db)):
+    return responder_objeto(reporte_schema.ReporteAntiguedadResponse, ReporteService(db).obtener_antiguedad(), validado=True)
+
+
+def _crear_app():
+    from main import app
+    app.include_router(sincrono, prefix="/sync/v1")
+    return app
+
+
+# `python -m uvicorn benchmarks.carga_async:app` (lo lanza servidor() en un subproceso)
+app = _crear_app()
+
+# (nombre, ruta bajo /v1 — {id} se reemplaza por una persona distinta en cada solicitud)
+RUTAS = [
+    ("estado-cuenta", "/reportes/estado-cuenta/{id}"),
+    ("morosidad", "/reportes/morosidad?limit=100"),
+    ("resumen-contratos", "/reportes/resumen-contratos?limit=100"),
+    ("antiguedad (caché)", "/reportes/antiguedad"),
+]
+
+
+# ----------------------------------------------------------------------
+# 2. CARGA
+# ----------------------------------------------------------------------
+def main():
+    parser = argparse.ArgumentParser(description="Stack sync vs async bajo carga en /v1/reportes/*.")
+    parser.add_argument("--contratos", type=int, default=5000)
+    parser.add_argument("--meses", type=int, default=12)
+    parser.add_argument("--total", type=int, default=2000, help="Solicitudes por combinación.")
+    parser.add_argument("--concurrencia", type=int, nargs="+", default=[1, 16, 64])
+    args = parser.parse_args()
+
+    print(f"Base: {describir_base()}")
+    preparar_esquema()
+    inicio = time.perf_counter()
+    sembrar_padron(args.contratos)
+    cartera = sembrar_cartera(args.meses)
+    print(f"{args.contratos} contratos, {cartera['items']} cuotas y {cartera['pagos']} pagos "
+          f"sembrados en {time.perf_counter() - inicio:.1f} s\n")
+    cabeceras = crear_usuario()
+    # ids_persona de los inquilinos: el padrón se siembra primero, desde 1
+    ids_persona = list(range(1, args.contratos + 1))
+
+    filas = []
+    with servidor("benchmarks.carga_async:app") as url:
+        for nombre, ruta in RUTAS:
+            for concurrencia in args.concurrencia:
+                for stack, prefijo in (("sync", "/sync/v1"), ("async", "/v1")):
+                    def solicitud(cliente, n, plantilla=prefijo + ruta):
+                        destino = plantilla.replace("{id}", str(ids_persona[n % len(ids_persona)]))
+                        return cliente.get(destino, headers=cabeceras)
+
+                    medicion = cargar(url, solicitud, concurrencia, args.total)
+                    filas.append({
+                        "endpoint": nombre, "concurrencia": concurrencia, "stack": stack,
+                        "req_s": medicion["req_s"], "errores": medicion["errores"],
+                        "p50_ms": medicion["p50_ms"], "p99_ms": medicion["p99_ms"],
+                    })
+    imprimir_tabla(filas)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,71 @@
+# Archivo: benchmarks/compresion.py
+# Tamaño del payload y latencia de endpoints representativos con y sin compresión
+# (identity / gzip / br si `brotli` está instalado). Además estima el tiempo de transferencia
+# a un ancho de banda dado: ahí se ve si el CPU extra de comprimir se paga con creces.
+# Ojo: los datos sembrados son repetitivos y comprimen mejor que los reales (ratio optimista).
+#   BENCH_DATABASE_URL=postgresql://... python -m benchmarks.compresion
+#   python -m benchmarks.compresion --contratos 200 --repeticiones 20   # prueba rápida
+import argparse
+
+from benchmarks.comun import (
+    crear_usuario, describir_base, imprimir_tabla, medir, preparar_esquema, resumen, sembrar_cartera,
+    sembrar_padron
+)
+from app.core.compression import brotli
+
+ENDPOINTS = [
+    ("libro-diario", "/v1/caja/libro-diario", {"limit": 500}),
+    ("morosidad", "/v1/reportes/morosidad", {"limit": 100}),
+    ("facturables", "/v1/facturables/", {"limit": 100}),
+    ("estado-cuenta", "/v1/reportes/estado-cuenta/1", {}),
+]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Payload y latencia con/sin compresión.")
+    parser.add_argument("--contratos", type=int, default=2000)
+    parser.add_argument("--repeticiones", type=int, default=100)
+    parser.add_argument("--mbps", type=float, default=10.0, help="Ancho de banda para estimar la transferencia.")
+    args = parser.parse_args()
+
+    from fastapi.testclient import TestClient
+    from main import app
+
+    print(f"Base: {describir_base()}")
+    preparar_esquema()
+    sembrar_padron(args.contratos)
+    sembrar_cartera()
+    cabeceras = crear_usuario()
+    codificaciones = ["identity", "gzip"] + (["br"] if brotli is not None else [])
+    if brotli is None:
+        print("(brotli no está instalado: solo identity y gzip)")
+
+    filas = []
+    with TestClient(app) as cliente:
+        for nombre, ruta, params in ENDPOINTS:
+            plano = None
+            for codificacion in codificaciones:
+                encabezados = {**cabeceras, "Accept-Encoding": codificacion}
+                respuesta = cliente.get(ruta, params=params, headers=encabezados)
+                respuesta.raise_for_status()
+                # httpx descomprime el body: lo que viajó por la red es el Content-Length
+                en_red = int(respuesta.headers["content-length"])
+                plano = plano or en_red
+
+                def pedir():
+                    cliente.get(ruta, params=params, headers=encabezados)
+
+                latencia = resumen(medir(pedir, args.repeticiones))
+                transferencia_ms = en_red * 8 / (args.mbps * 1_000_000) * 1000
+                filas.append({
+                    "endpoint": nombre, "codificacion": respuesta.headers.get("content-encoding", "identity"),
+                    "bytes": en_red, "ratio": f"{plano / en_red:.1f}x",
+                    "p50_ms": latencia["p50_ms"], "p99_ms": latencia["p99_ms"],
+                    f"red_{args.mbps:g}mbps_ms": transferencia_ms,
+                    "total_p50_ms": latencia["p50_ms"] + transferencia_ms,
+                })
+    imprimir_tabla(filas)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,358 @@
+# Archivo: benchmarks/comun.py
+# Utilidades compartidas por los benchmarks (`python -m benchmarks.<nombre> --help`).
+# Base de datos:
+# - Por defecto un SQLite temporal: sirve para probar el script, NO para sacar números.
+# - BENCH_DATABASE_URL=postgresql://... para medir de verdad. ¡El esquema se BORRA y se
+#   recrea! Usar una base dedicada, nunca la de producción.
+# Las variables se fijan ANTES de importar la app: los motores se crean al importar app.db.database.
+import os
+import tempfile
+
+if not os.environ.get("BENCH_DATABASE_URL"):
+    # Queda en el entorno para que los servidores lanzados como subproceso usen la misma base
+    _SQLITE_TMP = os.path.join(tempfile.mkdtemp(prefix="yume-bench-"), "yume.db")
+    os.environ["BENCH_DATABASE_URL"] = f"sqlite:///{_SQLITE_TMP}"
+os.environ["DATABASE_URL_OVERRIDE"] = os.environ["BENCH_DATABASE_URL"]
+os.environ["DATABASE_REPLICA_URL"] = ""
+for _clave, _valor in {
+    "POSTGRES_USER": "yume", "POSTGRES_PASSWORD": "yume", "POSTGRES_SERVER": "localhost",
+    "POSTGRES_DB": "yume_bench", "SECRET_KEY": "clave-de-benchmarks",
+    # Los jobs diarios no tienen nada que hacer en una medición
+    "RESUMEN_REFRESH_ENABLED": "false", "IDEMPOTENCY_PURGE_ENABLED": "false",
+}.items():
+    os.environ.setdefault(_clave, _valor)
+
+import asyncio
+import math
+import random
+import socket
+import statistics
+import subprocess
+import sys
+import time
+from contextlib import contextmanager
+from datetime import date, datetime, timedelta
+from types import SimpleNamespace
+from typing import Awaitable, Callable, Dict, Iterator, List, Optional, Sequence
+
+import httpx
+
+from sqlalchemy import insert, select
+
+from app.core import security
+from app.core.busqueda import normalizar_busqueda
+from app.db import models
+from app.db.database import Base, SessionLocal, engine
+from app.services.caja_service import CajaService
+from app.services.resumen_relacion_service import ResumenRelacionService
+
+LOTE_INSERCION = 5000
+
+NOMBRES = [
+    "José", "María", "Luis", "Ana", "Carlos", "Lucía", "Jorge", "Rosa", "Pedro", "Carmen",
+    "Miguel", "Elena", "Raúl", "Sofía", "Andrés", "Julia", "Víctor", "Paola", "Óscar", "Inés",
+]
+APELLIDOS = [
+    "Pérez", "Gómez", "Rodríguez", "López", "Fernández", "Martínez", "Sánchez", "Ramírez",
+    "Torres", "Flores", "Rivera", "Vargas", "Castro", "Rojas", "Núñez", "Muñoz", "Ortiz", "Ávila",
+]
+
+
+# ----------------------------------------------------------------------
+# 1. ESQUEMA Y DATOS
+# ----------------------------------------------------------------------
+def preparar_esquema():
+    Base.metadata.drop_all(engine)
+    Base.metadata.create_all(engine)
+
+
+def _insertar_por_lotes(conn, tabla, filas: List[dict]):
+    for inicio in range(0, len(filas), LOTE_INSERCION):
+        conn.execute(insert(tabla), filas[inicio:inicio + LOTE_INSERCION])
+
+
+def sembrar_padron(personas: int, semilla: int = 7) -> Dict[str, int]:
+    """
+    `personas` personas y una unidad y un contrato activo por cada una, con INSERT por lotes
+    (sin ORM: texto_busqueda se calcula aquí, como lo harían los listeners).
+    """
+    azar = random.Random(semilla)
+    filas_persona, filas_unidad = [], []
+    for n in range(personas):
+        nombres = f"{azar.choice(NOMBRES)} {azar.choice(NOMBRES)}"
+        apellidos = f"{azar.choice(APELLIDOS)} {azar.choice(APELLIDOS)}"
+        celular = f"7{n:08d}"
+        email = f"persona{n}@yume.test"
+        filas_persona.append({
+            "nombres": nombres, "apellidos": apellidos, "telefono": celular, "celular": celular,
+            "email": email, "activo": True,
+            "texto_busqueda": normalizar_busqueda(nombres, apellidos, celular, celular, email),
+        })
+        identificador = f"{chr(65 + n % 26)}-{n:06d}"
+        filas_unidad.append({
+            "identificador_unico": identificador, "tipo_unidad": "Departamento", "estado": "Ocupado",
+            "activo": True, "texto_busqueda": normalizar_busqueda(identificador, "Departamento"),
+        })
+
+    with engine.begin() as conn:
+        _insertar_por_lotes(conn, models.Persona.__table__, filas_persona)
+        _insertar_por_lotes(conn, models.UnidadServicio.__table__, filas_unidad)
+        ids_persona = conn.execute(
+            models.Persona.__table__.select().with_only_columns(models.Persona.id_persona)
+            .order_by(models.Persona.id_persona)
+        ).scalars().all()
+        ids_unidad = conn.execute(
+            models.UnidadServicio.__table__.select().with_only_columns(models.UnidadServicio.id_unidad)
+            .order_by(models.UnidadServicio.id_unidad)
+        ).scalars().all()
+        _insertar_por_lotes(conn, models.RelacionCliente.__table__, [
+            {
+                "id_persona": id_persona, "id_unidad": id_unidad, "tipo_relacion": "Inquilino",
+                "fecha_inicio": fecha_inicio, "estado": "Activo", "saldo_favor": 0, "monto_mensual": 100,
+            }
+            for id_persona, id_unidad, fecha_inicio in zip(
+                ids_persona[-personas:], ids_unidad[-personas:],
+                (date.today() - timedelta(days=azar.randint(30, 900)) for _ in range(personas))
+            )
+        ])
+        if engine.dialect.name == "postgresql":
+            conn.exec_driver_sql("ANALYZE")
+    return {"personas": personas, "unidades": personas, "relaciones": personas}
+
+
+def _alta_usuario(db, rol: str, email: str, password: str) -> models.Usuario:
+    registro_rol = db.query(models.Rol).filter(models.Rol.nombre == rol).first()
+    if registro_rol is None:
+        registro_rol = models.Rol(nombre=rol)
+        db.add(registro_rol)
+    persona = models.Persona(nombres="Bench", apellidos="Marca", telefono="600", celular="600")
+    db.add(persona)
+    db.flush()
+    usuario = models.Usuario(
+        id_persona=persona.id_persona, id_rol=registro_rol.id_rol, email=email,
+        password_hash=security.get_password_hash(password)
+    )
+    db.add(usuario)
+    db.flush()
+    return usuario
+
+
+def crear_usuario(rol: str = "SuperAdmin", email: str = "bench@yume.test", password: str = "bench") -> Dict[str, str]:
+    """Crea un usuario con `rol` y devuelve las cabeceras Authorization para usarlo."""
+    with SessionLocal() as db:
+        usuario = _alta_usuario(db, rol, email, password)
+        db.commit()
+        token = security.create_access_token(
+            data={"sub": str(usuario.id_usuario), "rol": rol}, expires_delta=timedelta(hours=2)
+        )
+    return {"Authorization": f"Bearer {token}"}
+
+
+def sembrar_cartera(meses: int = 12, semilla: int = 11) -> Dict[str, int]:
+    """
+    Sobre el padrón ya sembrado: `meses` cuotas mensuales por contrato (hasta el mes actual),
+    las más antiguas pagadas en efectivo (transacción + detalle) y 0 a 4 al final impagas,
+    para que morosidad, estados de cuenta y libro diario tengan volumen real.
+    """
+    azar = random.Random(semilla)
+    hoy = date.today()
+    with SessionLocal() as db:
+        cajero = _alta_usuario(db, "Cajero", "cartera@yume.test", "bench")
+        concepto = models.ConceptoDeuda(nombre="Expensas")
+        cuenta = models.Categoria(nombre_cuenta="Caja General", tipo="ingreso")
+        db.add_all([concepto, cuenta])
+        db.flush()
+        efectivo = models.MedioIngreso(nombre="Efectivo", tipo="efectivo", id_catalogo=cuenta.id_catalogo)
+        db.add(efectivo)
+        db.commit()
+        ids = SimpleNamespace(
+            usuario=cajero.id_usuario, concepto=concepto.id_concepto,
+            medio=efectivo.id_medio_ingreso, catalogo=cuenta.id_catalogo
+        )
+
+    items, pagos = [], []
+    with engine.begin() as conn:
+        relaciones = conn.execute(
+            select(models.RelacionCliente.id_relacion, models.RelacionCliente.id_persona, models.RelacionCliente.id_unidad)
+            .order_by(models.RelacionCliente.id_relacion)
+        ).all()
+        for r in relaciones:
+            impagas = azar.randint(0, 4)
+            for n in range(meses):
+                atras = meses - 1 - n
+                año, mes = hoy.year + (hoy.month - 1 - atras) // 12, (hoy.month - 1 - atras) % 12 + 1
+                vencimiento = date(año, mes, 5)
+                pagada = atras >= impagas
+                items.append({
+                    "id_unidad": r.id_unidad, "id_persona": r.id_persona, "id_concepto": ids.concepto,
+                    "monto_base": 100, "saldo_pendiente": 0 if pagada else 100,
+                    "periodo": f"{año}-{mes:02d}", "fecha_vencimiento": vencimiento, "año": año, "mes": mes,
+                    "estado": "pagado" if pagada else ("vencido" if vencimiento < hoy else "pendiente"),
+                })
+                if pagada:
+                    pagos.append((len(items) - 1, r.id_relacion, vencimiento))
+
+        tabla_items = models.ItemFacturable.__table__
+        ids_item = []
+        for inicio in range(0, len(items), LOTE_INSERCION):
+            ids_item += conn.execute(
+                insert(tabla_items).returning(tabla_items.c.id_item, sort_by_parameter_order=True),
+                items[inicio:inicio + LOTE_INSERCION]
+            ).scalars().all()
+
+        tabla_tx = models.TransaccionIngreso.__table__
+        detalles = []
+        for inicio in range(0, len(pagos), LOTE_INSERCION):
+            lote = pagos[inicio:inicio + LOTE_INSERCION]
+            ids_tx = conn.execute(
+                insert(tabla_tx).returning(tabla_tx.c.id_transaccion, sort_by_parameter_order=True),
+                [
+                    {
+                        "id_relacion": id_relacion, "id_usuario_creador": ids.usuario, "id_medio_ingreso": ids.medio,
+                        "id_catalogo": ids.catalogo, "monto_total": 100, "fecha": fecha, "estado": "APLICADO",
+                        "descripcion": "Expensas", "fecha_creacion": datetime.combine(fecha, datetime.min.time()),
+                    }
+                    for _, id_relacion, fecha in lote
+                ]
+            ).scalars().all()
+            detalles += [
+                {
+                    "id_transaccion": id_tx, "id_item": ids_item[indice], "monto_aplicado": 100,
+                    "saldo_anterior": 100, "saldo_posterior": 0,
+                    "fecha_aplicacion": datetime.combine(fecha, datetime.min.time()),
+                }
+                for id_tx, (indice, _, fecha) in zip(ids_tx, lote)
+            ]
+        _insertar_por_lotes(conn, models.TransaccionIngresoDetalle.__table__, detalles)
+        if engine.dialect.name == "postgresql":
+            conn.exec_driver_sql("ANALYZE")
+
+    with SessionLocal() as db:
+        CajaService(db).reconciliar_ledger(corregir=True)
+        ResumenRelacionService(db).reconstruir()
+    return {"items": len(items), "pagos": len(pagos)}
+
+
+# ----------------------------------------------------------------------
+# 2. MEDICIÓN Y REPORTE
+# ----------------------------------------------------------------------
+def medir(funcion: Callable[[], object], repeticiones: int, calentamiento: int = 3) -> List[float]:
+    """Latencias en milisegundos de `repeticiones` llamadas (tras `calentamiento` descartadas)."""
+    for _ in range(calentamiento):
+        funcion()
+    tiempos = []
+    for _ in range(repeticiones):
+        inicio = time.perf_counter()
+        funcion()
+        tiempos.append((time.perf_counter() - inicio) * 1000)
+    return tiempos
+
+
+def percentil(valores: Sequence[float], p: float) -> float:
+    """Percentil por rango más cercano (p99 de 100 muestras = la 99ª más lenta)."""
+    ordenados = sorted(valores)
+    return ordenados[max(0, math.ceil(p / 100 * len(ordenados)) - 1)]
+
+
+def resumen(tiempos: Sequence[float]) -> Dict[str, float]:
+    return {
+        "n": len(tiempos),
+        "media_ms": statistics.fmean(tiempos),
+        "p50_ms": percentil(tiempos, 50),
+        "p95_ms": percentil(tiempos, 95),
+        "p99_ms": percentil(tiempos, 99),
+    }
+
+
+def imprimir_tabla(filas: List[Dict[str, object]]):
+    if not filas:
+        return
+    columnas = list(filas[0])
+    celdas = [[_formato(f[c]) for c in columnas] for f in filas]
+    anchos = [max(len(c), *(len(fila[i]) for fila in celdas)) for i, c in enumerate(columnas)]
+    print("  ".join(c.ljust(a) for c, a in zip(columnas, anchos)))
+    print("  ".join("-" * a for a in anchos))
+    for fila in celdas:
+        print("  ".join(v.ljust(a) for v, a in zip(fila, anchos)))
+
+
+def _formato(valor) -> str:
+    return f"{valor:.2f}" if isinstance(valor, float) else str(valor)
+
+
+def describir_base() -> str:
+    return f"{engine.dialect.name} ({engine.url.render_as_string(hide_password=True)})"
+
+
+# ----------------------------------------------------------------------
+# 3. SERVIDOR REAL Y CARGA CONCURRENTE
+# ----------------------------------------------------------------------
+@contextmanager
+def servidor(aplicacion: str = "main:app", entorno: Optional[Dict[str, str]] = None, espera: float = 30.0) -> Iterator[str]:
+    """
+    Levanta `aplicacion` con uvicorn en un subproceso (un worker) y devuelve su URL base.
+    Hereda BENCH_DATABASE_URL: usa la misma base que sembró este proceso.
+    """
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        puerto = s.getsockname()[1]
+    proceso = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", aplicacion, "--host", "127.0.0.1", "--port", str(puerto),
+         "--log-level", "warning", "--no-access-log"],
+        env={**os.environ, **(entorno or {})}
+    )
+    url = f"http://127.0.0.1:{puerto}"
+    try:
+        limite = time.monotonic() + espera
+        while True:
+            if proceso.poll() is not None:
+                raise RuntimeError(f"uvicorn terminó al arrancar (código {proceso.returncode})")
+            try:
+                if httpx.get(f"{url}/", timeout=1.0).status_code == 200:
+                    break
+            except httpx.TransportError:
+                pass
+            if time.monotonic() > limite:
+                raise RuntimeError(f"uvicorn no respondió en {espera:.0f} s")
+            time.sleep(0.2)
+        yield url
+    finally:
+        proceso.terminate()
+        proceso.wait(timeout=10)
+
+
+def cargar(
+    url: str,
+    solicitud: Callable[[httpx.AsyncClient, int], Awaitable[httpx.Response]],
+    concurrencia: int,
+    total: int,
+    calentamiento: int = 10,
+) -> Dict[str, float]:
+    """
+    `total` solicitudes con `concurrencia` clientes en paralelo contra un servidor real.
+    `solicitud(cliente, n)` hace la n-ésima. Devuelve throughput (req/s), errores y percentiles.
+    """
+    async def correr():
+        limites = httpx.Limits(max_connections=concurrencia, max_keepalive_connections=concurrencia)
+        async with httpx.AsyncClient(base_url=url, limits=limites, timeout=120.0) as cliente:
+            for n in range(calentamiento):
+                await solicitud(cliente, n)
+
+            tiempos, errores = [], 0
+            pendientes = iter(range(total))
+
+            async def trabajador():
+                nonlocal errores
+                for n in pendientes:
+                    inicio = time.perf_counter()
+                    respuesta = await solicitud(cliente, n)
+                    tiempos.append((time.perf_counter() - inicio) * 1000)
+                    if respuesta.status_code >= 400:
+                        errores += 1
+
+            inicio = time.perf_counter()
+            await asyncio.gather(*(trabajador() for _ in range(concurrencia)))
+            return tiempos, errores, time.perf_counter() - inicio
+
+    tiempos, errores, duracion = asyncio.run(correr())
+    return {"req_s": total / duracion, "errores": errores, **resumen(tiempos)}
@@ -0,0 +1,90 @@
+# Archivo: benchmarks/login.py
+# Throughput de POST /v1/login para cada combinación de LOGIN_VERIFY_WORKERS y
+# PASSWORD_HASH_ROUNDS (un uvicorn real por combinación). Mientras dura la ráfaga, una sonda
+# pide GET / en serie: su p99 muestra si el hashing le quita hilos al resto de la API.
+#   BENCH_DATABASE_URL=postgresql://... python -m benchmarks.login
+#   python -m benchmarks.login --workers 1 2 --rondas 29000 --total 60   # prueba rápida
+import argparse
+import itertools
+import threading
+import time
+
+import httpx
+from passlib.context import CryptContext
+
+from benchmarks.comun import cargar, crear_usuario, describir_base, imprimir_tabla, preparar_esquema, resumen, servidor
+from app.db import models
+from app.db.database import SessionLocal
+
+PASSWORD = "clave-de-benchmark"
+
+
+def _fijar_rondas(rondas: int):
+    """Todos los usuarios con un hash de `rondas`: así ningún login dispara el re-hash."""
+    nuevo_hash = CryptContext(schemes=["pbkdf2_sha256"], pbkdf2_sha256__default_rounds=rondas).hash(PASSWORD)
+    with SessionLocal() as db:
+        db.query(models.Usuario).update({models.Usuario.password_hash: nuevo_hash})
+        db.commit()
+
+
+class Sonda(threading.Thread):
+    """GET / en bucle hasta detener(): latencia de la API mientras hay logins en curso."""
+
+    def __init__(self, url: str):
+        super().__init__(daemon=True)
+        self.url = url
+        self.tiempos = []
+        self._fin = threading.Event()
+
+    def run(self):
+        with httpx.Client(base_url=self.url, timeout=60.0) as cliente:
+            while not self._fin.is_set():
+                inicio = time.perf_counter()
+                cliente.get("/")
+                self.tiempos.append((time.perf_counter() - inicio) * 1000)
+                time.sleep(0.01)
+
+    def detener(self):
+        self._fin.set()
+        self.join()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Throughput de /v1/login según LOGIN_VERIFY_WORKERS y PASSWORD_HASH_ROUNDS.")
+    parser.add_argument("--usuarios", type=int, default=50)
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4])
+    parser.add_argument("--rondas", type=int, nargs="+", default=[29000, 100000])
+    parser.add_argument("--concurrencia", type=int, default=16)
+    parser.add_argument("--total", type=int, default=300, help="Logins por combinación.")
+    args = parser.parse_args()
+
+    print(f"Base: {describir_base()}")
+    preparar_esquema()
+    emails = [f"login{n}@yume.test" for n in range(args.usuarios)]
+    for email in emails:
+        crear_usuario(rol="Cajero", email=email, password=PASSWORD)
+
+    def login(cliente, n):
+        return cliente.post("/v1/login", data={"username": emails[n % len(emails)], "password": PASSWORD})
+
+    filas = []
+    for rondas, workers in itertools.product(args.rondas, args.workers):
+        _fijar_rondas(rondas)
+        # Solo logins correctos: el throttle (que cuenta fallos) no interviene
+        entorno = {"PASSWORD_HASH_ROUNDS": str(rondas), "LOGIN_VERIFY_WORKERS": str(workers)}
+        with servidor(entorno=entorno) as url:
+            sonda = Sonda(url)
+            sonda.start()
+            medicion = cargar(url, login, args.concurrencia, args.total)
+            sonda.detener()
+        api = resumen(sonda.tiempos)
+        filas.append({
+            "rondas": rondas, "workers": workers, "logins_s": medicion["req_s"],
+            "errores": medicion["errores"], "login_p50_ms": medicion["p50_ms"], "login_p99_ms": medicion["p99_ms"],
+            "api_p50_ms": api["p50_ms"], "api_p99_ms": api["p99_ms"],
+        })
+    imprimir_tabla(filas)
+
+
+if __name__ == "__main__":
+    main()
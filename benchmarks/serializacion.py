@@ -0,0 +1,88 @@
+# Archivo: benchmarks/serializacion.py
+# Micro-benchmark de serialización por endpoint (sin red ni BD: los datos se leen una vez).
+# Compara, para la misma página de resultados:
+# - antes:   camino por defecto de FastAPI (valida contra response_model -> jsonable_encoder -> json.dumps)
+# - orjson:  el mismo camino con ORJSONResponse (default_response_class actual)
+# - ahora:   app.core.responses (TypeAdapter precompilado -> dump_json en pydantic-core)
+#   BENCH_DATABASE_URL=postgresql://... python -m benchmarks.serializacion
+#   python -m benchmarks.serializacion --contratos 200 --repeticiones 20   # prueba rápida
+import argparse
+import asyncio
+import json
+from typing import List
+
+from fastapi.responses import JSONResponse, ORJSONResponse
+from fastapi.routing import serialize_response
+from fastapi.utils import create_model_field
+
+from benchmarks.comun import (
+    describir_base, imprimir_tabla, medir, preparar_esquema, resumen, sembrar_cartera, sembrar_padron
+)
+from app.core.responses import responder_lista
+from app.db.database import SessionLocal
+from app.schemas import item_facturable_schema, reporte_schema, transaccion_ingreso_schema
+from app.services.item_facturable_service import ItemFacturableService
+from app.services.reporte_service import ReporteService
+from app.services.transaccion_ingreso_service import TransaccionIngresoService
+
+
+def _endpoints(db, filas: int):
+    """(endpoint, esquema, datos, validado) tal como los entrega cada servicio."""
+    return [
+        ("GET /facturables/", item_facturable_schema.ItemFacturable,
+         ItemFacturableService(db).get_all_items(limit=filas).items, False),
+        ("GET /transacciones-ingreso/", transaccion_ingreso_schema.TransaccionIngreso,
+         TransaccionIngresoService(db).get_transacciones(limit=filas).items, False),
+        ("GET /transacciones-ingreso/resumen", transaccion_ingreso_schema.TransaccionIngresoResumen,
+         TransaccionIngresoService(db).get_transacciones(limit=filas, incluir_detalles=False).items, False),
+        ("GET /reportes/morosidad", reporte_schema.MorosoResponse,
+         ReporteService(db).obtener_lista_morosos(limit=filas), True),
+    ]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Tiempo de serialización por endpoint: FastAPI vs TypeAdapter/orjson.")
+    parser.add_argument("--contratos", type=int, default=2000)
+    parser.add_argument("--filas", type=int, default=500, help="Filas por página serializada.")
+    parser.add_argument("--repeticiones", type=int, default=100)
+    args = parser.parse_args()
+
+    print(f"Base: {describir_base()}")
+    preparar_esquema()
+    sembrar_padron(args.contratos)
+    sembrar_cartera()
+
+    loop = asyncio.new_event_loop()
+    filas = []
+    with SessionLocal() as db:
+        for endpoint, schema, datos, validado in _endpoints(db, args.filas):
+            campo = create_model_field(name=f"Response_{schema.__name__}", type_=List[schema], mode="serialization")
+
+            def fastapi_por_defecto(clase_respuesta):
+                contenido = loop.run_until_complete(serialize_response(field=campo, response_content=datos))
+                return clase_respuesta(contenido).body
+
+            def antes():
+                return fastapi_por_defecto(JSONResponse)
+
+            def con_orjson():
+                return fastapi_por_defecto(ORJSONResponse)
+
+            def ahora():
+                return responder_lista(schema, datos, validado=validado).body
+
+            tiempos = {nombre: resumen(medir(f, args.repeticiones))["p50_ms"]
+                       for nombre, f in (("antes", antes), ("orjson", con_orjson), ("ahora", ahora))}
+            filas.append({
+                "endpoint": endpoint, "filas": len(datos), "bytes": len(ahora()),
+                "antes_p50_ms": tiempos["antes"], "orjson_p50_ms": tiempos["orjson"],
+                "ahora_p50_ms": tiempos["ahora"], "aceleracion": f"x{tiempos['antes'] / tiempos['ahora']:.1f}",
+                # El camino rápido debe producir exactamente el mismo JSON
+                "mismo_json": json.loads(antes()) == json.loads(ahora()),
+            })
+    loop.close()
+    imprimir_tabla(filas)
+
+
+if __name__ == "__main__":
+    main()
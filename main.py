@@ -1,7 +1,17 @@
 # Archivo: app/main.py
+from contextlib import asynccontextmanager
+
 from fastapi import FastAPI
+from fastapi.responses import ORJSONResponse
 from fastapi.middleware.cors import CORSMiddleware
 
+from app.core.scheduler import build_jobs
+from app.core.catalog_cache import precargar_catalogos
+from app.core.config import settings
+from app.core.db_metrics import DBMetricsMiddleware
+from app.core.compression import CompressionMiddleware, compression_kwargs
+from app.db.database import async_engine, async_replica_engine
+
 # Importaciones de Endpoints
 from app.api.v1.endpoints import (
     auth,
@@ -17,13 +27,33 @@ from app.api.v1.endpoints import (
     reportes,
     tipos_egreso,
     depositos,
-    caja
+    caja,
+    sistema,
+    busqueda
 )
 
+# 0. CICLO DE VIDA: Caché de catálogos + tareas programadas en proceso (Ej: barrido nocturno de vencimientos)
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    precargar_catalogos()
+    jobs = build_jobs()
+    for job in jobs:
+        job.start()
+    yield
+    for job in jobs:
+        job.stop()
+    # El pool asyncio debe cerrarse dentro del event loop
+    await async_engine.dispose()
+    if async_replica_engine is not None:
+        await async_replica_engine.dispose()
+
 # 1. Instancia principal
 app = FastAPI(
     title="Sistema de Cobros Universal",
-    description="API de gestión financiera basada en el modelo universal de cobros y egresos."
+    description="API de gestión financiera basada en el modelo universal de cobros y egresos.",
+    lifespan=lifespan,
+    # orjson para todas las respuestas JSON (los listados grandes usan además app.core.responses)
+    default_response_class=ORJSONResponse
 )
 
 # 2. CONFIGURACIÓN DE CORS (¡AQUÍ ARRIBA!) 
@@ -42,8 +72,17 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],  # Permitir GET, POST, PUT, DELETE, OPTIONS, etc.
     allow_headers=["*"],  # Permitir Authorization, Content-Type, etc.
+    expose_headers=["X-DB-Queries", "Server-Timing", "X-Next-Cursor", "ETag", "Idempotent-Replayed"],  # Métricas de BD, cursor de paginación y replays legibles desde React
 )
 
+# 2.1 MÉTRICAS DE BD POR REQUEST (X-DB-Queries / Server-Timing / detector N+1)
+if settings.DB_METRICS_ENABLED:
+    app.add_middleware(DBMetricsMiddleware)
+
+# 2.2 COMPRESIÓN (después de métricas: queda por fuera y comprime la respuesta final)
+if settings.COMPRESSION_ENABLED:
+    app.add_middleware(CompressionMiddleware, **compression_kwargs())
+
 # 3. INCLUSIÓN DE RUTAS (DESPUÉS DEL MIDDLEWARE) 
 app.include_router(auth.router, prefix="/v1") 
 app.include_router(medio_ingreso.router, prefix="/v1")
@@ -59,6 +98,8 @@ app.include_router(reportes.router, prefix="/v1")
 app.include_router(tipos_egreso.router, prefix="/v1")
 app.include_router(depositos.router, prefix="/v1")
 app.include_router(caja.router, prefix="/v1")
+app.include_router(sistema.router, prefix="/v1")
+app.include_router(busqueda.router, prefix="/v1")
 
 @app.get("/")
 def read_root():
@@ -0,0 +1,110 @@
+# Archivo: tests/conftest.py
+# Base de datos de pruebas:
+# - Por defecto un SQLite temporal (rápido, sin servicios externos).
+# - TEST_DATABASE_URL=postgresql://... para correr también las pruebas de concurrencia
+#   (SELECT ... FOR UPDATE solo tiene efecto en Postgres). La BD debe tener pg_trgm disponible.
+#   `make test-postgres` levanta uno descartable en Docker; el CI corre ambas variantes.
+# Las variables se fijan ANTES de importar la app: los motores se crean al importar app.db.database.
+import os
+import tempfile
+from datetime import date
+from types import SimpleNamespace
+
+_SQLITE_TMP = os.path.join(tempfile.mkdtemp(prefix="yume-tests-"), "yume.db")
+os.environ["DATABASE_URL_OVERRIDE"] = os.environ.get("TEST_DATABASE_URL") or f"sqlite:///{_SQLITE_TMP}"
+os.environ["DATABASE_REPLICA_URL"] = ""
+# Modo estricto: un patrón N+1 dentro de medir_sentencias() o de un request hace fallar la prueba
+os.environ["DB_N1_STRICT"] = "true"
+for _clave, _valor in {
+    "POSTGRES_USER": "yume", "POSTGRES_PASSWORD": "yume", "POSTGRES_SERVER": "localhost",
+    "POSTGRES_DB": "yume_test", "SECRET_KEY": "clave-de-pruebas",
+}.items():
+    os.environ.setdefault(_clave, _valor)
+
+import pytest
+
+from app.core.catalog_cache import catalog_cache
+from app.core.report_cache import antiguedad_cache
+from app.db import models
+from app.db.database import Base, SessionLocal, engine
+
+ES_POSTGRES = engine.dialect.name == "postgresql"
+
+solo_postgres = pytest.mark.skipif(
+    not ES_POSTGRES, reason="Requiere Postgres: TEST_DATABASE_URL=postgresql://... o `make test-postgres`."
+)
+
+
+@pytest.fixture(scope="session", autouse=True)
+def esquema():
+    Base.metadata.drop_all(engine)
+    Base.metadata.create_all(engine)
+    yield
+    Base.metadata.drop_all(engine)
+    engine.dispose()
+
+
+@pytest.fixture(autouse=True)
+def limpiar_tablas():
+    yield
+    with engine.begin() as conn:
+        for tabla in reversed(Base.metadata.sorted_tables):
+            conn.execute(tabla.delete())
+    # Los IDs cambian entre pruebas: nada de cachés de la prueba anterior
+    catalog_cache.invalidar()
+    antiguedad_cache.invalidar()
+
+
+@pytest.fixture
+def db():
+    sesion = SessionLocal()
+    try:
+        yield sesion
+    finally:
+        sesion.close()
+
+
+@pytest.fixture
+def datos(db):
+    """Un cajero, un inquilino con contrato activo, un concepto y un medio de pago no efectivo."""
+    rol = models.Rol(nombre="Cajero")
+    persona_cajero = models.Persona(nombres="Ana", apellidos="Caja", telefono="700", celular="700")
+    inquilino = models.Persona(nombres="José", apellidos="Pérez", telefono="711", celular="711")
+    unidad = models.UnidadServicio(identificador_unico="A-101", tipo_unidad="Departamento", estado="Ocupado")
+    concepto = models.ConceptoDeuda(nombre="Expensas")
+    cuenta = models.Categoria(nombre_cuenta="Banco", tipo="ingreso")
+    db.add_all([rol, persona_cajero, inquilino, unidad, concepto, cuenta])
+    db.flush()
+
+    usuario = models.Usuario(id_persona=persona_cajero.id_persona, id_rol=rol.id_rol, email="caja@yume.test")
+    medio = models.MedioIngreso(nombre="Transferencia", tipo="banco", id_catalogo=cuenta.id_catalogo)
+    relacion = models.RelacionCliente(
+        id_persona=inquilino.id_persona, id_unidad=unidad.id_unidad, tipo_relacion="Inquilino",
+        fecha_inicio=date(2025, 1, 1), estado="Activo", saldo_favor=0, monto_mensual=0
+    )
+    db.add_all([usuario, medio, relacion])
+    db.commit()
+
+    return SimpleNamespace(
+        id_usuario=usuario.id_usuario,
+        id_persona=inquilino.id_persona,
+        id_unidad=unidad.id_unidad,
+        id_relacion=relacion.id_relacion,
+        id_concepto=concepto.id_concepto,
+        id_medio=medio.id_medio_ingreso,
+    )
+
+
+def crear_deudas(db, datos, cantidad: int, monto: float = 100.0, desde: date = date(2025, 1, 5)):
+    """`cantidad` cuotas mensuales pendientes del contrato de `datos` (una por periodo)."""
+    items = []
+    for n in range(cantidad):
+        año, mes = desde.year + (desde.month - 1 + n) // 12, (desde.month - 1 + n) % 12 + 1
+        items.append(models.ItemFacturable(
+            id_unidad=datos.id_unidad, id_persona=datos.id_persona, id_concepto=datos.id_concepto,
+            monto_base=monto, saldo_pendiente=monto, periodo=f"{año}-{mes:02d}",
+            fecha_vencimiento=date(año, mes, desde.day), estado="pendiente", año=año, mes=mes
+        ))
+    db.add_all(items)
+    db.commit()
+    return [i.id_item for i in items]
@@ -0,0 +1,52 @@
+# Archivo: tests/test_busqueda.py
+# Los contratos heredan el rango de su persona/unidad y se ordenan por él antes del LIMIT.
+# Los filtros del listado de personas siguen aplicando cada uno a su columna.
+from datetime import date
+
+from app.db import models
+from app.schemas.persona_schema import PersonaFilter
+from app.services.busqueda_service import BusquedaService
+from app.services.persona_service import PersonaService
+
+
+def crear_unidad_con_contratos(db, datos, identificador: str, contratos: int) -> int:
+    unidad = models.UnidadServicio(identificador_unico=identificador, tipo_unidad="Departamento", estado="Ocupado")
+    db.add(unidad)
+    db.flush()
+    db.add_all([
+        models.RelacionCliente(
+            id_persona=datos.id_persona, id_unidad=unidad.id_unidad, tipo_relacion="Inquilino",
+            fecha_inicio=date(2025, 1, 1), estado="Activo", saldo_favor=0, monto_mensual=0
+        )
+        for _ in range(contratos)
+    ])
+    db.commit()
+    return unidad.id_unidad
+
+
+def test_contrato_de_la_mejor_coincidencia_no_queda_fuera_del_limite(db, datos):
+    # Los contratos de la coincidencia débil tienen ids menores
+    crear_unidad_con_contratos(db, datos, "AB-20", 3)
+    id_exacta = crear_unidad_con_contratos(db, datos, "B-2", 1)
+
+    resultados = BusquedaService(db).buscar("b-2", limite=3).resultados
+
+    assert [(r.tipo, r.id_unidad) for r in resultados[:2]] == [("unidad", id_exacta), ("relacion", id_exacta)]
+    assert resultados[1].rango == resultados[0].rango
+
+
+def test_filtros_de_personas_aplican_cada_uno_a_su_columna(db, datos):
+    luz = models.Persona(nombres="Luz", apellidos="Gómez", telefono="5551234", celular="600", email="luz99@yume.test")
+    luzardo = models.Persona(nombres="Juan", apellidos="Luzardo", telefono="5559876", celular="601", email="juan@yume.test")
+    db.add_all([luz, luzardo])
+    db.commit()
+    servicio = PersonaService(db)
+
+    def ids(**filtros):
+        return sorted(p.id_persona for p in servicio.get_filtered_personas(PersonaFilter(**filtros)))
+
+    assert ids(apellidos="luz") == [luzardo.id_persona]
+    assert ids(nombres="luz") == [luz.id_persona]
+    assert ids(apellidos="GOMEZ") == [luz.id_persona]  # sin tildes ni mayúsculas
+    assert ids(telefono="99") == []                     # el "99" del email no es teléfono
+    assert ids(telefono="9876") == [luzardo.id_persona]
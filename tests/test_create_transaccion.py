@@ -0,0 +1,93 @@
+# Archivo: tests/test_create_transaccion.py
+# create_transaccion pre-carga las deudas en una consulta y escribe en bloque:
+# la cantidad de sentencias no crece con las cuotas pagadas ni con los meses adelantados.
+# Corre en SQLite y en Postgres: los lotes de un mismo INSERT (insertmanyvalues) cuentan como
+# una sentencia (ver db_metrics), así que el conteo no depende del dialecto.
+from datetime import date
+
+from app.core.catalog_cache import catalog_cache
+from app.core.db_metrics import medir_sentencias
+from app.db import models
+from app.schemas.transaccion_ingreso_schema import TransaccionIngresoCreate
+from app.services.transaccion_ingreso_service import TransaccionIngresoService
+from tests.conftest import crear_deudas
+
+# Bloqueo del contrato, pre-carga de deudas, UPDATE de items (executemany), cabecera,
+# detalles (un INSERT multi-fila), upsert de resumen_relacion y refresh de la cabecera
+SENTENCIAS_COBRO = 7
+# Lo mismo + el INSERT de las cuotas futuras generadas (una sentencia para todas)
+SENTENCIAS_COBRO_CON_ADELANTO = 8
+
+
+def cobrar(db, datos, monto: float) -> int:
+    """Cobro automático (sin detalles); devuelve cuántas sentencias SQL emitió."""
+    catalog_cache.cargar(db)  # El caché de catálogos se llena fuera de la medición
+    with medir_sentencias() as stats:
+        TransaccionIngresoService(db).create_transaccion(TransaccionIngresoCreate(
+            id_relacion=datos.id_relacion, id_medio_ingreso=datos.id_medio,
+            monto_total=monto, fecha=date(2025, 3, 1)
+        ), datos.id_usuario)
+    return stats.total
+
+
+def borrar_movimientos(db):
+    db.query(models.TransaccionIngresoDetalle).delete()
+    db.query(models.TransaccionIngreso).delete()
+    db.query(models.ItemFacturable).delete()
+    db.commit()
+
+
+def test_cantidad_de_sentencias_no_depende_de_las_deudas(db, datos):
+    crear_deudas(db, datos, 1)
+    con_una = cobrar(db, datos, 100)
+
+    borrar_movimientos(db)
+    crear_deudas(db, datos, 50)
+    con_cincuenta = cobrar(db, datos, 5000)
+
+    assert con_una == con_cincuenta == SENTENCIAS_COBRO
+    assert db.query(models.ItemFacturable).filter(models.ItemFacturable.estado == "pagado").count() == 50
+
+
+def test_adelanto_de_un_año_no_agrega_sentencias(db, datos):
+    relacion = db.get(models.RelacionCliente, datos.id_relacion)
+    relacion.monto_mensual = 100
+    db.commit()
+
+    # Paga la cuota existente y genera/paga 1 cuota futura
+    crear_deudas(db, datos, 1)
+    un_mes = cobrar(db, datos, 200)
+
+    # Paga la cuota existente y genera/paga 12 cuotas futuras
+    borrar_movimientos(db)
+    crear_deudas(db, datos, 1)
+    doce_meses = cobrar(db, datos, 1300)
+
+    assert un_mes == doce_meses == SENTENCIAS_COBRO_CON_ADELANTO
+    assert db.query(models.ItemFacturable).count() == 13
+
+
+def test_precarga_no_lee_historial_pagado_ni_deudas_de_otros_inquilinos(db, datos):
+    pagadas = crear_deudas(db, datos, 3, desde=date(2024, 1, 5))
+    abiertas = crear_deudas(db, datos, 2, desde=date(2025, 1, 5))
+    futura = crear_deudas(db, datos, 1, desde=date(2025, 6, 5))[0]
+    db.query(models.ItemFacturable).filter(models.ItemFacturable.id_item.in_(pagadas + [futura]))\
+        .update({"saldo_pendiente": 0, "estado": "pagado"}, synchronize_session=False)
+    anterior = models.Persona(nombres="Inquilino", apellidos="Anterior", telefono="722", celular="722")
+    db.add(anterior)
+    db.flush()
+    ajena = models.ItemFacturable(
+        id_unidad=datos.id_unidad, id_persona=anterior.id_persona, id_concepto=datos.id_concepto,
+        monto_base=100, saldo_pendiente=100, periodo="2023-12", fecha_vencimiento=date(2023, 12, 5),
+        estado="pendiente", año=2023, mes=12
+    )
+    db.add(ajena)
+    db.commit()
+
+    relacion = db.get(models.RelacionCliente, datos.id_relacion)
+    servicio = TransaccionIngresoService(db)
+
+    assert sorted(servicio._prefetch_items(relacion, [])) == abiertas + [futura]
+    # Una deuda pedida explícitamente se carga aunque esté fuera del contrato (la valida el cobro)
+    assert sorted(servicio._prefetch_items(relacion, [pagadas[-1]])) == [pagadas[-1]] + abiertas + [futura]
+    db.rollback()
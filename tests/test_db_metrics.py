@@ -0,0 +1,29 @@
+# Archivo: tests/test_db_metrics.py
+# Detector de N+1 en modo estricto (activado en conftest) y limpieza del cronómetro por sentencia.
+import pytest
+from sqlalchemy import select, text
+
+from app.core.config import settings
+from app.core.db_metrics import NPlusOneDetected, medir_sentencias
+from app.db import models
+from app.db.database import engine
+
+
+def test_modo_estricto_hace_fallar_un_n_mas_1(db, datos):
+    assert settings.DB_N1_STRICT
+    with pytest.raises(NPlusOneDetected):
+        with medir_sentencias():
+            for _ in range(settings.DB_N1_THRESHOLD):
+                db.execute(select(models.Persona).where(models.Persona.id_persona == datos.id_persona)).all()
+    db.rollback()
+
+
+def test_sentencia_fallida_no_deja_estado_en_la_conexion():
+    with engine.connect() as conn:
+        with medir_sentencias() as stats:
+            with pytest.raises(Exception):
+                conn.execute(text("SELECT * FROM tabla_que_no_existe"))
+            conn.rollback()
+            conn.execute(text("SELECT 1"))
+        assert stats.total == 1
+        assert "query_start_time" not in conn.info
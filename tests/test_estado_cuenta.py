@@ -0,0 +1,39 @@
+# Archivo: tests/test_estado_cuenta.py
+# El estado de cuenta se arma con un número FIJO de consultas (personas, billeteras,
+# deudas y últimos pagos), sin importar cuántas deudas o pagos tenga la persona.
+from app.core.db_metrics import medir_sentencias
+from app.services.reporte_service import ReporteService
+from tests.conftest import crear_deudas
+
+CONSULTAS_ESTADO_CUENTA = 4
+
+
+def test_estado_cuenta_con_una_deuda(db, datos):
+    crear_deudas(db, datos, 1)
+
+    with medir_sentencias() as stats:
+        estado = ReporteService(db).obtener_estado_cuenta(datos.id_persona)
+
+    assert len(estado.deudas_pendientes) == 1
+    assert stats.total == CONSULTAS_ESTADO_CUENTA
+
+
+def test_estado_cuenta_con_cincuenta_deudas(db, datos):
+    crear_deudas(db, datos, 50)
+
+    with medir_sentencias() as stats:
+        estado = ReporteService(db).obtener_estado_cuenta(datos.id_persona)
+
+    assert len(estado.deudas_pendientes) == 50
+    assert estado.resumen.total_deuda_pendiente == 5000.0
+    assert stats.total == CONSULTAS_ESTADO_CUENTA
+
+
+def test_estados_cuenta_por_lote(db, datos):
+    crear_deudas(db, datos, 10)
+
+    with medir_sentencias() as stats:
+        estados = ReporteService(db).obtener_estados_cuenta([datos.id_persona, datos.id_persona, 999999])
+
+    assert list(estados) == [datos.id_persona]
+    assert stats.total == CONSULTAS_ESTADO_CUENTA
@@ -0,0 +1,91 @@
+# Archivo: tests/test_idempotency.py
+# Una Idempotency-Key nunca vuelve a ejecutar la operación si esta ya confirmó su
+# transacción, aunque después falle guardar la respuesta o el proceso muera a mitad.
+from datetime import date, datetime, timedelta
+
+import pytest
+from fastapi import HTTPException
+from pydantic import BaseModel
+
+from app.core.config import settings
+from app.core.idempotency import Idempotencia
+from app.db import models
+
+
+class DepositoCreado(BaseModel):
+    id_deposito: int
+    monto: float
+
+
+class RespuestaImposible(BaseModel):
+    campo_que_no_existe: int
+
+
+def idempotencia(db, datos, clave="clave-1"):
+    return Idempotencia(db, clave, datos.id_usuario, "POST /v1/depositos/", "hash-1")
+
+
+def depositar(db, datos):
+    """Operación de prueba: como los servicios reales, confirma su propia transacción."""
+    deposito = models.Deposito(monto=50, fecha=date(2025, 3, 1), id_usuario_creador=datos.id_usuario)
+    db.add(deposito)
+    db.commit()
+    return deposito
+
+
+def clave_guardada(db):
+    db.expire_all()
+    return db.query(models.IdempotencyKey).one_or_none()
+
+
+def test_reintento_devuelve_la_respuesta_guardada(db, datos):
+    primera = idempotencia(db, datos).ejecutar(lambda: depositar(db, datos), DepositoCreado)
+    repetida = idempotencia(db, datos).ejecutar(lambda: depositar(db, datos), DepositoCreado)
+
+    assert repetida.body == primera.body
+    assert repetida.headers["Idempotent-Replayed"] == "true"
+    assert db.query(models.Deposito).count() == 1
+
+
+def test_falla_despues_del_commit_no_permite_reejecutar(db, datos):
+    with pytest.raises(Exception):
+        idempotencia(db, datos).ejecutar(lambda: depositar(db, datos), RespuestaImposible)
+
+    assert db.query(models.Deposito).count() == 1
+    assert clave_guardada(db).estado == "ejecutado"
+
+    with pytest.raises(HTTPException) as error:
+        idempotencia(db, datos).ejecutar(lambda: depositar(db, datos), RespuestaImposible)
+    assert error.value.status_code == 409
+    assert db.query(models.Deposito).count() == 1
+
+
+def test_falla_antes_del_commit_libera_la_clave(db, datos):
+    def fallar():
+        db.add(models.Deposito(monto=50, fecha=date(2025, 3, 1), id_usuario_creador=datos.id_usuario))
+        db.flush()
+        raise HTTPException(status_code=400, detail="Validación del servicio")
+
+    with pytest.raises(HTTPException):
+        idempotencia(db, datos).ejecutar(fallar, DepositoCreado)
+    assert clave_guardada(db) is None
+
+    idempotencia(db, datos).ejecutar(lambda: depositar(db, datos), DepositoCreado)
+    assert db.query(models.Deposito).count() == 1
+    assert clave_guardada(db).estado == "completado"
+
+
+def test_clave_abandonada_no_se_reejecuta(db, datos):
+    vieja = datetime.utcnow() - timedelta(seconds=settings.IDEMPOTENCY_LOCK_SECONDS + 60)
+    db.add(models.IdempotencyKey(
+        id_usuario=datos.id_usuario, clave="clave-1", endpoint="POST /v1/depositos/",
+        hash_solicitud="hash-1", estado="en_proceso",
+        fecha_creacion=vieja, fecha_expiracion=datetime.utcnow() + timedelta(hours=1)
+    ))
+    db.commit()
+
+    with pytest.raises(HTTPException) as error:
+        idempotencia(db, datos).ejecutar(lambda: depositar(db, datos), DepositoCreado)
+
+    assert error.value.status_code == 409
+    assert db.query(models.Deposito).count() == 0
@@ -0,0 +1,47 @@
+# Archivo: tests/test_importacion_pagos.py
+# Duplicados del importador de extractos: un pago bancario es (medio, fecha, monto,
+# referencia, contrato). Una referencia que es el código de unidad no lo identifica sola.
+import io
+
+from app.db import models
+from app.services.importacion_pagos_service import ImportacionPagosService
+
+
+def importar(db, datos, csv_texto, tamano_lote=None):
+    resultados = ImportacionPagosService(db).importar(
+        io.StringIO(csv_texto), "csv", datos.id_medio, datos.id_usuario, tamano_lote=tamano_lote
+    )
+    return [r.estado for r in resultados]
+
+
+def transacciones(db):
+    return db.query(models.TransaccionIngreso).filter(models.TransaccionIngreso.estado != 'ANULADO').count()
+
+
+def test_referencia_codigo_de_unidad_no_es_duplicado_de_otro_mes(db, datos):
+    assert importar(db, datos, "fecha,monto,referencia\n2026-09-05,50,A-101\n") == ["aplicado"]
+    assert importar(db, datos, "fecha,monto,referencia\n2026-10-05,50,A-101\n") == ["aplicado"]
+    assert transacciones(db) == 2
+
+
+def test_reimportar_sin_referencia_no_paga_dos_veces(db, datos):
+    extracto = "fecha,monto,unidad\n2026-10-05,50,A-101\n2026-10-06,80,A-101\n"
+    assert importar(db, datos, extracto) == ["aplicado", "aplicado"]
+    assert importar(db, datos, extracto) == ["duplicado", "duplicado"]
+    assert transacciones(db) == 2
+
+
+def test_pagos_identicos_del_mismo_dia_se_aplican_una_sola_vez_cada_uno(db, datos):
+    # Dos depósitos iguales el mismo día son legítimos; reimportar el archivo no los repite,
+    # aunque las copias caigan en lotes distintos
+    extracto = "fecha,monto,unidad\n2026-10-05,50,A-101\n2026-10-05,50,A-101\n"
+    assert importar(db, datos, extracto, tamano_lote=1) == ["aplicado", "aplicado"]
+    assert importar(db, datos, extracto + "2026-10-05,50,A-101\n", tamano_lote=1) == ["duplicado", "duplicado", "aplicado"]
+    assert transacciones(db) == 3
+
+
+def test_misma_referencia_bancaria_en_el_archivo_es_duplicado(db, datos):
+    extracto = "fecha,monto,referencia,unidad\n2026-10-05,50,TRX-9,A-101\n2026-10-05,50,TRX-9,A-101\n"
+    assert importar(db, datos, extracto) == ["aplicado", "duplicado"]
+    assert importar(db, datos, extracto) == ["duplicado", "duplicado"]
+    assert transacciones(db) == 1
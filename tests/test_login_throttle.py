@@ -0,0 +1,39 @@
+# Archivo: tests/test_login_throttle.py
+# El límite por IP cuenta solo intentos FALLIDOS: varios usuarios detrás de un mismo
+# NAT/proxy que inician sesión bien no se bloquean entre sí.
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from app.api.v1.endpoints import auth
+from app.core import security
+from app.core.login_throttle import fallos_por_email, fallos_por_ip
+from app.db import models
+
+
+@pytest.fixture
+def cliente(db, datos, monkeypatch):
+    usuario = db.get(models.Usuario, datos.id_usuario)
+    usuario.password_hash = security.get_password_hash("secreta")
+    db.commit()
+    monkeypatch.setattr(fallos_por_ip, "max_eventos", 3)
+    app = FastAPI()
+    app.include_router(auth.router, prefix="/v1")
+    yield TestClient(app)
+    fallos_por_ip._eventos.clear()
+    fallos_por_email._eventos.clear()
+
+
+def login(cliente, email, password):
+    return cliente.post("/v1/login", data={"username": email, "password": password}).status_code
+
+
+def test_logins_exitosos_no_consumen_el_cupo_de_la_ip(cliente):
+    for _ in range(10):
+        assert login(cliente, "caja@yume.test", "secreta") == 200
+
+
+def test_fallos_desde_una_ip_la_bloquean(cliente):
+    for n in range(3):
+        assert login(cliente, f"nadie{n}@yume.test", "x") == 401
+    assert login(cliente, "caja@yume.test", "secreta") == 429
@@ -0,0 +1,39 @@
+# Archivo: tests/test_morosidad.py
+# Lista de morosos: días de atraso exactos en cualquier dialecto (calculados en Python a
+# partir del vencimiento más antiguo) y orden por atraso.
+from datetime import date, timedelta
+
+from app.db import models
+from app.services.reporte_service import ReporteService
+from tests.conftest import crear_deudas
+
+
+def test_dias_de_atraso_y_orden(db, datos):
+    hoy = date.today()
+    # A-101: dos cuotas, la más antigua vencida hace ~650 días
+    ids = crear_deudas(db, datos, 2, desde=(hoy - timedelta(days=650)).replace(day=5))
+    # B-202: una cuota vencida hace 40 días, con más deuda
+    otra = models.UnidadServicio(identificador_unico="B-202", tipo_unidad="Departamento", estado="Ocupado")
+    db.add(otra)
+    db.flush()
+    vencimiento = hoy - timedelta(days=40)
+    db.add(models.ItemFacturable(
+        id_unidad=otra.id_unidad, id_persona=datos.id_persona, id_concepto=datos.id_concepto,
+        monto_base=500, saldo_pendiente=500, periodo=f"{vencimiento:%Y-%m}", fecha_vencimiento=vencimiento,
+        estado="vencido", año=vencimiento.year, mes=vencimiento.month
+    ))
+    db.commit()
+    primera = db.get(models.ItemFacturable, ids[0]).fecha_vencimiento
+
+    servicio = ReporteService(db)
+    por_deuda = servicio.obtener_lista_morosos()
+    assert [m.identificador_unico for m in por_deuda] == ["B-202", "A-101"]
+    assert por_deuda[0].dias_atraso_max == 40
+    assert por_deuda[1].dias_atraso_max == (hoy - primera).days
+    assert por_deuda[1].detalles[0].dias_atraso == (hoy - primera).days
+    assert por_deuda[1].cantidad_meses == 2
+
+    por_atraso = servicio.obtener_lista_morosos(ordenar_por="dias_atraso")
+    assert [m.identificador_unico for m in por_atraso] == ["A-101", "B-202"]
+    menos_atraso = servicio.obtener_lista_morosos(ordenar_por="dias_atraso", descendente=False)
+    assert [m.identificador_unico for m in menos_atraso] == ["B-202", "A-101"]
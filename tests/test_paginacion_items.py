@@ -0,0 +1,23 @@
+# Archivo: tests/test_paginacion_items.py
+# El listado de ítems pagina por keyset sin perder filas con fecha_creacion NULL.
+from sqlalchemy import update
+
+from app.db import models
+from app.services.item_facturable_service import ItemFacturableService
+from tests.conftest import crear_deudas
+
+
+def test_keyset_recorre_todos_los_items_aunque_falte_fecha_creacion(db, datos):
+    ids = crear_deudas(db, datos, 5)
+    db.execute(update(models.ItemFacturable).where(models.ItemFacturable.id_item.in_(ids[1::2])).values(fecha_creacion=None))
+    db.commit()
+
+    vistos, cursor = [], None
+    while True:
+        pagina = ItemFacturableService(db).get_all_items(limit=2, cursor=cursor)
+        vistos += [i.id_item for i in pagina.items]
+        cursor = pagina.next_cursor
+        if not cursor:
+            break
+
+    assert vistos == sorted(ids, reverse=True)
@@ -0,0 +1,29 @@
+# Archivo: tests/test_reporte_antiguedad.py
+# El reporte de antigüedad se cachea e invalida al confirmar en el primario: lo cacheado no
+# puede salir de una réplica atrasada aunque la sesión del endpoint lea de ella.
+import os
+import tempfile
+
+from sqlalchemy import create_engine
+
+from app.core.report_cache import antiguedad_cache
+from app.db.database import Base
+from app.services.reporte_service import ReporteService
+from tests.conftest import crear_deudas
+
+
+def test_antiguedad_cacheada_se_calcula_en_el_primario(db, datos):
+    crear_deudas(db, datos, 3)
+    # "Réplica" con el esquema pero sin los datos recién confirmados
+    replica = create_engine(f"sqlite:///{os.path.join(tempfile.mkdtemp(prefix='yume-replica-'), 'replica.db')}")
+    Base.metadata.create_all(replica)
+    try:
+        db.info["replica"] = replica
+        reporte = ReporteService(db).obtener_antiguedad("unidad")
+
+        assert float(reporte.totales.total) == 300.0
+        assert db.info["replica"] is replica  # la sesión sigue leyendo de la réplica
+        assert antiguedad_cache.get((reporte.fecha_corte, "unidad")) is reporte
+    finally:
+        db.info.pop("replica", None)
+        replica.dispose()
@@ -0,0 +1,53 @@
+# Archivo: tests/test_scheduler.py
+# Con varios workers cada uno tiene su DailyJob: el advisory lock deja correr a uno solo.
+from datetime import datetime, timedelta
+
+from app.core.config import settings
+from app.core.scheduler import DailyJob, _candado_exclusivo, build_jobs
+from app.db import models
+from tests.conftest import solo_postgres
+
+
+def tarea_contada(corridas: list):
+    def tarea(db):
+        corridas.append(db)
+        return "ok"
+    return tarea
+
+
+def test_corrida_ejecuta_la_tarea():
+    corridas = []
+    assert DailyJob("prueba", tarea_contada(corridas), 0, 0).ejecutar() is True
+    assert len(corridas) == 1
+
+
+@solo_postgres
+def test_corrida_se_omite_si_otro_worker_tiene_la_tarea():
+    corridas = []
+    job = DailyJob("prueba", tarea_contada(corridas), 0, 0)
+    with _candado_exclusivo("prueba") as obtenido:  # "otro worker" (otra conexión)
+        assert obtenido
+        assert job.ejecutar() is False
+    assert corridas == []
+    # Liberado el lock, la siguiente corrida sí se ejecuta
+    assert job.ejecutar() is True
+    assert len(corridas) == 1
+
+
+@solo_postgres
+def test_purga_de_idempotencia_corre_en_un_solo_worker(db, datos, monkeypatch):
+    monkeypatch.setattr(settings, "IDEMPOTENCY_PURGE_ENABLED", True)
+    purga = next(j for j in build_jobs() if j.nombre == "idempotency-purge")
+    db.add(models.IdempotencyKey(
+        id_usuario=datos.id_usuario, clave="vieja", endpoint="POST /v1/depositos/",
+        hash_solicitud="hash-1", estado="completado",
+        fecha_creacion=datetime.utcnow() - timedelta(days=2), fecha_expiracion=datetime.utcnow() - timedelta(days=1)
+    ))
+    db.commit()
+
+    with _candado_exclusivo(purga.nombre):
+        assert purga.ejecutar() is False
+    assert db.query(models.IdempotencyKey).count() == 1
+
+    assert purga.ejecutar() is True
+    assert db.query(models.IdempotencyKey).count() == 0